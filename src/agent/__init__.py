@@ -1,8 +1,16 @@
 """New LangGraph Agent.
 
-This module defines a custom graph.
+This module defines a custom graph. `agent.graph` (and with it LangGraph and the
+nodes) is imported on first access to `agent.graph`, so that importing a light
+submodule such as `agent.metrics` or `agent.cache` stays cheap.
 """
 
-from agent.graph import graph
-
 __all__ = ["graph"]
+
+
+def __getattr__(name: str):
+    if name == "graph":
+        from agent.graph import graph
+
+        return graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,33 @@
-import gradio as gr
-from agent.graph import graph
-from agent.state import State
-from langchain_core.messages import HumanMessage
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Iterator
+
+from agent.graph import graph, invoke_ticket, warm_up
+from agent.checkpoint import ticket_config
+from agent.coalesce import run_coalesced
+from agent.state import State, new_ticket_state, validate_ticket
+from agent.metrics import start_metrics_server, ticket_trace, traced_stream
+
+logger = logging.getLogger(__name__)
+
+
+def format_result(result: dict) -> str:
+    """Render the final graph state as the markdown shown to the user."""
+    output = result.get("output", "No output generated.")
+    category = result.get("category", "Unknown")
+    approved = result.get("approved", False)
+    feedbacks = result.get("feedbacks") or []
+    feedback = result.get("feedback") or (feedbacks[-1] if feedbacks else None)
+
+    # Format response
+    response = f"**Category**: {category}\n\n**Output**:\n{output}"
+    if not approved and feedback:
+        response += f"\n\n**Feedback**: {feedback}"
+    return response
+
 
 def process_ticket(subject: str, description: str) -> str:
     """Process a support ticket through the agent workflow and return formatted output.
@@ -14,76 +40,137 @@ def process_ticket(subject: str, description: str) -> str:
         str: Formatted output (approved draft or escalation message).
     """
     # Validate inputs
-    if not subject or not description:
-        return "Error: Please provide both subject and description."
-    if len(subject) > 100:
-        return "Error: Subject must be 100 characters or less."
-    if len(description) > 500:
-        return "Error: Description must be 500 characters or less."
+    error = validate_ticket(subject, description)
+    if error:
+        return f"Error: {error}"
 
     # Initialize state
-    ticket = {"subject": subject, "description": description}
-    initial_state = {
-        "ticket": ticket,
-        "messages": [HumanMessage(content=f"Received ticket: {subject}")],
-        "attempt": 0,
-        "drafts": [],
-        "feedbacks": []
-    }
+    initial_state = new_ticket_state(subject, description)
 
     # Run the agent
     try:
-        result = graph.invoke(initial_state)
-        output = result.get("output", "No output generated.")
-        category = result.get("category", "Unknown")
-        approved = result.get("approved", False)
-        feedback = result.get("feedback", None)
-
-        # Format response
-        response = f"**Category**: {category}\n\n**Output**:\n{output}"
-        if not approved and feedback:
-            response += f"\n\n**Feedback**: {feedback}"
-        return response
+        with ticket_trace():
+            def run():
+                return invoke_ticket(initial_state, uuid.uuid4().hex)
+
+            return format_result(run_coalesced(subject, description, run))
     except Exception as e:
         return f"Error processing ticket: {str(e)}"
 
-# Define Gradio interface
-with gr.Blocks(title="Support Ticket Resolution Agent") as app:
-    gr.Markdown("# Support Ticket Resolution Agent")
-    gr.Markdown("Enter a support ticket (Subject: max 100 chars, Description: max 500 chars).")
-    
-    with gr.Row():
-        subject_input = gr.Textbox(
-            label="Subject",
-            placeholder="e.g., I was charged twice",
-            max_lines=1,
-            interactive=True
-        )
-        description_input = gr.Textbox(
-            label="Description",
-            placeholder="e.g., I noticed two charges on my card...",
-            lines=4,
-            interactive=True
+
+def _stream_graph(initial_state: State, emit: Callable[[str], None], start: float) -> dict:
+    """Run the graph for one ticket, passing rendered progress to `emit`; return the final state."""
+    first_token_at = None
+    result: dict = {}
+    draft = ""
+    config = ticket_config(uuid.uuid4().hex)
+    events = traced_stream(lambda: graph.stream(initial_state, config, stream_mode=["updates", "custom"]))
+    for mode, chunk in events:
+        category = result.get("category", "...")
+        if mode == "custom" and chunk.get("reset"):
+            # A failed attempt is being retried; its partial tokens are discarded.
+            draft = ""
+        elif mode == "custom" and "token" in chunk:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                logger.info("time_to_first_token_ms=%.1f", (first_token_at - start) * 1000)
+            draft += chunk["token"]
+            heading = "Drafting response" if chunk["node"] == "draft" else "Revising draft"
+            emit(f"**Category**: {category}\n\n**{heading}...**\n\n{draft}")
+        elif mode == "updates":
+            for node, update in chunk.items():
+                result.update(update or {})
+                if node in ("draft", "retry_draft") and update.get("drafts"):
+                    draft = ""
+                    emit(f"**Category**: {result.get('category', '...')}\n\n**Under review...**\n\n{update['drafts'][-1]}")
+    return result
+
+
+def stream_ticket(subject: str, description: str) -> Iterator[str]:
+    """Process a ticket and yield progressively rendered markdown.
+
+    Draft tokens are rendered as they arrive from `generate_draft`/`retry_draft`,
+    followed by an "under review" state while the reviewer runs, and finally the
+    same output as `process_ticket`. Time to first token (from submission) is logged.
+
+    The ticket goes through the coalescer like `process_ticket`: a ticket matching one
+    already in flight shows the loader until that run finishes, then its result. The
+    run itself happens in a background thread, so it completes (for its followers) even
+    if the UI stops reading.
+
+    Args:
+        subject (str): Ticket subject (max 100 characters).
+        description (str): Ticket description (max 500 characters).
+
+    Yields:
+        str: Markdown snapshot of the current progress.
+    """
+    error = validate_ticket(subject, description)
+    if error:
+        yield f"Error: {error}"
+        return
+
+    yield "**Processing your ticket...**"
+    start = time.perf_counter()
+    initial_state = new_ticket_state(subject, description)
+    frames: queue.Queue = queue.Queue()
+    outcome: dict = {}
+
+    def run() -> None:
+        try:
+            outcome["result"] = run_coalesced(subject, description,
+                                              lambda: _stream_graph(initial_state, frames.put, start))
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            frames.put(None)
+
+    threading.Thread(target=run, daemon=True, name="stream-ticket").start()
+    yield from iter(frames.get, None)
+    if "error" in outcome:
+        yield f"Error processing ticket: {str(outcome['error'])}"
+    else:
+        yield format_result(outcome["result"])
+
+def build_app():
+    """Build the Gradio interface (Gradio is imported here, not at module import)."""
+    import gradio as gr
+
+    with gr.Blocks(title="Support Ticket Resolution Agent") as app:
+        gr.Markdown("# Support Ticket Resolution Agent")
+        gr.Markdown("Enter a support ticket (Subject: max 100 chars, Description: max 500 chars).")
+
+        with gr.Row():
+            subject_input = gr.Textbox(
+                label="Subject",
+                placeholder="e.g., I was charged twice",
+                max_lines=1,
+                interactive=True
+            )
+            description_input = gr.Textbox(
+                label="Description",
+                placeholder="e.g., I noticed two charges on my card...",
+                lines=4,
+                interactive=True
+            )
+
+        submit_button = gr.Button("Submit Ticket")
+        output = gr.Markdown(label="Response", value="Submit a ticket to see the response.")
+
+        # Stream progress: loader, draft tokens, review state, final result
+        def submit_with_loader(subject, description):
+            yield from stream_ticket(subject, description)
+
+        submit_button.click(
+            fn=submit_with_loader,
+            inputs=[subject_input, description_input],
+            outputs=output,
+            queue=True  # Enable queue for loading state
         )
-    
-    submit_button = gr.Button("Submit Ticket")
-    output = gr.Markdown(label="Response", value="Submit a ticket to see the response.")
-    
-    # Add loader feedback
-    def submit_with_loader(subject, description):
-        # Show loading message
-        yield "**Processing your ticket...**"
-        # Process ticket
-        result = process_ticket(subject, description)
-        # Return final result
-        yield result
-
-    submit_button.click(
-        fn=submit_with_loader,
-        inputs=[subject_input, description_input],
-        outputs=output,
-        queue=True  # Enable queue for loading state
-    )
+    return app
+
 
 if __name__ == "__main__":
-    app.launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
+    start_metrics_server()
+    warm_up()
+    build_app().launch(server_name="0.0.0.0", server_port=7860)
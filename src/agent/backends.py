@@ -0,0 +1,552 @@
+"""Pluggable LLM backends.
+
+`call_llm`, `acall_llm`, `stream_llm` and `astream_llm` keep the resilience policy
+(retries, hedging, breakers, fallbacks; see `agent.llm_policy`) and the measurements,
+and hand each attempt to a backend that only knows how to send one request:
+
+    hf      Hugging Face `InferenceClient` (the default): Inference API, Inference
+            Endpoints or any TGI server at `HUGGINGFACE_BASE_URL`.
+    openai  Any OpenAI-compatible `/v1/chat/completions` server (vLLM, llama.cpp
+            server, OpenAI) over plain HTTP, without `huggingface_hub`.
+    local   An in-process llama.cpp model (`pip install -e .[local]`) loaded from a
+            GGUF file on disk, e.g. a 4-bit quantized 1-3B instruct model for
+            classification and review. No network round trip, no serving stack.
+    fake    Deterministic answers derived from the prompt (keyword classification,
+            a fixed draft, an approving review), for tests and dry runs of the graph.
+
+The default backend is `LLM_BACKEND`; a route (`agent.routing`) can pick another one
+per node with its `backend` setting, so classification and review can run locally
+while drafting stays on a remote model. Fallback endpoints are sent through the same
+backend as the request they replace. Micro-batching (`agent.microbatch`) only applies
+to the `hf` backend.
+
+The local model is loaded once per process, on first use, and shared by all threads
+and event loops. A llama.cpp context is not safe to use from two threads at once, so
+`LLM_LOCAL_CONCURRENCY` (default 1) requests run at a time and the others queue for a
+slot; past `LLM_LOCAL_MAX_QUEUE` waiting requests new ones are rejected with a
+retryable rate-limit error instead of piling up behind a saturated CPU. Async calls
+run in worker threads, so the event loop keeps serving while the model computes; so
+does `prepare`, which loads the model on first use (`arun_with_policy` runs it in a
+thread). `warm_up_backends` (called by `agent.graph.warm_up`) loads it at start-up
+instead when the default backend or a route uses it.
+
+Configuration (environment):
+    LLM_BACKEND: Default backend, one of `BACKENDS` (default "hf").
+    LLM_OPENAI_BASE_URL: Server of the openai backend (default: HUGGINGFACE_BASE_URL).
+    LLM_OPENAI_API_KEY: Bearer token sent to it (default: none).
+    LLM_LOCAL_MODEL_PATH: GGUF file loaded by the local backend.
+    LLM_LOCAL_CONTEXT: Context window of the local model in tokens (default 4096).
+    LLM_LOCAL_THREADS: CPU threads per local generation (default: llama.cpp's choice).
+    LLM_LOCAL_CONCURRENCY: Local generations run at once (default 1).
+    LLM_LOCAL_MAX_QUEUE: Requests allowed to wait for a local slot; 0 means no limit
+        (default 0).
+    LLM_FAKE_LATENCY_MS: Delay added to each fake answer (default 0).
+"""
+
+import abc
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agent.llm_policy import Endpoint, LLMRateLimitError, LLMRequestError
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf")
+LLM_OPENAI_BASE_URL = os.getenv("LLM_OPENAI_BASE_URL") or None
+LLM_OPENAI_API_KEY = os.getenv("LLM_OPENAI_API_KEY") or None
+LLM_LOCAL_MODEL_PATH = os.getenv("LLM_LOCAL_MODEL_PATH", "")
+LLM_LOCAL_CONTEXT = int(os.getenv("LLM_LOCAL_CONTEXT", "4096"))
+LLM_LOCAL_THREADS = int(os.getenv("LLM_LOCAL_THREADS", "0")) or None
+LLM_LOCAL_CONCURRENCY = int(os.getenv("LLM_LOCAL_CONCURRENCY", "1"))
+LLM_LOCAL_MAX_QUEUE = int(os.getenv("LLM_LOCAL_MAX_QUEUE", "0"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+
+
+def _no_op() -> None:
+    pass
+
+
+@dataclass(frozen=True)
+class LLMRequest:
+    """One attempt of an LLM call, as handed to a backend.
+
+    Attributes:
+        endpoint (Endpoint): Model (and endpoint) chosen by the resilience policy.
+        message (str): The user message.
+        max_tokens (int): Completion token limit.
+        temperature (float): Sampling temperature.
+        response_format (Optional[dict]): Constrained-output spec in the Hugging Face
+            form, `{"type": "json", "value": <JSON schema>}`.
+        timeout (Optional[float]): Per-request timeout in seconds; None keeps the default.
+        started (Callable[[], None]): Called when the request stops queueing and is
+            sent, so the caller's latency measurement excludes the wait for a slot.
+    """
+
+    endpoint: Endpoint
+    message: str
+    max_tokens: int = 200
+    temperature: float = 0.3
+    response_format: Optional[dict] = None
+    timeout: Optional[float] = None
+    started: Callable[[], None] = _no_op
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """The request as a one-message chat."""
+        return [{"role": "user", "content": self.message}]
+
+    def json_schema(self) -> Optional[dict]:
+        """Return the JSON schema of a `{"type": "json"}` response format, if any."""
+        if self.response_format and self.response_format.get("type") == "json":
+            return self.response_format.get("value")
+        return None
+
+
+Completion = Tuple[str, Any]
+
+
+class Backend(abc.ABC):
+    """Sends single LLM requests; subclasses implement `complete` and `stream`.
+
+    `complete` returns the stripped text and the usage (anything with `prompt_tokens`
+    and `completion_tokens` attributes, or None). Errors are raised as they come; the
+    caller maps them with `to_llm_error`. The async methods default to running the sync
+    ones in a worker thread.
+    """
+
+    name = ""
+    # Whether requests may be combined by the micro-batcher (`agent.microbatch`).
+    batchable = False
+
+    def prepare(self, endpoint: Endpoint, timeout: Optional[float] = None, asynchronous: bool = False) -> None:
+        """Do the one-time setup for `endpoint` (clients, models) ahead of a timed request.
+
+        It may block for a long time (loading a model); async callers run it in a thread.
+        """
+
+    @abc.abstractmethod
+    def complete(self, request: LLMRequest) -> Completion:
+        """Send `request` and return its text and usage."""
+
+    @abc.abstractmethod
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Send `request` and yield its tokens as they arrive.
+
+        Closing the iterator early must release whatever the request holds.
+        """
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        """Run `complete` in a worker thread."""
+        return await asyncio.to_thread(self.complete, request)
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """Iterate `stream` in a worker thread, passing tokens back to the event loop.
+
+        A cancelled or closed consumer stops receiving tokens at once. The worker thread
+        closes the sync stream at its next token, which releases what it holds (e.g. a
+        local model slot).
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def pump() -> None:
+            tokens = self.stream(request)
+            try:
+                for token in tokens:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (token, None))
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+                return
+            finally:
+                close = getattr(tokens, "close", None)
+                if close is not None:
+                    close()
+            loop.call_soon_threadsafe(queue.put_nowait, (None, None))
+
+        worker = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                token, error = await queue.get()
+                if error is not None:
+                    raise error
+                if token is None:
+                    break
+                yield token
+        finally:
+            stopped.set()
+        await worker
+
+
+class HFBackend(Backend):
+    """Hugging Face `InferenceClient`, through the shared clients of `agent.utils`."""
+
+    name = "hf"
+    batchable = True
+
+    def prepare(self, endpoint: Endpoint, timeout: Optional[float] = None, asynchronous: bool = False) -> None:
+        """Build the (async) client for `endpoint`."""
+        from agent.utils import _async_client_for, _client_for
+
+        (_async_client_for if asynchronous else _client_for)(endpoint, timeout)
+
+    def _arguments(self, request: LLMRequest) -> Dict[str, Any]:
+        return {"model": request.endpoint.model, "messages": request.messages,
+                "max_tokens": request.max_tokens, "temperature": request.temperature}
+
+    def complete(self, request: LLMRequest) -> Completion:
+        """Send `request` through the shared sync client."""
+        from agent.utils import _client_for
+
+        result = _client_for(request.endpoint, request.timeout).chat.completions.create(
+            response_format=request.response_format, **self._arguments(request))
+        return result.choices[0].message.content.strip(), result.usage
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Stream `request` through the shared sync client."""
+        from agent.utils import _client_for
+
+        for chunk in _client_for(request.endpoint, request.timeout).chat.completions.create(
+                stream=True, **self._arguments(request)):
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        """Send `request` through the shared async client, within its concurrency limit."""
+        from agent.utils import _async_client_for
+
+        client = _async_client_for(request.endpoint, request.timeout)
+        async with client.limiter():
+            request.started()
+            result = await client.chat.completions.create(response_format=request.response_format,
+                                                          **self._arguments(request))
+        return result.choices[0].message.content.strip(), result.usage
+
+    async def astream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """Stream `request` through the shared async client, within its concurrency limit."""
+        from agent.utils import _async_client_for
+
+        client = _async_client_for(request.endpoint, request.timeout)
+        async with client.limiter():
+            request.started()
+            stream = await client.chat.completions.create(stream=True, **self._arguments(request))
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    yield token
+
+
+class OpenAIBackend(Backend):
+    """OpenAI-compatible chat completions over `requests`, one pooled session per process."""
+
+    name = "openai"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = LLM_OPENAI_API_KEY):
+        """Target `base_url` (default: each endpoint's own) with an optional bearer token."""
+        self.base_url = base_url
+        self.api_key = api_key
+        self._session = None
+        self._lock = threading.Lock()
+
+    def prepare(self, endpoint: Endpoint, timeout: Optional[float] = None, asynchronous: bool = False) -> None:
+        """Open the HTTP session."""
+        self._session_for()
+
+    def _session_for(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                from agent.utils import LLM_MAX_CONCURRENCY
+
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(pool_maxsize=LLM_MAX_CONCURRENCY))
+                session.mount("https://", HTTPAdapter(pool_maxsize=LLM_MAX_CONCURRENCY))
+                self._session = session
+        return self._session
+
+    def _post(self, request: LLMRequest, stream: bool):
+        from agent import utils
+
+        url = (request.endpoint.base_url or self.base_url or LLM_OPENAI_BASE_URL or utils.LLM_BASE_URL or "")
+        if not url:
+            raise LLMRequestError("The openai backend needs LLM_OPENAI_BASE_URL", request.endpoint.model)
+        url = url.rstrip("/")
+        url += "/chat/completions" if url.endswith("/v1") else "/v1/chat/completions"
+        body = {"model": request.endpoint.model, "messages": request.messages,
+                "max_tokens": request.max_tokens, "temperature": request.temperature, "stream": stream}
+        schema = request.json_schema()
+        if schema is not None:
+            body["response_format"] = {"type": "json_schema", "json_schema": {"name": "response", "schema": schema}}
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = self._session_for().post(url, json=body, headers=headers, stream=stream,
+                                            timeout=request.timeout or utils.LLM_TIMEOUT)
+        response.raise_for_status()
+        return response
+
+    def complete(self, request: LLMRequest) -> Completion:
+        """POST `request` to `/v1/chat/completions`."""
+        request.started()
+        payload = self._post(request, stream=False).json()
+        usage = payload.get("usage")
+        return (payload["choices"][0]["message"]["content"].strip(),
+                SimpleNamespace(**usage) if usage else None)
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """POST `request` with `stream` set and yield the tokens of its server-sent events."""
+        request.started()
+        with self._post(request, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = choices[0].get("delta", {}).get("content")
+                if token:
+                    yield token
+
+
+class LocalBackend(Backend):
+    """In-process llama.cpp model, loaded once and shared across threads.
+
+    Args:
+        model_path (str): GGUF file to load.
+        concurrency (int): Generations run at once; the rest wait for a slot.
+        max_queue (int): Requests allowed to wait for a slot (0: no limit).
+        llm (Any): An already loaded model with llama.cpp's `create_chat_completion`
+            API, used instead of loading `model_path`.
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: str = LLM_LOCAL_MODEL_PATH, concurrency: int = LLM_LOCAL_CONCURRENCY,
+                 max_queue: int = LLM_LOCAL_MAX_QUEUE, llm: Any = None):
+        """Keep the settings; the model loads on first use."""
+        self.model_path = model_path
+        self.max_queue = max_queue
+        self._llm = llm
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._state_lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+
+    def model(self) -> Any:
+        """Return the shared model, loading it on first use."""
+        if self._llm is None:
+            with self._load_lock:
+                if self._llm is None:
+                    if not self.model_path:
+                        raise LLMRequestError("The local backend needs LLM_LOCAL_MODEL_PATH")
+                    try:
+                        from llama_cpp import Llama
+                    except ImportError as e:
+                        raise LLMRequestError("The local backend needs llama-cpp-python; "
+                                              "install it with `pip install -e .[local]`") from e
+                    self._llm = Llama(model_path=self.model_path, n_ctx=LLM_LOCAL_CONTEXT,
+                                      n_threads=LLM_LOCAL_THREADS, verbose=False)
+        return self._llm
+
+    def prepare(self, endpoint: Endpoint, timeout: Optional[float] = None, asynchronous: bool = False) -> None:
+        """Load the model."""
+        self.model()
+
+    def _arguments(self, request: LLMRequest) -> Dict[str, Any]:
+        arguments = {"messages": request.messages, "max_tokens": request.max_tokens,
+                     "temperature": request.temperature}
+        schema = request.json_schema()
+        if schema is not None:
+            arguments["response_format"] = {"type": "json_object", "schema": schema}
+        return arguments
+
+    def _acquire(self, request: LLMRequest) -> None:
+        with self._state_lock:
+            if self.max_queue and self.waiting >= self.max_queue:
+                raise LLMRateLimitError(f"Local model queue is full ({self.waiting} waiting)",
+                                        request.endpoint.model)
+            self.waiting += 1
+        try:
+            self._slots.acquire()
+        finally:
+            with self._state_lock:
+                self.waiting -= 1
+                self.running += 1
+        request.started()
+
+    def _release(self) -> None:
+        with self._state_lock:
+            self.running -= 1
+        self._slots.release()
+
+    def complete(self, request: LLMRequest) -> Completion:
+        """Run `request` on the model once a slot is free."""
+        llm = self.model()
+        self._acquire(request)
+        try:
+            result = llm.create_chat_completion(**self._arguments(request))
+        finally:
+            self._release()
+        usage = result.get("usage")
+        return (result["choices"][0]["message"]["content"].strip(),
+                SimpleNamespace(**usage) if usage else None)
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Yield tokens of a local generation, holding a slot until it ends or is closed."""
+        llm = self.model()
+        self._acquire(request)
+        chunks = None
+        try:
+            chunks = llm.create_chat_completion(stream=True, **self._arguments(request))
+            for chunk in chunks:
+                token = chunk["choices"][0]["delta"].get("content") if chunk["choices"] else None
+                if token:
+                    yield token
+        finally:
+            # A closed consumer raises GeneratorExit at the `yield`: stop llama.cpp's
+            # generation before the slot goes to the next request.
+            close = getattr(chunks, "close", None)
+            try:
+                if close is not None:
+                    close()
+            finally:
+                self._release()
+
+
+FAKE_DRAFT = (
+    "Hello Customer,\n\nThank you for contacting us. Please check your transaction history at "
+    "https://billing.company.com; refunds are processed within 5-7 business days.\n\n"
+    "Best regards,\nSupport Team"
+)
+FAKE_REVIEW = json.dumps({"verdict": "Approved",
+                          "scores": {"relevance": 5, "completeness": 5, "professionalism": 5}, "feedback": ""})
+_CLASSIFY_KEYWORDS = [
+    ("Security", ("hack", "unauthorized", "phishing", "suspicious", "breach")),
+    ("Technical", ("crash", "error", "log in", "login", "slow", "bug", "outage")),
+    ("Billing", ("charge", "refund", "invoice", "billing", "payment", "subscription")),
+]
+
+
+def prompt_kind(prompt: str) -> str:
+    """Tell the agent's classify, review and draft prompts apart ("other" for anything else)."""
+    if "Classify the ticket" in prompt:
+        return "classify"
+    if "senior support agent" in prompt:
+        return "review"
+    if "support agent" in prompt:
+        return "draft"
+    return "other"
+
+
+def classify_reply(prompt: str) -> str:
+    """Classify a ticket prompt by keyword ("General" when nothing matches)."""
+    text = prompt.lower()
+    for category, keywords in _CLASSIFY_KEYWORDS:
+        if any(k in text for k in keywords):
+            return category
+    return "General"
+
+
+class FakeBackend(Backend):
+    """Deterministic answers derived from the prompt; no model involved.
+
+    Classification uses keyword rules (`classify_reply`), reviews always approve (as
+    JSON when a schema is requested) and drafts are `FAKE_DRAFT`. The bench mock server
+    (`agent.bench.mock_server`) answers with the same rules.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS):
+        """Answer after `latency_ms` (0: at once)."""
+        self.latency_ms = latency_ms
+
+    def answer(self, request: LLMRequest) -> str:
+        """Return the deterministic answer to `request`."""
+        kind = prompt_kind(request.message)
+        if kind == "classify":
+            return classify_reply(request.message)
+        if kind == "review":
+            return FAKE_REVIEW if request.response_format else "Approved"
+        return FAKE_DRAFT
+
+    def _completion(self, request: LLMRequest) -> Completion:
+        from agent.prompt_budget import count_tokens
+
+        text = self.answer(request)
+        return text, SimpleNamespace(prompt_tokens=count_tokens(request.message), completion_tokens=count_tokens(text))
+
+    def complete(self, request: LLMRequest) -> Completion:
+        """Sleep for the latency, then answer."""
+        request.started()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._completion(request)
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Yield the answer word by word."""
+        text, _ = self.complete(request)
+        for token in text.split(" "):
+            yield token + " "
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        """Sleep for the latency without blocking the loop, then answer."""
+        request.started()
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._completion(request)
+
+
+BACKENDS: Dict[str, Callable[[], Backend]] = {
+    "hf": HFBackend,
+    "openai": OpenAIBackend,
+    "local": LocalBackend,
+    "fake": FakeBackend,
+}
+
+_backends: Dict[str, Backend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None) -> Backend:
+    """Return the process-wide backend `name` (default `LLM_BACKEND`), creating it on first use.
+
+    Raises:
+        ValueError: `name` is not one of `BACKENDS`.
+    """
+    name = name or LLM_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(sorted(BACKENDS))}")
+        with _backends_lock:
+            backend = _backends.setdefault(name, BACKENDS[name]())
+    return backend
+
+
+def set_backend(name: str, backend: Optional[Backend]) -> None:
+    """Replace the process-wide backend `name` (None rebuilds it from the environment on next use)."""
+    with _backends_lock:
+        if backend is None:
+            _backends.pop(name, None)
+        else:
+            _backends[name] = backend
+
+
+def warm_up_backends() -> None:
+    """Load the local model now if the default backend or a route uses it (see `warm_up`)."""
+    from agent.routing import get_router
+
+    router = get_router()
+    names = {LLM_BACKEND} | ({route.backend for route in router.routes.values()} if router else set())
+    if "local" in names and LLM_LOCAL_MODEL_PATH:
+        get_backend("local").model()
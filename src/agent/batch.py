@@ -0,0 +1,226 @@
+"""Batch ticket processing.
+
+Streams tickets from a JSONL file (one `{"id", "subject", "description"}` object
+per line), runs them through the graph with bounded parallelism and appends one
+result line per ticket to an output JSONL file as soon as it finishes. Tickets
+already present in the output without an error are skipped, so an interrupted
+run can simply be restarted with the same arguments; with a checkpointer configured
+(see `agent.checkpoint`), tickets that were mid-run also resume from their last
+completed node.
+
+Usage:
+    python -m agent.batch tickets.jsonl results.jsonl --concurrency 32
+    python -m agent.batch tickets.jsonl results.jsonl --processes 4 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from agent.cache import get_response_cache
+from agent.checkpoint import aclose_checkpointer
+from agent.coalesce import arun_coalesced, get_coalescer
+from agent.graph import ainvoke_ticket
+from agent.metrics import ticket_trace
+from agent.state import new_ticket_state, validate_ticket
+from agent.utils import aclose_async_client
+
+DEFAULT_CONCURRENCY = 16
+
+# Key of the placeholder ticket `read_tickets` yields for a line it cannot parse; the
+# message under it becomes the line's error record.
+INVALID_LINE = "_invalid_line"
+
+
+def read_tickets(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield `(ticket_id, ticket)` pairs from a JSONL file without loading it whole.
+
+    Blank lines are ignored. Tickets without an `id` are identified by their line number.
+    A line that is not a JSON object yields `{INVALID_LINE: <message>}` under its line
+    number, so one bad line gets an error record instead of stopping the run.
+    """
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ticket = json.loads(line)
+            except ValueError as e:
+                yield str(lineno), {INVALID_LINE: f"Invalid JSON on line {lineno}: {e}"}
+                continue
+            if not isinstance(ticket, dict):
+                yield str(lineno), {INVALID_LINE: f"Line {lineno} is not a JSON object."}
+                continue
+            yield str(ticket.get("id", lineno)), ticket
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Return the IDs of tickets that already have a final result in `path`.
+
+    A result is final when it succeeded or the ticket itself is invalid (`"invalid"`
+    records: running it again would fail the same way). Tickets that failed while
+    processing are run again. A torn last line left by a crash, and lines that are not
+    result records, are ignored; a trailing newline is added so that new results start
+    on a fresh line.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            if not record.get("error") or record.get("invalid"):
+                done.add(str(record["id"]))
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    return done
+
+
+def result_record(ticket_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Project the final graph state onto the fields written to the output file."""
+    return {
+        "id": ticket_id,
+        "category": result.get("category"),
+        "approved": result.get("approved", False),
+        "attempt": result.get("attempt", 0),
+        "output": result.get("output"),
+        "feedbacks": result.get("feedbacks", []),
+        "llm_error": result.get("llm_error"),
+    }
+
+
+async def aprocess_ticket(ticket_id: str, ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and run one ticket, returning its result record.
+
+    A ticket that cannot run gets `{"id", "error", "invalid": True}`; one that fails
+    while running gets `{"id", "error"}` and is retried on resume.
+    """
+    if INVALID_LINE in ticket:
+        return {"id": ticket_id, "error": ticket[INVALID_LINE], "invalid": True}
+    subject = ticket.get("subject", "")
+    description = ticket.get("description", "")
+    error = validate_ticket(subject, description)
+    if error:
+        return {"id": ticket_id, "error": error, "invalid": True}
+    try:
+        with ticket_trace(ticket_id):
+            result = await arun_coalesced(
+                subject, description, lambda: ainvoke_ticket(new_ticket_state(subject, description), ticket_id)
+            )
+    except Exception as e:
+        return {"id": ticket_id, "error": f"Error processing ticket: {str(e)}"}
+    return result_record(ticket_id, result)
+
+
+async def arun_batch(input_path: str, output_path: str,
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     resume: bool = True,
+                     progress_every: Optional[int] = None) -> Dict[str, Any]:
+    """Process every ticket in `input_path` and append results to `output_path`.
+
+    Args:
+        input_path (str): JSONL file of tickets.
+        output_path (str): JSONL file results are appended to.
+        concurrency (int): Number of tickets processed at the same time.
+        resume (bool): Skip tickets that already have a successful result in `output_path`.
+        progress_every (Optional[int]): Print throughput to stderr every N tickets.
+
+    Returns:
+        Dict[str, Any]: Run statistics, including `tickets_per_sec`.
+    """
+    done = completed_ids(output_path) if resume else set()
+    queue: asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]] = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"processed": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record = await aprocess_ticket(*item)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                stats["processed"] += 1
+                if record.get("error"):
+                    stats["failed"] += 1
+                if progress_every and stats["processed"] % progress_every == 0:
+                    rate = stats["processed"] / (time.perf_counter() - start)
+                    print(f"{stats['processed']} tickets, {rate:.2f} tickets/sec", file=sys.stderr)  # noqa: T201
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for ticket_id, ticket in read_tickets(input_path):
+                if ticket_id in done:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put((ticket_id, ticket))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await aclose_async_client()
+            await aclose_checkpointer()
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_sec"] = round(elapsed, 3)
+    stats["tickets_per_sec"] = round(stats["processed"] / elapsed, 3) if elapsed > 0 else 0.0
+    if get_coalescer() is not None:
+        stats["coalescing"] = get_coalescer().stats()
+    if get_response_cache() is not None:
+        stats["response_cache"] = get_response_cache().stats()
+    return stats
+
+
+def run_batch(input_path: str, output_path: str, processes: Optional[int] = None,
+              **kwargs: Any) -> Dict[str, Any]:
+    """Blocking wrapper around `arun_batch`.
+
+    With `processes`, tickets are sharded across that many worker processes instead
+    (see `agent.workers`), each running `concurrency` tickets at a time.
+    """
+    if processes:
+        from agent.workers import run_batch_pool
+
+        return run_batch_pool(input_path, output_path, processes, **kwargs)
+    return asyncio.run(arun_batch(input_path, output_path, **kwargs))
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.batch tickets.jsonl results.jsonl`."""
+    parser = argparse.ArgumentParser(description="Run support tickets from a JSONL file through the agent.")
+    parser.add_argument("input", help="JSONL file with one ticket per line")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of tickets processed in parallel")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="shard tickets across N worker processes (0: run in this process)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="overwrite the output instead of skipping completed tickets")
+    parser.add_argument("--progress-every", type=int, default=100,
+                        help="print throughput every N tickets")
+    args = parser.parse_args(argv)
+
+    stats = run_batch(args.input, args.output, processes=args.processes, concurrency=args.concurrency,
+                      resume=not args.no_resume, progress_every=args.progress_every)
+    print(json.dumps(stats))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
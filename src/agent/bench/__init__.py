@@ -0,0 +1,9 @@
+"""Load-testing and benchmark harness.
+
+`mock_server` provides a deterministic OpenAI-compatible inference endpoint, `corpus`
+generates synthetic tickets, `scenarios` defines reviewer behaviours, and `runner`
+drives the graph at increasing concurrency and writes JSON reports.
+
+Usage:
+    python -m agent.bench.runner --scenario all-approve --concurrency 1,8,32 --out bench.json
+"""
@@ -0,0 +1,126 @@
+"""LLM backend benchmark.
+
+Runs the same corpus through each backend of `agent.backends` and reports throughput,
+p50/p99 ticket latency, the mean latency of each node's LLM calls, approval rate and
+category accuracy:
+
+    hf      Hugging Face client against the mock server.
+    openai  Plain OpenAI-compatible HTTP against the same mock server.
+    fake    In-process deterministic answers (the floor: graph overhead only).
+    local   Classification and review on an in-process llama.cpp model, drafting on
+            the mock server. Needs `--local-model` (or LLM_LOCAL_MODEL_PATH) and
+            llama-cpp-python; otherwise it is reported as skipped.
+
+The mock server's latency stands in for a remote model; the local backend's numbers are
+real CPU inference on this machine.
+
+Usage:
+    python -m agent.bench.backends --tickets 200 --concurrency 8 --local-model qwen2.5-1.5b-instruct-q4_k_m.gguf
+"""
+
+import argparse
+import dataclasses
+import importlib.util
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from agent import backends, metrics
+from agent.backends import LocalBackend, set_backend
+from agent.bench.corpus import generate_corpus
+from agent.bench.runner import _run_level, mock_environment, summarize
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.routing import Router, parse_routes, route_stats, set_router
+
+BACKEND_TABLES = {
+    "hf": {"default": {"backend": "hf"}, "classify": {"backend": "hf"}, "review": {"backend": "hf"}},
+    "openai": {"default": {"backend": "openai"}, "classify": {"backend": "openai"}, "review": {"backend": "openai"}},
+    "fake": {"default": {"backend": "fake"}, "classify": {"backend": "fake"}, "review": {"backend": "fake"}},
+    "local": {"default": {"backend": "hf"}, "classify": {"backend": "local"}, "review": {"backend": "local"}},
+}
+
+
+def local_unavailable(model_path: str) -> Optional[str]:
+    """Return why the local backend cannot run here, or None when it can."""
+    if not model_path:
+        return "no model (pass --local-model or set LLM_LOCAL_MODEL_PATH)"
+    if importlib.util.find_spec("llama_cpp") is None:
+        return "llama-cpp-python is not installed (pip install -e .[local])"
+    return None
+
+
+def run_backend_benchmark(scenario: Scenario, concurrency: int = 8, tickets: int = 200,
+                          names: Optional[List[str]] = None, local_model: str = backends.LLM_LOCAL_MODEL_PATH,
+                          local_concurrency: int = backends.LLM_LOCAL_CONCURRENCY,
+                          seed: int = 0) -> Dict[str, Any]:
+    """Measure each backend in `names` (default: all of `BACKEND_TABLES`) under `scenario`."""
+    corpus = generate_corpus(tickets + 10, seed)
+    warm, measured = corpus[:10], corpus[10:]
+    results: Dict[str, Any] = {}
+    with mock_environment(scenario, seed) as server:
+        for name in names or list(BACKEND_TABLES):
+            if name == "local":
+                reason = local_unavailable(local_model)
+                if reason is not None:
+                    results[name] = {"skipped": reason}
+                    print(f"{name:>8} skipped: {reason}", file=sys.stderr)  # noqa: T201
+                    continue
+                set_backend("local", LocalBackend(local_model, local_concurrency))
+            set_router(Router(parse_routes(BACKEND_TABLES[name])))
+            try:
+                # The warm-up also loads the local model, so loading is not measured.
+                _run_level("async", warm, len(warm))
+                server.reset()
+                metrics.reset_metrics()
+                start = time.perf_counter()
+                outcomes = _run_level("async", measured, concurrency)
+                elapsed = time.perf_counter() - start
+            finally:
+                set_router(None)
+            entry = summarize("async", concurrency, outcomes, elapsed, server)
+            routes = route_stats()
+            correct = sum(1 for ticket, (_, result) in zip(measured, outcomes)
+                          if result and result.get("category") == ticket["category"])
+            results[name] = {
+                "tickets_per_sec": entry["tickets_per_sec"],
+                "latency_ms": entry["latency_ms"],
+                "llm_latency_ms": {route: stats["mean_latency_ms"] for route, stats in routes.items()},
+                "llm_calls_per_ticket": round(sum(stats["calls"] for stats in routes.values()) / len(measured), 3),
+                "approval_rate": round(entry["approved"] / len(measured), 3),
+                "category_accuracy": round(correct / len(measured), 3),
+                "failed": entry["failed"],
+            }
+            print(f"{name:>8} {entry['tickets_per_sec']:8.2f} tickets/sec  p99={entry['latency_ms']['p99']:.0f}ms  "  # noqa: T201
+                  f"llm={results[name]['llm_latency_ms']}", file=sys.stderr)
+    for name in ("local", "fake"):
+        set_backend(name, None)
+    return {"scenario": dataclasses.asdict(scenario), "concurrency": concurrency, "tickets": tickets,
+            "results": results}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.backends --backends fake hf`."""
+    parser = argparse.ArgumentParser(description="Compare the LLM backends on the same corpus.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="all-approve")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock (remote) latency in seconds")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKEND_TABLES), help="default: all")
+    parser.add_argument("--local-model", default=backends.LLM_LOCAL_MODEL_PATH, help="GGUF file for the local backend")
+    parser.add_argument("--local-concurrency", type=int, default=backends.LLM_LOCAL_CONCURRENCY)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    scenario = dataclasses.replace(SCENARIOS[args.scenario], latency=args.latency)
+    report = run_backend_benchmark(scenario, args.concurrency, args.tickets, args.backends, args.local_model,
+                                   args.local_concurrency, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Checkpoint write overhead.
+
+Runs the same corpus through the graph without a checkpointer and with the SQLite
+checkpointer (`synchronous=NORMAL` and `FULL`), one ticket at a time against a
+zero-latency mock server so that checkpoint cost is not hidden behind LLM latency.
+Reports per-ticket latency, checkpoint writes and time per write, and stored bytes per
+ticket before and after compaction.
+
+Usage:
+    python -m agent.bench.checkpoint --scenario retry-heavy --tickets 50 --out checkpoint.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from agent.bench.corpus import generate_corpus
+from agent.bench.runner import mock_environment
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.checkpoint import SQLiteCheckpointer
+from agent.graph import compile_graph, invoke_ticket
+from agent.state import new_ticket_state
+
+CONFIGURATIONS = ("none", "sqlite-normal", "sqlite-full")
+
+
+class _Timer:
+    """Accumulates time spent in a checkpointer's write methods."""
+
+    def __init__(self, saver: SQLiteCheckpointer):
+        self.seconds = 0.0
+        self.writes = 0
+        for name in ("put", "put_writes"):
+            setattr(saver, name, self._timed(getattr(saver, name)))
+
+    def _timed(self, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.writes += 1
+        return wrapper
+
+
+def measure(configuration: str, tickets: List[Dict[str, Any]], directory: str) -> Dict[str, Any]:
+    """Run `tickets` sequentially with one checkpointer configuration."""
+    saver = timer = None
+    path = os.path.join(directory, f"{configuration}.sqlite3")
+    if configuration != "none":
+        synchronous = configuration.split("-")[1].upper()
+        saver = SQLiteCheckpointer(path, compact_interval=0, synchronous=synchronous)
+        timer = _Timer(saver)
+    compiled = compile_graph(saver)
+    latencies = []
+    for ticket in tickets:
+        start = time.perf_counter()
+        invoke_ticket(new_ticket_state(ticket["subject"], ticket["description"]), uuid.uuid4().hex, compiled)
+        latencies.append(time.perf_counter() - start)
+    latency = np.array(latencies) * 1000
+    report: Dict[str, Any] = {
+        "checkpointer": configuration,
+        "latency_ms": {"mean": round(float(latency.mean()), 3), "p95": round(float(np.percentile(latency, 95)), 3)},
+    }
+    if saver is not None:
+        report.update({
+            "writes_per_ticket": round(timer.writes / len(tickets), 2),
+            "write_ms": round(timer.seconds / timer.writes * 1000, 3),
+            "checkpoint_ms_per_ticket": round(timer.seconds / len(tickets) * 1000, 3),
+            "stored_bytes_per_ticket": round(saver.stats()["bytes"] / len(tickets)),
+        })
+        saver.compact(ttl_sec=0)
+        report["compacted_bytes_per_ticket"] = round(saver.stats()["bytes"] / len(tickets))
+        saver.close()
+    return report
+
+
+def run_checkpoint_benchmark(scenario: Scenario, tickets: int = 50, seed: int = 0) -> Dict[str, Any]:
+    """Compare checkpointer configurations under `scenario` (latency is forced to zero)."""
+    scenario = Scenario(scenario.name, scenario.review_script, latency=0.0, jitter=0.0,
+                        error_rate=scenario.error_rate)
+    corpus = list(generate_corpus(tickets, seed))
+    results = []
+    with tempfile.TemporaryDirectory() as directory, mock_environment(scenario, seed) as server:
+        measure("none", corpus[:5], directory)  # warm-up
+        for configuration in CONFIGURATIONS:
+            server.reset()  # every configuration sees the same review script
+            results.append(measure(configuration, corpus, directory))
+    baseline = results[0]["latency_ms"]["mean"]
+    for result in results[1:]:
+        result["overhead_ms_per_ticket"] = round(result["latency_ms"]["mean"] - baseline, 3)
+    return {"scenario": scenario.name, "tickets": tickets, "results": results}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.checkpoint --scenario retry-heavy`."""
+    parser = argparse.ArgumentParser(description="Measure checkpoint write overhead per ticket and node.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="retry-heavy")
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    report = run_checkpoint_benchmark(SCENARIOS[args.scenario], args.tickets, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Synthetic ticket corpus.
+
+Tickets are assembled from per-category templates with a seeded RNG, so the same
+`(n, seed)` always yields the same corpus. The output format is the JSONL accepted by
+`agent.batch`.
+
+Usage:
+    python -m agent.bench.corpus tickets.jsonl --tickets 1000 --seed 7
+"""
+
+import argparse
+import json
+import random
+from typing import Dict, List, Optional
+
+from agent.state import MAX_DESCRIPTION_LENGTH, MAX_SUBJECT_LENGTH
+
+TEMPLATES: Dict[str, Dict[str, List[str]]] = {
+    "Billing": {
+        "subjects": ["Refund not received", "Double charge on my card", "Invoice {n} is wrong",
+                     "Subscription renewal charge", "Payment failed at checkout"],
+        "details": ["I was charged twice for order {n}.", "My refund for invoice {n} has not arrived.",
+                    "The amount on my billing statement does not match my plan.",
+                    "I cancelled my subscription but was still charged.", "Please explain the extra fee."],
+    },
+    "Technical": {
+        "subjects": ["App crashes on startup", "Cannot log in", "Error {n} when saving",
+                     "Dashboard is very slow", "Sync stopped working"],
+        "details": ["The app shows error {n} every time I open it.", "Login fails after the latest update.",
+                    "Pages take over a minute to load since yesterday.", "The export button does nothing.",
+                    "I reinstalled twice and the bug is still there."],
+    },
+    "Security": {
+        "subjects": ["Suspicious login alert", "Account may be hacked", "Phishing email received",
+                     "Unauthorized password change", "Unknown device on my account"],
+        "details": ["I got an alert about a login from an unknown location.",
+                    "Someone changed my password without my permission.",
+                    "An email asking for my credentials claims to be from you.",
+                    "There are unauthorized purchases on my account.", "Please lock my account."],
+    },
+    "General": {
+        "subjects": ["Question about your hours", "How do I update my address", "Feature suggestion",
+                     "Where can I find the user guide", "Partnership enquiry {n}"],
+        "details": ["I would like to know when support is available.", "I moved and need to change my details.",
+                    "It would be great to have a dark mode.", "Is there documentation for new users?",
+                    "Who should I contact about working together?"],
+    },
+}
+CATEGORIES = list(TEMPLATES)
+
+
+def generate_ticket(rng: random.Random, ticket_id: str, category: Optional[str] = None) -> Dict[str, str]:
+    """Build one ticket, picking a category at random unless one is given."""
+    category = category or rng.choice(CATEGORIES)
+    template = TEMPLATES[category]
+    n = rng.randint(1000, 9999)
+    subject = rng.choice(template["subjects"]).format(n=n)
+    details = rng.sample(template["details"], k=rng.randint(1, 3))
+    description = " ".join(d.format(n=n) for d in details)
+    return {
+        "id": ticket_id,
+        "subject": f"{subject} #{ticket_id}"[:MAX_SUBJECT_LENGTH],
+        "description": description[:MAX_DESCRIPTION_LENGTH],
+        "category": category,
+    }
+
+
+def generate_corpus(n: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Return `n` deterministic tickets with unique IDs and subjects.
+
+    Args:
+        n (int): Number of tickets.
+        seed (int): RNG seed.
+
+    Returns:
+        List[Dict[str, str]]: Tickets with `id`, `subject`, `description` and the intended `category`.
+    """
+    rng = random.Random(seed)
+    return [generate_ticket(rng, f"t{i:06d}") for i in range(n)]
+
+
+def write_corpus(path: str, n: int, seed: int = 0) -> None:
+    """Write `n` generated tickets to `path` as JSONL."""
+    with open(path, "w", encoding="utf-8") as f:
+        for ticket in generate_corpus(n, seed):
+            f.write(json.dumps(ticket) + "\n")
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.corpus tickets.jsonl --tickets 1000`."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic ticket corpus as JSONL.")
+    parser.add_argument("output")
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_corpus(args.output, args.tickets, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Micro-batching window sweep.
+
+Runs the same corpus through `graph.ainvoke` with micro-batching off and with each
+requested window, against a mock endpoint with a fixed number of slots. That is the
+regime where batching pays off: a batched request holds one slot for all of its
+prompts. Reports throughput (and its gain over no batching), p50/p99 ticket latency,
+HTTP requests per ticket, mean batch size and queueing delay, so the window can be
+tuned against p99 latency.
+
+Usage:
+    python -m agent.bench.microbatch --windows 0,5,10,20 --concurrency 32 --slots 4 --out microbatch.json
+"""
+
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from agent import utils
+from agent.bench.corpus import generate_corpus
+from agent.bench.mock_server import use_chat_template
+from agent.bench.runner import _run_level, mock_environment, summarize
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.microbatch import MicroBatcher
+
+
+def run_microbatch_benchmark(scenario: Scenario, windows_ms: Sequence[float] = (0, 5, 10, 20),
+                             concurrency: int = 32, tickets: int = 200, max_size: int = 16,
+                             seed: int = 0) -> Dict[str, Any]:
+    """Measure each micro-batching window (0 disables batching) under `scenario`."""
+    corpus = generate_corpus(tickets + 10, seed)
+    warm, measured = corpus[:10], corpus[10:]
+    results = []
+    with mock_environment(scenario, seed) as server, use_chat_template():
+        _run_level("async", warm, len(warm))
+        for window in windows_ms:
+            batcher = MicroBatcher(utils._send_batch, window=window / 1000, max_size=max_size) if window else None
+            utils.set_microbatcher(batcher)
+            server.reset()
+            try:
+                start = time.perf_counter()
+                outcomes = _run_level("async", measured, concurrency)
+                elapsed = time.perf_counter() - start
+            finally:
+                utils.set_microbatcher(None)
+                if batcher is not None:
+                    batcher.close()
+            entry = summarize("async", concurrency, outcomes, elapsed, server)
+            result = {
+                "window_ms": window,
+                "tickets_per_sec": entry["tickets_per_sec"],
+                "latency_ms": entry["latency_ms"],
+                "http_requests_per_ticket": entry["llm_calls_per_ticket"],
+                "failed": entry["failed"],
+            }
+            if batcher is not None:
+                stats = batcher.stats()
+                result.update({"mean_batch_size": stats["mean_batch_size"],
+                               "max_batch_size": stats["max_batch_size"],
+                               "queue_delay_ms": stats["queue_delay_ms"]})
+            results.append(result)
+            print(f"window={window:>5}ms {result['tickets_per_sec']:8.2f} tickets/sec  "  # noqa: T201
+                  f"p99={result['latency_ms']['p99']:.0f}ms", file=sys.stderr)
+    baseline = results[0]["tickets_per_sec"]
+    for result in results:
+        result["throughput_gain"] = round(result["tickets_per_sec"] / baseline, 2) if baseline else None
+    return {"scenario": dataclasses.asdict(scenario), "concurrency": concurrency, "tickets": tickets,
+            "max_size": max_size, "results": results}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.microbatch --windows 0,10,20`."""
+    parser = argparse.ArgumentParser(description="Sweep the LLM micro-batching window.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="all-approve")
+    parser.add_argument("--windows", default="0,5,10,20", help="comma-separated windows in ms (0: no batching)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--max-size", type=int, default=16)
+    parser.add_argument("--slots", type=int, default=4, help="requests the mock endpoint serves at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock latency per request in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    scenario = dataclasses.replace(SCENARIOS[args.scenario], latency=args.latency, jitter=0.0, slots=args.slots)
+    windows = [float(w) for w in args.windows.split(",")]
+    report = run_microbatch_benchmark(scenario, windows, args.concurrency, args.tickets, args.max_size, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
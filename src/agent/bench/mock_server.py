@@ -0,0 +1,338 @@
+"""Deterministic mock inference server.
+
+Speaks the OpenAI-compatible `/v1/chat/completions` protocol used by the Hugging Face
+clients (including SSE streaming), plus batched `/v1/completions` requests (a list of
+prompts answered in one response, as TGI/vLLM-style servers accept), and answers the
+agent's prompts from a script:
+classification from keywords, a fixed draft, and a per-ticket sequence of review
+verdicts. Latency, jitter and error rate are configurable and driven by a seeded RNG,
+so runs are reproducible.
+
+Usage:
+    python -m agent.bench.mock_server --port 8080 --latency 0.2 --jitter 0.05
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from agent.backends import FAKE_DRAFT, classify_reply, prompt_kind
+from agent.prompt_budget import count_tokens
+
+DEFAULT_DRAFT = FAKE_DRAFT
+APPROVE = "Approved"
+REJECT = "Escalate\nFeedback: Include specific timelines and a professional closing."
+# Approval phrased so the free-text parser cannot read it (it does not start with "Approved").
+NOISY_APPROVE = "The draft is relevant, complete and professional. Verdict: Approved"
+# What a weak model answers instead of a label or a verdict: neither parser can read them.
+UNUSABLE_LABEL = "This looks like a question about the customer's account."
+UNUSABLE_REVIEW = "The draft reads well overall."
+
+_SUBJECT = re.compile(r"(?:Ticket )?Subject: (.*)")
+
+
+def structured_review(verdict_text: str) -> str:
+    """Render a scripted review verdict as the JSON a schema-constrained model returns."""
+    approved = "Approved" in verdict_text and not verdict_text.startswith("Escalate")
+    feedback = verdict_text.split("Feedback: ", 1)[1] if "Feedback: " in verdict_text else ""
+    scores = (5, 5, 5) if approved else (4, 2, 4)
+    return json.dumps({
+        "verdict": "Approved" if approved else "Escalate",
+        "scores": dict(zip(("relevance", "completeness", "professionalism"), scores)),
+        "feedback": "" if approved else feedback or "Address the issue more completely.",
+    })
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """Scripted chat-completions server.
+
+    Args:
+        latency (float): Mean seconds before answering each request.
+        jitter (float): Uniform +/- jitter in seconds added to the latency.
+        error_rate (float): Probability of answering with HTTP 503 instead.
+        review_script (Sequence[str]): Reviewer replies for a ticket's 1st, 2nd, ... review;
+            the last entry repeats. Requests with a `response_format` get them as JSON.
+        draft (str): Reply to draft prompts.
+        seed (int): Seed for latency jitter and error injection.
+        fault_script (Sequence): Faults for the 1st, 2nd, ... request, after which requests
+            are served normally: an HTTP status to answer with, "hang" to add `hang_seconds`
+            of latency, or None for no fault.
+        failing_models (Iterable[str]): Models that always get HTTP 503.
+        hang_seconds (float): Extra latency of a "hang" fault.
+        slots (Optional[int]): Requests served at the same time, like the batch slots of
+            an inference server; further requests wait. A batched request takes one slot.
+        model_latency (Optional[Dict[str, float]]): Mean latency of specific models,
+            replacing `latency` for them.
+        weak_models (Optional[Dict[str, float]]): Probability, per model, that a classify
+            or review answer is unusable (an off-list label, an unparseable verdict).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, review_script: Sequence[str] = (APPROVE,),
+                 draft: str = DEFAULT_DRAFT, seed: int = 0, fault_script: Sequence[Union[int, str, None]] = (),
+                 failing_models: Iterable[str] = (), hang_seconds: float = 5.0,
+                 slots: Optional[int] = None, model_latency: Optional[Dict[str, float]] = None,
+                 weak_models: Optional[Dict[str, float]] = None):
+        """Bind the server; call `start()` to serve in a background thread."""
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.review_script: List[str] = list(review_script)
+        self.draft = draft
+        self.fault_script = list(fault_script)
+        self.failing_models = set(failing_models)
+        self.hang_seconds = hang_seconds
+        self.slots = threading.BoundedSemaphore(slots) if slots else contextlib.nullcontext()
+        self.model_latency: Dict[str, float] = dict(model_latency or {})
+        self.weak_models: Dict[str, float] = dict(weak_models or {})
+        self.models: Dict[str, int] = {}
+        self.requests = 0
+        self.batched_prompts = 0
+        self.last_batch: List[str] = []
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls: Dict[str, int] = {"classify": 0, "draft": 0, "review": 0, "other": 0}
+        self._reviews: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, e.g. `http://127.0.0.1:8080`."""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def kind(self, prompt: str) -> str:
+        """Return the prompt's kind (classify, review, draft or other)."""
+        return prompt_kind(prompt)
+
+    def reply(self, prompt: str, structured: bool = False) -> str:
+        """Answer `prompt` from the script: keyword label, next review verdict or the draft."""
+        kind = self.kind(prompt)
+        if kind == "classify":
+            return classify_reply(prompt)
+        if kind == "review":
+            match = _SUBJECT.search(prompt)
+            key = match.group(1) if match else prompt
+            with self._lock:
+                attempt = self._reviews.get(key, 0)
+                self._reviews[key] = attempt + 1
+            verdict = self.review_script[min(attempt, len(self.review_script) - 1)]
+            return structured_review(verdict) if structured else verdict
+        return self.draft
+
+    def answer(self, prompt: str, structured: bool = False, model: str = "mock") -> str:
+        """Answer as `model`: unusably at its `weak_models` rate, otherwise with `reply`."""
+        kind = self.kind(prompt)
+        if kind in ("classify", "review") and model in self.weak_models:
+            with self._lock:
+                unusable = self._rng.random() < self.weak_models[model]
+            if unusable:
+                return UNUSABLE_LABEL if kind == "classify" else UNUSABLE_REVIEW
+        return self.reply(prompt, structured)
+
+    def reset(self) -> None:
+        """Clear request counters and per-ticket review progress."""
+        with self._lock:
+            self.requests = self.batched_prompts = self.errors = self.max_in_flight = self.prompt_tokens = 0
+            self.calls = dict.fromkeys(self.calls, 0)
+            self.models.clear()
+            self._reviews.clear()
+
+    def _admit(self, prompts: Sequence[str], model: str = "mock") -> tuple:
+        """Count the request and decide its delay and error status (None to answer normally)."""
+        tokens = sum(count_tokens(prompt) for prompt in prompts)
+        with self._lock:
+            fault = self.fault_script[self.requests] if self.requests < len(self.fault_script) else None
+            self.requests += 1
+            if len(prompts) > 1:
+                self.batched_prompts += len(prompts)
+            self.prompt_tokens += tokens
+            for prompt in prompts:
+                self.calls[self.kind(prompt)] += 1
+            self.models[model] = self.models.get(model, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            latency = self.model_latency.get(model, self.latency)
+            delay = max(0.0, latency + self._rng.uniform(-self.jitter, self.jitter))
+            status = 503 if self._rng.random() < self.error_rate or model in self.failing_models else None
+            if fault == "hang":
+                delay += self.hang_seconds
+            elif fault is not None:
+                status = int(fault)
+            if status is not None:
+                self.errors += 1
+        return delay, status
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self) -> "MockLLMServer":
+        """Serve in a daemon thread and return the server."""
+        threading.Thread(target=self.serve_forever, daemon=True, name="mock-llm").start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server: MockLLMServer = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "messages" not in body:
+            self._complete_batch(server, body)
+            return
+        prompt = body["messages"][-1]["content"]
+        delay, status = server._admit([prompt], body.get("model", "mock"))
+        try:
+            with server.slots:
+                time.sleep(delay)
+            if status is not None:
+                self._send_json(status, {"error": "injected failure"})
+                return
+            content = server.answer(prompt, structured=bool(body.get("response_format")),
+                                   model=body.get("model", "mock"))
+        finally:
+            server._release()
+        if body.get("stream"):
+            self._stream(body, content)
+        else:
+            self._send_json(200, {
+                "id": "mock",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body.get("model", "mock"),
+                "system_fingerprint": "mock",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(content),
+                          "total_tokens": count_tokens(prompt) + count_tokens(content)},
+            })
+
+    def _complete_batch(self, server: MockLLMServer, body: dict) -> None:
+        prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+        server.last_batch = list(prompts)
+        delay, status = server._admit(prompts, body.get("model", "mock"))
+        try:
+            with server.slots:
+                time.sleep(delay)
+            if status is not None:
+                self._send_json(status, {"error": "injected failure"})
+                return
+            texts = [server.answer(prompt, structured=bool(body.get("response_format")), model=body.get("model", "mock"))
+                     for prompt in prompts]
+        finally:
+            server._release()
+        prompt_tokens = sum(count_tokens(prompt) for prompt in prompts)
+        completion_tokens = sum(count_tokens(text) for text in texts)
+        self._send_json(200, {
+            "id": "mock",
+            "object": "text_completion",
+            "created": 0,
+            "model": body.get("model", "mock"),
+            "choices": [{"index": i, "text": text, "finish_reason": "stop"} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body: dict, content: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for token in content.split(" "):
+            chunk = {
+                "id": "mock",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body.get("model", "mock"),
+                "system_fingerprint": "mock",
+                "choices": [{"index": 0, "finish_reason": None,
+                             "delta": {"role": "assistant", "content": token + " "}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+# Mistral-style chat template for batched prompts (see `agent.hf_client.chat_template`).
+MOCK_CHAT_TEMPLATE = "{{ bos_token }}[INST] {{ messages[0]['content'] }} [/INST]"
+
+
+@contextlib.contextmanager
+def use_chat_template(template: str = MOCK_CHAT_TEMPLATE) -> Iterator[None]:
+    """Render batched prompts with `template` for the duration of the block.
+
+    The mock serves any model name, so there is no model repository to take the
+    template from.
+    """
+    from agent import hf_client
+
+    saved = hf_client.LLM_CHAT_TEMPLATE
+    hf_client.LLM_CHAT_TEMPLATE = template
+    hf_client.clear_chat_templates()
+    try:
+        yield
+    finally:
+        hf_client.LLM_CHAT_TEMPLATE = saved
+        hf_client.clear_chat_templates()
+
+
+@contextlib.contextmanager
+def use_endpoint(url: Optional[str]) -> Iterator[None]:
+    """Point the agent's sync and async LLM clients at `url` for the duration of the block."""
+    from agent import utils
+
+    saved = (utils.LLM_BASE_URL, utils._client, utils._async_client)
+    utils.LLM_BASE_URL = url
+    utils._client = utils._async_client = None  # rebuilt against `url` on first use
+    try:
+        yield
+    finally:
+        utils.LLM_BASE_URL, utils._client, utils._async_client = saved
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.mock_server --port 8080`."""
+    parser = argparse.ArgumentParser(description="Run the deterministic mock inference server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = MockLLMServer(args.host, args.port, args.latency, args.jitter, args.error_rate, seed=args.seed)
+    print(f"Mock LLM server listening on {server.url}")  # noqa: T201
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Model routing benchmark.
+
+Runs the same corpus twice against one mock endpoint: with every node on a large
+model, and with a routing table that sends classification and review to a small model
+(re-asking the large one when the small model's answer is unusable). On the mock the
+small model is faster and cheaper, and some of its answers are unusable. Reports
+throughput, p50/p99 ticket latency, approval rate, category accuracy, cost per ticket
+and the per-route stats, so the savings can be checked against quality.
+
+Usage:
+    python -m agent.bench.routing --tickets 200 --concurrency 16 --small-unusable-rate 0.1 --out routing.json
+"""
+
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from agent import metrics
+from agent.bench.corpus import generate_corpus
+from agent.bench.runner import _run_level, mock_environment, summarize
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.routing import Router, parse_routes, route_stats, set_router
+
+LARGE_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+SMALL_MODEL = "Qwen/Qwen2.5-1.5B-Instruct"
+
+
+def routing_tables(large_price: float, small_price: float) -> Dict[str, Dict[str, Any]]:
+    """Return the single-model baseline and the routed configuration, priced per 1K tokens."""
+    large = {"model": LARGE_MODEL, "cost_per_1k_prompt_tokens": large_price,
+             "cost_per_1k_completion_tokens": large_price}
+    small = {"model": SMALL_MODEL, "cost_per_1k_prompt_tokens": small_price,
+             "cost_per_1k_completion_tokens": small_price, "escalate_to": "large"}
+    return {
+        "single-model": {"default": large},
+        "routed": {"default": large, "large": large, "classify": small, "review": small},
+    }
+
+
+def run_routing_benchmark(scenario: Scenario, concurrency: int = 16, tickets: int = 200,
+                          small_latency: float = 0.015, small_unusable_rate: float = 0.1,
+                          large_price: float = 0.0006, small_price: float = 0.0001,
+                          seed: int = 0) -> Dict[str, Any]:
+    """Measure each routing table of `routing_tables` under `scenario`."""
+    corpus = generate_corpus(tickets + 10, seed)
+    warm, measured = corpus[:10], corpus[10:]
+    results = {}
+    with mock_environment(scenario, seed) as server:
+        server.model_latency = {SMALL_MODEL: small_latency}
+        server.weak_models = {SMALL_MODEL: small_unusable_rate}
+        for name, table in routing_tables(large_price, small_price).items():
+            set_router(Router(parse_routes(table)))
+            try:
+                _run_level("async", warm, len(warm))
+                server.reset()
+                metrics.reset_metrics()
+                start = time.perf_counter()
+                outcomes = _run_level("async", measured, concurrency)
+                elapsed = time.perf_counter() - start
+            finally:
+                set_router(None)
+            entry = summarize("async", concurrency, outcomes, elapsed, server)
+            routes = route_stats()
+            correct = sum(1 for ticket, (_, result) in zip(measured, outcomes)
+                          if result and result.get("category") == ticket["category"])
+            results[name] = {
+                "tickets_per_sec": entry["tickets_per_sec"],
+                "latency_ms": entry["latency_ms"],
+                "approval_rate": round(entry["approved"] / len(measured), 3),
+                "category_accuracy": round(correct / len(measured), 3),
+                "llm_calls_per_ticket": entry["llm_calls_per_ticket"],
+                "cost_per_ticket_usd": round(sum(r["cost_usd"] for r in routes.values()) / len(measured), 6),
+                "failed": entry["failed"],
+                "routes": routes,
+            }
+            print(f"{name:>12} {entry['tickets_per_sec']:8.2f} tickets/sec  "  # noqa: T201
+                  f"p99={entry['latency_ms']['p99']:.0f}ms  "
+                  f"cost/ticket=${results[name]['cost_per_ticket_usd']:.6f}", file=sys.stderr)
+    return {"scenario": dataclasses.asdict(scenario), "concurrency": concurrency, "tickets": tickets,
+            "small_latency": small_latency, "small_unusable_rate": small_unusable_rate, "results": results}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.routing --tickets 200`."""
+    parser = argparse.ArgumentParser(description="Compare single-model and routed LLM configurations.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="all-approve")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock latency of the large model in seconds")
+    parser.add_argument("--small-latency", type=float, default=0.015, help="mock latency of the small model")
+    parser.add_argument("--small-unusable-rate", type=float, default=0.1,
+                        help="share of the small model's classify/review answers that are unusable")
+    parser.add_argument("--large-price", type=float, default=0.0006, help="USD per 1K tokens on the large model")
+    parser.add_argument("--small-price", type=float, default=0.0001, help="USD per 1K tokens on the small model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    scenario = dataclasses.replace(SCENARIOS[args.scenario], latency=args.latency)
+    report = run_routing_benchmark(scenario, args.concurrency, args.tickets, args.small_latency,
+                                   args.small_unusable_rate, args.large_price, args.small_price, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+r"""Benchmark runner.
+
+Starts the mock inference server for a scenario, points the agent at it and runs a
+synthetic corpus through `graph.invoke` (thread pool) and/or `graph.ainvoke` (event
+loop) at each requested concurrency level. Per level it records p50/p95/p99 ticket
+latency, throughput, LLM calls per ticket and memory, and writes everything to a JSON
+report. Passing a previous report as `--baseline` prints regressions and exits non-zero.
+
+Usage:
+    python -m agent.bench.runner --scenario retry-heavy --concurrency 1,8,32 \
+        --tickets 200 --mode both --out bench/retry-heavy.json --baseline bench/previous.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+from agent.bench.corpus import generate_corpus
+from agent.bench.mock_server import MockLLMServer, use_endpoint
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.checkpoint import aclose_checkpointer
+from agent.escalation import (
+    EscalationSink,
+    JSONLEscalationBackend,
+    get_escalation_sink,
+    set_escalation_sink,
+)
+from agent.graph import ainvoke_ticket, invoke_ticket
+from agent.state import new_ticket_state
+from agent.utils import aclose_async_client
+
+MODES = ("sync", "async")
+DEFAULT_TOLERANCE = 0.10
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def mock_environment(scenario: Scenario, seed: int = 0) -> Iterator[MockLLMServer]:
+    """Serve `scenario` from a mock server, point the agent at it and divert escalations.
+
+    Escalations go to a throwaway JSONL file so runs never touch the real log.
+    """
+    server = scenario.server(seed).start()
+    previous_sink = get_escalation_sink()
+    with tempfile.TemporaryDirectory() as tmp, use_endpoint(server.url):
+        sink = EscalationSink(JSONLEscalationBackend(os.path.join(tmp, "escalations.jsonl")))
+        set_escalation_sink(sink)
+        try:
+            yield server
+        finally:
+            sink.close()
+            set_escalation_sink(previous_sink)
+            server.stop()
+
+
+def _run_one(ticket: Dict[str, Any]) -> tuple:
+    start = time.perf_counter()
+    try:
+        result = invoke_ticket(new_ticket_state(ticket["subject"], ticket["description"]), uuid.uuid4().hex)
+    except Exception:
+        result = None
+    return time.perf_counter() - start, result
+
+
+async def _arun_one(ticket: Dict[str, Any], limit: asyncio.Semaphore) -> tuple:
+    async with limit:
+        start = time.perf_counter()
+        try:
+            result = await ainvoke_ticket(new_ticket_state(ticket["subject"], ticket["description"]),
+                                          uuid.uuid4().hex)
+        except Exception:
+            result = None
+        return time.perf_counter() - start, result
+
+
+def _run_level(mode: str, tickets: List[Dict[str, Any]], concurrency: int) -> List[tuple]:
+    if mode == "sync":
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(_run_one, tickets))
+
+    async def run() -> List[tuple]:
+        limit = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(*(_arun_one(t, limit) for t in tickets))
+        finally:
+            await aclose_async_client()
+            await aclose_checkpointer()
+
+    return asyncio.run(run())
+
+
+def summarize(mode: str, concurrency: int, outcomes: List[tuple], elapsed: float,
+              server: MockLLMServer) -> Dict[str, Any]:
+    """Reduce per-ticket `(latency_sec, final_state)` pairs to one report entry."""
+    latencies = np.array([latency for latency, _ in outcomes]) * 1000
+    results = [result for _, result in outcomes]
+    failed = sum(1 for r in results if r is None or str(r.get("output", "")).startswith("Error"))
+    n = len(outcomes)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "tickets": n,
+        "failed": failed,
+        "approved": sum(1 for r in results if r and r.get("approved")),
+        "retry_rate": round(sum(1 for r in results if r and len(r.get("drafts", [])) > 1) / n, 3),
+        "drafts_per_ticket": round(sum(len(r.get("drafts", [])) for r in results if r) / n, 3),
+        "escalated": sum(1 for r in results if r and not r.get("approved")),
+        "elapsed_sec": round(elapsed, 3),
+        "tickets_per_sec": round(n / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "p99": round(float(np.percentile(latencies, 99)), 2),
+            "max": round(float(latencies.max()), 2),
+        },
+        "llm_calls": dict(server.calls),
+        "llm_calls_per_ticket": round(server.requests / n, 3),
+        "prompt_tokens_per_ticket": round(server.prompt_tokens / n, 1),
+        "llm_errors": server.errors,
+        "llm_max_in_flight": server.max_in_flight,
+    }
+
+
+def run_benchmark(scenario: Scenario, concurrency_levels: Sequence[int], tickets: int = 100,
+                  modes: Sequence[str] = MODES, seed: int = 0, warmup: int = 5,
+                  trace_memory: bool = False) -> Dict[str, Any]:
+    """Run `scenario` at each concurrency level and return the report.
+
+    Args:
+        scenario (Scenario): Mock endpoint behaviour.
+        concurrency_levels (Sequence[int]): Tickets in flight, one measurement per level.
+        tickets (int): Tickets per level.
+        modes (Sequence[str]): "sync" (`graph.invoke`) and/or "async" (`graph.ainvoke`).
+        seed (int): Seed for the corpus and the mock server.
+        warmup (int): Tickets run (and discarded) before measuring each mode.
+        trace_memory (bool): Record the Python heap peak with tracemalloc (slows the run).
+
+    Returns:
+        Dict[str, Any]: Report with run metadata and one entry per (mode, concurrency).
+    """
+    corpus = generate_corpus(tickets + warmup, seed)
+    warm, measured = corpus[:warmup], corpus[warmup:]
+    results = []
+    with mock_environment(scenario, seed) as server:
+        for mode in modes:
+            if warm:
+                _run_level(mode, warm, len(warm))
+            for concurrency in concurrency_levels:
+                server.reset()
+                if trace_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                outcomes = _run_level(mode, measured, concurrency)
+                elapsed = time.perf_counter() - start
+                entry = summarize(mode, concurrency, outcomes, elapsed, server)
+                if trace_memory:
+                    entry["py_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                    tracemalloc.stop()
+                entry["max_rss_mb"] = _max_rss_mb()
+                results.append(entry)
+                print(f"{mode:5s} c={concurrency:<4d} {entry['tickets_per_sec']:8.2f} tickets/sec  "  # noqa: T201
+                      f"p50={entry['latency_ms']['p50']:.0f}ms p95={entry['latency_ms']['p95']:.0f}ms "
+                      f"p99={entry['latency_ms']['p99']:.0f}ms", file=sys.stderr)
+
+    try:
+        version = metadata.version("support-agent")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "version": version,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": asdict(scenario),
+        "tickets": tickets,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """List regressions of `current` against `baseline`.
+
+    A level regresses when its p95 latency grows, or its throughput drops, by more
+    than `tolerance` (a fraction). Levels missing from either report are ignored.
+    """
+    before = {(r["mode"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for entry in current.get("results", []):
+        key = (entry["mode"], entry["concurrency"])
+        old = before.get(key)
+        if old is None:
+            continue
+        label = f"{key[0]} c={key[1]}"
+        old_p95, new_p95 = old["latency_ms"]["p95"], entry["latency_ms"]["p95"]
+        if old_p95 > 0 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{label}: p95 latency {old_p95:.1f}ms -> {new_p95:.1f}ms")
+        old_tps, new_tps = old["tickets_per_sec"], entry["tickets_per_sec"]
+        if new_tps < old_tps * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old_tps:.2f} -> {new_tps:.2f} tickets/sec")
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.runner --scenario ... --out report.json`."""
+    parser = argparse.ArgumentParser(description="Benchmark the support agent against a mock LLM endpoint.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="all-approve")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--tickets", type=int, default=100, help="tickets per level")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both")
+    parser.add_argument("--latency", type=float, help="override the scenario's mean latency (seconds)")
+    parser.add_argument("--jitter", type=float, help="override the scenario's latency jitter (seconds)")
+    parser.add_argument("--error-rate", type=float, help="override the scenario's error rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--trace-memory", action="store_true", help="record the Python heap peak")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    scenario = SCENARIOS[args.scenario]
+    overrides = {k: v for k, v in (("latency", args.latency), ("jitter", args.jitter),
+                                   ("error_rate", args.error_rate)) if v is not None}
+    if overrides:
+        scenario = Scenario(**{**asdict(scenario), **overrides})
+    report = run_benchmark(
+        scenario,
+        [int(c) for c in args.concurrency.split(",")],
+        tickets=args.tickets,
+        modes=MODES if args.mode == "both" else (args.mode,),
+        seed=args.seed,
+        warmup=args.warmup,
+        trace_memory=args.trace_memory,
+    )
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)  # noqa: T201
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)  # noqa: T201
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Worker pool throughput scaling.
+
+Runs the same corpus through `agent.workers.WorkerPool` with 1..N processes against
+one mock server and reports throughput, speedup over one process and parallel
+efficiency. Worker start-up (interpreter, imports, `warm_up`) is timed separately and
+is not part of the throughput numbers. Keep the mock latency low to measure the
+CPU-bound part; with a real endpoint a single process already overlaps LLM latency
+with asyncio.
+
+Usage:
+    python -m agent.bench.scaling --scenario all-approve --processes 1,2,4 --tickets 400 --out scaling.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from agent.bench.corpus import generate_corpus
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.workers import WorkerPool
+
+
+@contextlib.contextmanager
+def _worker_environment(url: str) -> Iterator[None]:
+    """Point worker processes at the mock server and keep their escalations out of the real log."""
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides = {
+            "HUGGINGFACE_BASE_URL": url,
+            "ESCALATION_BACKEND": "jsonl",
+            "ESCALATION_LOG_PATH": os.path.join(tmp, "escalations.jsonl"),
+            "CHECKPOINT_BACKEND": "none",
+        }
+        saved = {key: os.environ.get(key) for key in overrides}
+        os.environ.update(overrides)
+        try:
+            yield
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def measure(processes: int, corpus: Sequence[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Run `corpus` on a pool of `processes` workers."""
+    tickets = [(f"t{i}", ticket) for i, ticket in enumerate(corpus)]
+    start = time.perf_counter()
+    with WorkerPool(processes, concurrency) as pool:
+        # One ticket per worker so that every worker is up before the clock starts.
+        list(pool.map((f"warm-{i}", corpus[i % len(corpus)]) for i in range(processes)))
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        records = list(pool.map(tickets))
+        elapsed = time.perf_counter() - start
+        stats = pool.stats()
+    return {
+        "processes": processes,
+        "startup_sec": round(startup, 3),
+        "elapsed_sec": round(elapsed, 3),
+        "tickets_per_sec": round(len(records) / elapsed, 2),
+        "errors": sum(1 for record in records if record.get("error")),
+        "restarts": stats["restarts"],
+    }
+
+
+def run_scaling_benchmark(scenario: Scenario, processes: Sequence[int] = (1, 2, 4), tickets: int = 400,
+                          concurrency: int = 16, seed: int = 0) -> Dict[str, Any]:
+    """Measure throughput for each pool size in `processes`."""
+    corpus = list(generate_corpus(tickets, seed))
+    server = scenario.server(seed).start()
+    results = []
+    try:
+        with _worker_environment(server.url):
+            for n in processes:
+                server.reset()
+                result = measure(n, corpus, concurrency)
+                result["llm_requests_per_ticket"] = round(server.requests / (tickets + n), 2)
+                results.append(result)
+    finally:
+        server.stop()
+    baseline = results[0]["tickets_per_sec"] / results[0]["processes"]
+    for result in results:
+        result["speedup"] = round(result["tickets_per_sec"] / baseline, 2)
+        result["efficiency"] = round(result["speedup"] / result["processes"], 2)
+    return {"scenario": scenario.name, "tickets": tickets, "concurrency": concurrency,
+            "cpus": os.cpu_count(), "results": results}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.scaling --processes 1,2,4,8`."""
+    parser = argparse.ArgumentParser(description="Measure worker pool throughput from 1 to N processes.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="all-approve")
+    parser.add_argument("--processes", default="1,2,4", help="comma-separated pool sizes")
+    parser.add_argument("--tickets", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16, help="tickets in flight per process")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock endpoint latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    base = SCENARIOS[args.scenario]
+    scenario = Scenario(base.name, base.review_script, latency=args.latency, jitter=0.0,
+                        error_rate=base.error_rate)
+    processes = [int(n) for n in args.processes.split(",")]
+    report = run_scaling_benchmark(scenario, processes, args.tickets, args.concurrency, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark scenarios: how the mock reviewer and endpoint behave during a run."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from agent.bench.mock_server import APPROVE, NOISY_APPROVE, REJECT, MockLLMServer
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Mock endpoint behaviour for one benchmark run.
+
+    Attributes:
+        name (str): Scenario identifier.
+        review_script (Tuple[str, ...]): Reviewer replies per review attempt (last one repeats).
+        latency (float): Mean endpoint latency in seconds.
+        jitter (float): Uniform +/- latency jitter in seconds.
+        error_rate (float): Fraction of requests answered with HTTP 503.
+        slots (Optional[int]): Requests the endpoint serves at once (None: unlimited).
+    """
+
+    name: str
+    review_script: Tuple[str, ...] = field(default=(APPROVE,))
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    slots: Optional[int] = None
+
+    def server(self, seed: int = 0) -> MockLLMServer:
+        """Create (but do not start) a mock server configured for this scenario."""
+        return MockLLMServer(latency=self.latency, jitter=self.jitter, error_rate=self.error_rate,
+                             review_script=self.review_script, seed=seed, slots=self.slots)
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    # Every first draft is approved: classify -> draft -> review.
+    "all-approve": Scenario("all-approve"),
+    # Two rejections before approval: exercises the retry loop on every ticket.
+    "retry-heavy": Scenario("retry-heavy", review_script=(REJECT, REJECT, APPROVE)),
+    # The reviewer never approves: every ticket escalates and hits the escalation sink.
+    "escalation-storm": Scenario("escalation-storm", review_script=(REJECT,)),
+    # The reviewer approves in prose the free-text parser misreads as a rejection.
+    "noisy-review": Scenario("noisy-review", review_script=(NOISY_APPROVE,)),
+    # All-approve against a flaky endpoint.
+    "flaky": Scenario("flaky", error_rate=0.05),
+}
@@ -0,0 +1,102 @@
+"""Cold-start import cost.
+
+Imports each entry point in a fresh interpreter with `python -X importtime` and reports
+the import time (median over runs, measured inside the child so interpreter start-up is
+excluded), which heavy packages the import pulled in, and the slowest imports by
+cumulative time. `IMPORT_TARGETS_MS` holds the budgets checked by the test suite.
+
+Usage:
+    python -m agent.bench.startup --runs 5 --out startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+TARGETS = ("agent", "agent.metrics", "agent.graph", "agent.server", "agent.app")
+HEAVY_PACKAGES = ("langgraph", "langchain", "huggingface_hub", "gradio", "fastapi", "numpy")
+IMPORT_TARGETS_MS = {"agent": 100, "agent.metrics": 300, "agent.graph": 2000}
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+print(",".join(p for p in {heavy!r} if p in sys.modules))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` output into `{"module", "self_us", "cumulative_us", "depth"}` rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return rows
+
+
+def _subtree(rows: List[Dict[str, Any]], module: str) -> List[Dict[str, Any]]:
+    """Return the rows imported on behalf of `module` (importtime lists children before parents)."""
+    end = max(i for i, r in enumerate(rows) if r["module"] == module and r["depth"] == 0)
+    start = end
+    while start > 0 and rows[start - 1]["depth"] > 0:
+        start -= 1
+    return rows[start:end]
+
+
+def measure_import(module: str, runs: int = 3, top: int = 10) -> Dict[str, Any]:
+    """Import `module` in `runs` fresh interpreters and summarize the cost."""
+    times, heavy, rows = [], [], []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_PACKAGES)],
+            capture_output=True, text=True, check=True,
+        )
+        elapsed, loaded = proc.stdout.split("\n")[:2]
+        times.append(float(elapsed))
+        heavy = [p for p in loaded.split(",") if p]
+        rows = parse_importtime(proc.stderr)
+    slowest = sorted((r for r in _subtree(rows, module) if r["depth"] <= 2),
+                     key=lambda r: r["cumulative_us"], reverse=True)[:top]
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(times), 1),
+        "target_ms": IMPORT_TARGETS_MS.get(module),
+        "heavy_packages": heavy,
+        "slowest": [{"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)} for r in slowest],
+    }
+
+
+def run_startup_benchmark(modules: Sequence[str] = TARGETS, runs: int = 3) -> Dict[str, Any]:
+    """Measure every module in `modules`."""
+    return {"python": sys.version.split()[0], "runs": runs,
+            "results": [measure_import(module, runs) for module in modules]}
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.startup --runs 5`."""
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the agent's entry points.")
+    parser.add_argument("modules", nargs="*", default=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    report = run_startup_benchmark(args.modules, args.runs)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
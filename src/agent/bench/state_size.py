@@ -0,0 +1,90 @@
+"""Per-ticket graph state size and serialization cost.
+
+Runs a corpus through the graph under a mock scenario, and serializes the state after
+every step with LangGraph's checkpoint serializer, i.e. the bytes a checkpointer would
+write for the ticket. Reports final state bytes, total checkpointed bytes and
+serialization time per ticket.
+
+Usage:
+    python -m agent.bench.state_size --scenario escalation-storm --tickets 50 --out state.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import numpy as np
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.bench.corpus import generate_corpus
+from agent.bench.runner import mock_environment
+from agent.bench.scenarios import SCENARIOS, Scenario
+from agent.checkpoint import ticket_config
+from agent.graph import graph
+from agent.state import new_ticket_state
+
+
+def measure_ticket(ticket: Dict[str, Any], serde: JsonPlusSerializer) -> Dict[str, float]:
+    """Run one ticket and measure the serialized size of the state after every step."""
+    final_bytes = total_bytes = 0
+    seconds = 0.0
+    state: Dict[str, Any] = {}
+    config = ticket_config(uuid.uuid4().hex)
+    for state in graph.stream(new_ticket_state(ticket["subject"], ticket["description"]), config,
+                              stream_mode="values"):
+        start = time.perf_counter()
+        _, data = serde.dumps_typed(state)
+        seconds += time.perf_counter() - start
+        final_bytes = len(data)
+        total_bytes += final_bytes
+    return {
+        "final_bytes": final_bytes,
+        "checkpoint_bytes": total_bytes,
+        "serialize_ms": seconds * 1000,
+        "messages": len(state.get("messages", [])),
+    }
+
+
+def run_state_benchmark(scenario: Scenario, tickets: int = 50, seed: int = 0) -> Dict[str, Any]:
+    """Measure state size for `tickets` tickets under `scenario` (latency is forced to zero)."""
+    scenario = Scenario(scenario.name, scenario.review_script, latency=0.0, jitter=0.0,
+                        error_rate=scenario.error_rate)
+    serde = JsonPlusSerializer()
+    with mock_environment(scenario, seed):
+        samples = [measure_ticket(t, serde) for t in generate_corpus(tickets, seed)]
+
+    def stats(key: str) -> Dict[str, float]:
+        values = np.array([s[key] for s in samples], dtype=float)
+        return {"mean": round(float(values.mean()), 2), "max": round(float(values.max()), 2)}
+
+    return {
+        "scenario": scenario.name,
+        "tickets": tickets,
+        "final_state_bytes": stats("final_bytes"),
+        "checkpoint_bytes_per_ticket": stats("checkpoint_bytes"),
+        "serialize_ms_per_ticket": stats("serialize_ms"),
+        "messages_per_ticket": stats("messages"),
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.bench.state_size --scenario escalation-storm`."""
+    parser = argparse.ArgumentParser(description="Measure per-ticket graph state size.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="escalation-storm")
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+    report = run_state_benchmark(SCENARIOS[args.scenario], args.tickets, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
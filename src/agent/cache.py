@@ -0,0 +1,303 @@
+"""Response cache for approved drafts.
+
+Near-duplicate tickets ("charged twice", "can't log in") keep asking for the same
+answer. Approved drafts are cached under `(category, normalized subject + description)`;
+lookups try an exact hash match first and, if a similarity threshold is configured,
+fall back to the closest cached ticket of the same category by cosine similarity of
+local hashed n-gram embeddings. A hit lets the graph skip both `generate_draft` and
+`review_draft`.
+
+Configuration (environment):
+    RESPONSE_CACHE_BACKEND: "memory", "sqlite" or unset/"none" to disable.
+    RESPONSE_CACHE_PATH: SQLite file (default "response_cache.sqlite3").
+    RESPONSE_CACHE_TTL: Entry lifetime in seconds (default 86400, 0 disables expiry).
+    RESPONSE_CACHE_MAX_ENTRIES: LRU capacity (default 10000).
+    RESPONSE_CACHE_SIMILARITY: Cosine threshold for similarity hits, e.g. 0.9 (unset disables).
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from agent.metrics import RESPONSE_CACHE_EVICTIONS, RESPONSE_CACHE_LOOKUPS
+
+# Each hit saves one draft and at least one review call.
+LLM_CALLS_PER_HIT = 2
+
+EMBEDDING_DIM = 512
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(subject: str, description: str) -> str:
+    """Lowercase the ticket text and collapse punctuation and whitespace."""
+    return _NON_WORD.sub(" ", f"{subject} {description}".lower()).strip()
+
+
+def cache_key(category: str, text: str) -> str:
+    """Return the exact-match key for a normalized ticket text within a category."""
+    return hashlib.sha256(f"{category}\x00{text}".encode()).hexdigest()
+
+
+def hashed_embedding(text: str, dim: int = EMBEDDING_DIM):
+    """Embed text as an L2-normalized bag of hashed words, word bigrams and character trigrams.
+
+    Deterministic and dependency-light (NumPy only), which is enough to catch reworded
+    duplicates without a model download.
+    """
+    import numpy as np
+
+    words = text.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    features += [text[i:i + 3] for i in range(len(text) - 2)]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CacheEntry:
+    """An approved draft stored under its ticket's category and normalized text."""
+    key: str
+    category: str
+    text: str
+    draft: str
+    vector: Optional[bytes] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class InMemoryCacheBackend:
+    """Thread-safe LRU + TTL store kept in process memory."""
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        """Keep at most `max_entries` entries, each for `ttl` seconds (None: no expiry)."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return bool(self.ttl) and time.time() - entry.created_at > self.ttl
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the live entry stored under `key`, marking it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, entry: CacheEntry) -> int:
+        """Store an entry and return the number of entries evicted to make room."""
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def candidates(self, category: str) -> List[CacheEntry]:
+        """Return the live entries of `category`, for similarity search."""
+        with self._lock:
+            return [e for e in self._entries.values() if e.category == category and not self._expired(e)]
+
+    def __len__(self) -> int:
+        """Return the number of stored entries, including expired ones not yet removed."""
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU + TTL store persisted in a SQLite file, shareable across processes."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None):
+        """Open (or create) the cache table in the SQLite file at `path`."""
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, category TEXT NOT NULL, text TEXT NOT NULL, draft TEXT NOT NULL,"
+            " vector BLOB, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_category ON response_cache (category)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl if self.ttl else float("-inf")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the live entry stored under `key`, marking it recently used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, category, text, draft, vector, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[5] < self._cutoff():
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return CacheEntry(*row)
+
+    def put(self, entry: CacheEntry) -> int:
+        """Store an entry and return the number of entries evicted to make room."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.key, entry.category, entry.text, entry.draft, entry.vector, entry.created_at, time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE key IN "
+                    "(SELECT key FROM response_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+            return max(overflow, 0)
+
+    def candidates(self, category: str) -> List[CacheEntry]:
+        """Return the live entries of `category`, for similarity search."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, category, text, draft, vector, created_at FROM response_cache"
+                " WHERE category = ? AND created_at >= ?",
+                (category, self._cutoff()),
+            ).fetchall()
+        return [CacheEntry(*row) for row in rows]
+
+    def __len__(self) -> int:
+        """Return the number of stored entries, including expired ones not yet removed."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Exact-then-similar lookup of approved drafts with hit/miss accounting."""
+
+    def __init__(self, backend, similarity_threshold: Optional[float] = None,
+                 embed: Callable[[str], Any] = hashed_embedding):
+        """Wrap `backend`; similar lookups need `similarity_threshold`."""
+        self.backend = backend
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def lookup(self, category: str, subject: str, description: str) -> Optional[CacheEntry]:
+        """Return a cached approved draft for the ticket, or None on a miss."""
+        text = normalize_text(subject, description)
+        entry = self.backend.get(cache_key(category, text))
+        if entry is not None:
+            self._count("exact_hits")
+            RESPONSE_CACHE_LOOKUPS.inc(result="exact_hit")
+            return entry
+
+        if self.similarity_threshold is not None:
+            entry = self._nearest(category, text)
+            if entry is not None:
+                self._count("similar_hits")
+                RESPONSE_CACHE_LOOKUPS.inc(result="similar_hit")
+                return entry
+
+        self._count("misses")
+        RESPONSE_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    def _nearest(self, category: str, text: str) -> Optional[CacheEntry]:
+        import numpy as np
+
+        candidates = [e for e in self.backend.candidates(category) if e.vector is not None]
+        if not candidates:
+            return None
+        matrix = np.frombuffer(b"".join(e.vector for e in candidates), dtype=np.float32).reshape(len(candidates), -1)
+        scores = matrix @ self.embed(text)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        # Re-read through the backend so the hit refreshes its LRU position.
+        return self.backend.get(candidates[best].key)
+
+    def store(self, category: str, subject: str, description: str, draft: str) -> None:
+        """Cache an approved draft for the ticket."""
+        text = normalize_text(subject, description)
+        vector = None
+        if self.similarity_threshold is not None:
+            vector = self.embed(text).astype("float32").tobytes()
+        evicted = self.backend.put(CacheEntry(cache_key(category, text), category, text, draft, vector))
+        self._count("stores")
+        self._count("evictions", evicted)
+        if evicted:
+            RESPONSE_CACHE_EVICTIONS.inc(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, the hit rate and the estimated LLM calls saved."""
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats["exact_hits"] + stats["similar_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["llm_calls_saved"] = hits * LLM_CALLS_PER_HIT
+        stats["entries"] = len(self.backend)
+        return stats
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """Build the response cache described by the RESPONSE_CACHE_* environment variables."""
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "none").lower()
+    if backend_name in ("", "none", "off"):
+        return None
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "86400")) or None
+    if backend_name == "memory":
+        backend = InMemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    elif backend_name == "sqlite":
+        path = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+        backend = SQLiteCacheBackend(path, max_entries=max_entries, ttl=ttl)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend_name}")
+    threshold = os.getenv("RESPONSE_CACHE_SIMILARITY")
+    return ResponseCache(backend, similarity_threshold=float(threshold) if threshold else None)
+
+
+_response_cache: Optional[ResponseCache] = None
+_configured = False
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled."""
+    global _response_cache, _configured
+    if not _configured:
+        _response_cache = cache_from_env()
+        _configured = True
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replace the process-wide response cache (None disables caching)."""
+    global _response_cache, _configured
+    _response_cache = cache
+    _configured = True
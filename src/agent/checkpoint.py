@@ -0,0 +1,481 @@
+"""Durable graph checkpoints keyed by ticket ID and content.
+
+With a checkpointer configured, LangGraph saves the state after every node under the
+ticket's `thread_id`: its ID plus a digest of its subject and description, so an ID
+reused for a different ticket (line numbers of another batch file, a client's own IDs)
+starts a fresh run instead of returning the other ticket's result. A ticket interrupted mid-run (worker crash, deploy, deadline) is
+resumed from its last completed node by `invoke_ticket`/`ainvoke_ticket` in
+`agent.graph` instead of starting again from `classify`, and a finished ticket returns
+its saved result without new LLM calls.
+
+`SQLiteCheckpointer` stores each checkpoint with only the channels that changed in that
+step (as LangGraph's in-memory saver does), so a node's write is a few small rows. Old
+checkpoints of a ticket are pruned and expired tickets deleted by `compact()`, which
+also runs periodically in a background thread, off the request path.
+
+Configuration (environment):
+    CHECKPOINT_BACKEND: "none" (default), "memory", "sqlite" or "postgres" (needs the
+        optional `langgraph-checkpoint-postgres` package and CHECKPOINT_URL; async runs
+        get an `AsyncPostgresSaver` per event loop, see `aget_checkpointer`).
+    CHECKPOINT_PATH: SQLite database (default: `checkpoints.sqlite3` at the project root).
+    CHECKPOINT_URL: Postgres connection string.
+    CHECKPOINT_TTL_SEC: Tickets untouched for this long are deleted (default 7 days; 0 keeps all).
+    CHECKPOINT_KEEP: Checkpoints kept per ticket by compaction (default 1, the latest).
+    CHECKPOINT_COMPACT_INTERVAL: Seconds between automatic compactions (default 300).
+    CHECKPOINT_SYNCHRONOUS: SQLite `synchronous` pragma (default NORMAL: durable across
+        process crashes, may lose the last commits on power loss; FULL fsyncs every write).
+"""
+
+import asyncio
+import atexit
+import contextlib
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from agent.escalation import PROJECT_ROOT
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "none").lower()
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH") or os.path.join(PROJECT_ROOT, "checkpoints.sqlite3")
+CHECKPOINT_TTL_SEC = float(os.getenv("CHECKPOINT_TTL_SEC", str(7 * 24 * 3600)))
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "1"))
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL", "300"))
+CHECKPOINT_SYNCHRONOUS = os.getenv("CHECKPOINT_SYNCHRONOUS", "NORMAL").upper()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    parent_id TEXT, checkpoint_type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    created REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL,
+    type TEXT, blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints (created);
+"""
+
+
+def ticket_thread_id(ticket_id: str, ticket: Optional[Dict[str, str]] = None) -> str:
+    """Return the checkpoint thread of a ticket: its ID and a digest of `ticket`'s text."""
+    if ticket is None:
+        return str(ticket_id)
+    text = f"{ticket.get('subject', '')}\0{ticket.get('description', '')}"
+    return f"{ticket_id}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def ticket_config(ticket_id: str, ticket: Optional[Dict[str, str]] = None) -> RunnableConfig:
+    """Graph config that checkpoints a run under `ticket_thread_id(ticket_id, ticket)`."""
+    return {"configurable": {"thread_id": ticket_thread_id(ticket_id, ticket)}}
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """LangGraph checkpoint saver backed by a single SQLite file (WAL mode).
+
+    Args:
+        path (str): Database file (":memory:" for a throwaway store).
+        ttl_sec (float): Tickets whose latest checkpoint is older are deleted by `compact`.
+        keep (int): Checkpoints kept per ticket by `compact`.
+        compact_interval (float): Seconds between compactions by the background thread
+            (0 disables it).
+        synchronous (str): SQLite `synchronous` pragma.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, ttl_sec: float = CHECKPOINT_TTL_SEC,
+                 keep: int = CHECKPOINT_KEEP, compact_interval: float = CHECKPOINT_COMPACT_INTERVAL,
+                 synchronous: str = CHECKPOINT_SYNCHRONOUS, serde=None):
+        """Open (or create) the database and start the compaction thread."""
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.keep = max(1, keep)
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(_SCHEMA)
+        self.compact_errors = 0
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        if compact_interval:
+            self._compactor = threading.Thread(target=self._compact_loop, daemon=True, name="checkpoint-compactor")
+            self._compactor.start()
+
+    def close(self) -> None:
+        """Stop the compaction thread and close the connection."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[sqlite3.Connection]:
+        """Hold the lock and an immediate transaction, so reads and writes see no interleaved `put`."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _transaction(self, statements: Sequence[Tuple[str, Sequence]]) -> None:
+        with self._locked() as conn:
+            for sql, rows in statements:
+                if rows:
+                    conn.executemany(sql, rows)
+
+    def _query(self, sql: str, params: Sequence = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # -- reads ---------------------------------------------------------------------
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, checkpoint_type, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint: Checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+        versions = checkpoint["channel_versions"]
+        values: Dict[str, Any] = {}
+        if versions:
+            pairs = [item for channel, version in versions.items() for item in (channel, str(version))]
+            blobs = self._query(
+                "SELECT channel, type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?"
+                f" AND ({' OR '.join(['(channel = ? AND version = ?)'] * len(versions))})",
+                (thread_id, checkpoint_ns, *pairs),
+            )
+            for channel, type_, blob in blobs:
+                if type_ != "empty":
+                    values[channel] = self.serde.loads_typed((type_, blob))
+        writes = self._query(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ?"
+            " AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+        def config(cid: str) -> RunnableConfig:
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((type_, value)))
+                            for task_id, channel, type_, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the checkpoint named by `config` (the latest of its thread by default)."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        sql = ("SELECT checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata"
+               " FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        params: Tuple = (thread_id, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            sql += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            sql += " ORDER BY checkpoint_id DESC LIMIT 1"
+        rows = self._query(sql, params)
+        return self._tuple(thread_id, checkpoint_ns, rows[0]) if rows else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """Yield the matching checkpoints, newest first."""
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_type, checkpoint,"
+               " metadata_type, metadata FROM checkpoints")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY checkpoint_id DESC"
+        for thread_id, checkpoint_ns, *row in self._query(sql, params):
+            item = self._tuple(thread_id, checkpoint_ns, tuple(row))
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    # -- writes --------------------------------------------------------------------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        """Store a checkpoint and return the config that names it."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._transaction([
+            ("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs),
+            ("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(
+                thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, time.time(),
+            )]),
+        ])
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        """Store the pending writes of a task for the checkpoint in `config`."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, blob, task_path))
+        # Special channels (errors, interrupts; negative idx) overwrite; regular writes are kept once.
+        self._transaction([
+            ("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for r in rows if r[4] < 0]),
+            ("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for r in rows if r[4] >= 0]),
+        ])
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of `thread_id`."""
+        self._transaction([(f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,)])
+                           for table in ("checkpoints", "blobs", "writes")])
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Return the channel version after `current`, as a sortable string."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- async (SQLite calls run in a worker thread) -------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Async version of `get_tuple`, run in a worker thread."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+        """Async version of `list`, run in a worker thread."""
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        """Async version of `put`, run in a worker thread."""
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        """Async version of `put_writes`, run in a worker thread."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Async version of `delete_thread`, run in a worker thread."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # -- compaction ----------------------------------------------------------------
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of tickets, rows per table and stored payload bytes."""
+        stats = {"threads": self._query("SELECT COUNT(DISTINCT thread_id) FROM checkpoints")[0][0]}
+        payload = {"checkpoints": "LENGTH(checkpoint) + LENGTH(metadata)", "blobs": "LENGTH(blob)",
+                   "writes": "LENGTH(value)"}
+        stats["bytes"] = 0
+        for table, size in payload.items():
+            rows, size = self._query(f"SELECT COUNT(*), COALESCE(SUM({size}), 0) FROM {table}")[0]
+            stats[table] = rows
+            stats["bytes"] += size
+        return stats
+
+    def _compact_loop(self) -> None:
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except sqlite3.Error:
+                # Never take the compactor down; the next round tries again.
+                self.compact_errors += 1
+
+    def compact(self, ttl_sec: Optional[float] = None, keep: Optional[int] = None) -> Dict[str, int]:
+        """Delete expired tickets and all but the latest `keep` checkpoints of the others.
+
+        Pending writes of pruned checkpoints and channel values no kept checkpoint refers
+        to are deleted with them.
+
+        Returns:
+            Dict[str, int]: Number of deleted `threads`, `checkpoints`, `blobs` and `writes`.
+        """
+        ttl_sec = self.ttl_sec if ttl_sec is None else ttl_sec
+        keep = self.keep if keep is None else max(1, keep)
+        stats = {"threads": 0, "checkpoints": 0, "blobs": 0, "writes": 0}
+        if ttl_sec:
+            with self._locked() as conn:
+                # Checked and deleted in one transaction, so a ticket touched meanwhile is kept.
+                expired = [row[0] for row in conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created) < ?",
+                    (time.time() - ttl_sec,),
+                )]
+                for thread_id in expired:
+                    for table in ("checkpoints", "blobs", "writes"):
+                        stats[table] += conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,)).rowcount
+            stats["threads"] = len(expired)
+
+        crowded = self._query(
+            "SELECT thread_id, checkpoint_ns FROM checkpoints GROUP BY thread_id, checkpoint_ns HAVING COUNT(*) > ?",
+            (keep,),
+        )
+        for thread_id, checkpoint_ns in crowded:
+            for key, count in self._prune(thread_id, checkpoint_ns, keep).items():
+                stats[key] += count
+        return stats
+
+    def _prune(self, thread_id: str, checkpoint_ns: str, keep: int) -> Dict[str, int]:
+        # One transaction: a checkpoint `put` meanwhile would otherwise add blobs that
+        # are missing from `referenced` and get deleted under it.
+        with self._locked() as conn:
+            rows = conn.execute(
+                "SELECT checkpoint_id, checkpoint_type, checkpoint FROM checkpoints"
+                " WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+                (thread_id, checkpoint_ns),
+            ).fetchall()
+            kept, dropped = rows[:keep], [row[0] for row in rows[keep:]]
+            referenced: Set[Tuple[str, str]] = set()
+            for _, type_, blob in kept:
+                versions = self.serde.loads_typed((type_, blob))["channel_versions"]
+                referenced.update((channel, str(version)) for channel, version in versions.items())
+            stale_blobs = [
+                (thread_id, checkpoint_ns, channel, version)
+                for channel, version in conn.execute(
+                    "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, checkpoint_ns),
+                )
+                if (channel, version) not in referenced
+            ]
+            writes = 0
+            for checkpoint_id in dropped:
+                key = (thread_id, checkpoint_ns, checkpoint_id)
+                conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                             key)
+                writes += conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key
+                ).rowcount
+            conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                stale_blobs)
+        return {"checkpoints": len(dropped), "blobs": len(stale_blobs), "writes": writes}
+
+def checkpointer_from_env() -> Optional[BaseCheckpointSaver]:
+    """Build the checkpointer described by the CHECKPOINT_* environment variables."""
+    if CHECKPOINT_BACKEND in ("", "none", "off"):
+        return None
+    if CHECKPOINT_BACKEND == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    if CHECKPOINT_BACKEND == "sqlite":
+        return SQLiteCheckpointer()
+    if CHECKPOINT_BACKEND == "postgres":
+        try:
+            from langgraph.checkpoint.postgres import PostgresSaver
+        except ImportError as e:
+            raise ImportError("CHECKPOINT_BACKEND=postgres needs langgraph-checkpoint-postgres") from e
+        # The connection stays open for the life of the process; `_exit_stack` closes it at exit.
+        saver = _exit_stack.enter_context(PostgresSaver.from_conn_string(os.environ["CHECKPOINT_URL"]))
+        saver.setup()
+        return saver
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {CHECKPOINT_BACKEND}")
+
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+_configured = False
+_exit_stack = contextlib.ExitStack()
+atexit.register(_exit_stack.close)
+# Event loop -> (AsyncPostgresSaver, the stack that closes it); connections are bound to their loop.
+_async_savers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """Return the process-wide checkpointer (None when CHECKPOINT_BACKEND is "none")."""
+    global _checkpointer, _configured
+    if not _configured:
+        _checkpointer = checkpointer_from_env()
+        _configured = True
+    return _checkpointer
+
+
+async def aget_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """Return the checkpointer for async runs on the running event loop.
+
+    This is `get_checkpointer()`, except with CHECKPOINT_BACKEND=postgres: the sync
+    `PostgresSaver` has no async methods, so each event loop gets its own
+    `AsyncPostgresSaver`, closed by `aclose_checkpointer`.
+    """
+    if CHECKPOINT_BACKEND != "postgres" or get_checkpointer() is None:
+        return get_checkpointer()
+    loop = asyncio.get_running_loop()
+    entry = _async_savers.get(loop)
+    if entry is None:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+        stack = contextlib.AsyncExitStack()
+        saver = await stack.enter_async_context(AsyncPostgresSaver.from_conn_string(os.environ["CHECKPOINT_URL"]))
+        entry = _async_savers.setdefault(loop, (saver, stack))
+        if entry[0] is not saver:  # another task of this loop got there first
+            await stack.aclose()
+    return entry[0]
+
+
+async def aclose_checkpointer() -> None:
+    """Close the running event loop's async checkpointer connection, if it has one."""
+    entry = _async_savers.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
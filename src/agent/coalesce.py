@@ -0,0 +1,196 @@
+"""Coalescing of identical in-flight tickets (single-flight).
+
+During an outage, dozens of tickets saying the same thing ("site is down", "can't log
+in") arrive within seconds. Instead of running the graph for each, the first ticket
+runs (the leader) and every matching ticket that arrives while it is in flight waits
+for and shares its result (followers). Tickets match on the normalized subject +
+description used by the response cache, or, with a similarity threshold, on cosine
+similarity of the same hashed n-gram embeddings.
+
+A follower receives a copy of the leader's final state. If the leader fails, its
+followers get the same error. If it is cancelled (e.g. by its deadline), they run
+again on their own.
+
+Configuration (environment):
+    TICKET_COALESCING: "exact" (default), "similar" or "off".
+    TICKET_COALESCING_SIMILARITY: Cosine threshold for "similar" (default 0.9).
+"""
+
+import asyncio
+import concurrent.futures
+import copy
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from agent.cache import cache_key, hashed_embedding, normalize_text
+from agent.metrics import TICKETS_COALESCED
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Set on a flight whose leader was cancelled; followers run the ticket themselves."""
+
+
+class _Flight:
+    def __init__(self, key: str, vector: Any):
+        self.key = key
+        self.vector = vector
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.followers = 0
+
+
+class TicketCoalescer:
+    """Lets matching concurrent tickets share one graph run.
+
+    Args:
+        similarity_threshold (Optional[float]): Cosine threshold for near-duplicate
+            matches; None matches exact normalized text only.
+    """
+
+    def __init__(self, similarity_threshold: Optional[float] = None,
+                 embed: Callable[[str], Any] = hashed_embedding):
+        """Start with no runs in flight."""
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "exact": 0, "similar": 0}
+
+    def _join(self, subject: str, description: str) -> Tuple[_Flight, Optional[str]]:
+        """Return the flight for the ticket and how it matched (None: the caller leads it)."""
+        text = normalize_text(subject, description)
+        key = cache_key("", text)
+        vector = self.embed(text) if self.similarity_threshold is not None else None
+        with self._lock:
+            flight = self._flights.get(key)
+            match = "exact" if flight is not None else None
+            if flight is None and vector is not None:
+                flight = self._nearest(vector)
+                match = "similar" if flight is not None else None
+            if flight is None:
+                flight = self._flights[key] = _Flight(key, vector)
+                self._stats["leaders"] += 1
+                return flight, None
+            flight.followers += 1
+            self._stats[match] += 1
+        TICKETS_COALESCED.inc(match=match)
+        return flight, match
+
+    def _nearest(self, vector: Any) -> Optional[_Flight]:
+        best, best_score = None, self.similarity_threshold
+        for flight in self._flights.values():
+            if flight.vector is not None:
+                score = float(flight.vector @ vector)
+                if score >= best_score:
+                    best, best_score = flight, score
+        return best
+
+    def _land(self, flight: _Flight, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._flights.pop(flight.key, None)
+        if error is None:
+            flight.future.set_result(result)
+        else:
+            flight.future.set_exception(error)
+
+    @staticmethod
+    def _share(flight: _Flight, result: T) -> T:
+        return copy.deepcopy(result) if flight.followers else result
+
+    def run(self, subject: str, description: str, fn: Callable[[], T]) -> T:
+        """Run `fn` for the ticket, or wait for and share the result of a matching in-flight run."""
+        while True:
+            flight, match = self._join(subject, description)
+            if match is None:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self._land(flight, error=e)
+                    raise
+                self._land(flight, result)
+                return self._share(flight, result)
+            try:
+                return copy.deepcopy(flight.future.result())
+            except _LeaderCancelled:
+                continue
+
+    async def arun(self, subject: str, description: str, afn: Callable[[], Awaitable[T]]) -> T:
+        """Async version of `run`; cancelling a follower does not affect the leader."""
+        while True:
+            flight, match = self._join(subject, description)
+            if match is None:
+                try:
+                    result = await afn()
+                except asyncio.CancelledError:
+                    self._land(flight, error=_LeaderCancelled())
+                    raise
+                except BaseException as e:
+                    self._land(flight, error=e)
+                    raise
+                self._land(flight, result)
+                return self._share(flight, result)
+            shared = asyncio.wrap_future(flight.future)
+            # A cancelled follower leaves `shared` to the leader (the shield keeps the leader's
+            # future alive); mark its outcome retrieved so asyncio does not log it.
+            shared.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                return copy.deepcopy(await asyncio.shield(shared))
+            except _LeaderCancelled:
+                continue
+
+    def stats(self) -> Dict[str, Any]:
+        """Return leader and follower counts, the coalesced share and in-flight runs."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        coalesced = stats["exact"] + stats["similar"]
+        tickets = stats["leaders"] + coalesced
+        stats["coalesced"] = coalesced
+        stats["coalesced_rate"] = coalesced / tickets if tickets else 0.0
+        return stats
+
+
+def coalescer_from_env() -> Optional[TicketCoalescer]:
+    """Build the coalescer described by the TICKET_COALESCING* environment variables."""
+    mode = os.getenv("TICKET_COALESCING", "exact").lower()
+    if mode in ("", "none", "off"):
+        return None
+    if mode == "exact":
+        return TicketCoalescer()
+    if mode == "similar":
+        return TicketCoalescer(similarity_threshold=float(os.getenv("TICKET_COALESCING_SIMILARITY", "0.9")))
+    raise ValueError(f"Unknown TICKET_COALESCING: {mode}")
+
+
+_coalescer: Optional[TicketCoalescer] = None
+_configured = False
+
+
+def get_coalescer() -> Optional[TicketCoalescer]:
+    """Return the process-wide coalescer, or None when coalescing is disabled."""
+    global _coalescer, _configured
+    if not _configured:
+        _coalescer = coalescer_from_env()
+        _configured = True
+    return _coalescer
+
+
+def set_coalescer(coalescer: Optional[TicketCoalescer]) -> None:
+    """Replace the process-wide coalescer (None disables coalescing)."""
+    global _coalescer, _configured
+    _coalescer = coalescer
+    _configured = True
+
+
+def run_coalesced(subject: str, description: str, fn: Callable[[], T]) -> T:
+    """Run `fn` through the process-wide coalescer, or directly when it is disabled."""
+    coalescer = get_coalescer()
+    return fn() if coalescer is None else coalescer.run(subject, description, fn)
+
+
+async def arun_coalesced(subject: str, description: str, afn: Callable[[], Awaitable[T]]) -> T:
+    """Async version of `run_coalesced`."""
+    coalescer = get_coalescer()
+    return await afn() if coalescer is None else await coalescer.arun(subject, description, afn)
@@ -0,0 +1,338 @@
+"""Early escalation of doomed retry loops.
+
+`route_review` allows `MAX_REVIEWS` (three) review rounds, but a ticket whose first
+draft is rejected often fails every round, and each wasted round costs a `retry_draft`
+and a `review_draft` call. After a rejection that would otherwise be retried, the
+`EarlyEscalator` sends the ticket straight to a human when
+
+* the new draft is nearly identical to the previous one (cosine similarity of hashed
+  n-gram embeddings, see `agent.cache.hashed_embedding`), so another round would
+  only repeat it; or
+* a model trained on past review outcomes predicts a low chance that a later draft is
+  approved. Its features are the category, the attempt number, the reviewer scores and
+  feedback, the similarity to the previous draft and the ticket text.
+
+The model is the pre-classifier's hashed n-gram logistic regression
+(`agent.preclassify.HashedLinearModel`) with the labels "Approved" and "Escalate".
+Its training data comes from two sources. One is the review history, which has one
+JSON line per review, with the ticket's later outcome taking the place of labels. The
+other is the escalation log, whose "Draft rejected after 3 attempts" rows are known
+failures. `evaluate` replays the history under a configuration and reports the LLM
+calls it saves and the change in approval rate.
+
+Review outcomes are queued and appended by a background writer under the escalation
+log's file lock (see `agent.escalation.EscalationSink`), so the review node never waits
+on disk and several processes can share one history file.
+
+Configuration (environment):
+    REVIEW_HISTORY_PATH: JSONL file receiving one line per review outcome (unset: off).
+    EARLY_ESCALATION_MODEL: Model trained with `python -m agent.early_escalation train`
+        (unset: no prediction).
+    EARLY_ESCALATION_THRESHOLD: Escalate when the predicted approval chance is below
+        this (default 0.2).
+    EARLY_ESCALATION_SIMILARITY: Escalate when the new draft's similarity to the
+        previous one reaches this, e.g. 0.95 (unset: off).
+
+Usage:
+    python -m agent.early_escalation train review_history.jsonl escalation_log.csv --out early_escalation.npz
+    python -m agent.early_escalation evaluate review_history.jsonl --model early_escalation.npz --similarity 0.95
+"""
+
+import argparse
+import atexit
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.cache import cache_key, hashed_embedding, normalize_text
+from agent.escalation import (
+    EscalationSink,
+    JSONLEscalationBackend,
+    read_escalation_file,
+)
+from agent.preclassify import HashedLinearModel, ticket_text
+from agent.state import MAX_REVIEWS
+
+REVIEW_HISTORY_PATH = os.getenv("REVIEW_HISTORY_PATH") or None
+EARLY_ESCALATION_THRESHOLD = float(os.getenv("EARLY_ESCALATION_THRESHOLD", "0.2"))
+EARLY_ESCALATION_SIMILARITY = float(os.getenv("EARLY_ESCALATION_SIMILARITY", "0")) or None
+
+OUTCOMES = ["Approved", "Escalate"]
+EARLY_ESCALATION_OUTPUT = "Ticket escalated to human agent: further drafts are unlikely to be approved."
+# Each skipped round saves one `retry_draft` and one `review_draft` call.
+LLM_CALLS_PER_ROUND = 2
+# Escalation log reasons of tickets that failed every round.
+_EXHAUSTED_REASON = "Draft rejected after"
+
+
+def draft_similarity(draft: str, previous: str) -> float:
+    """Cosine similarity of two drafts' hashed n-gram embeddings (1.0: identical)."""
+    a = hashed_embedding(normalize_text(draft, ""))
+    b = hashed_embedding(normalize_text(previous, ""))
+    return float(np.dot(a, b))
+
+
+def outcome_features(category: str, subject: str, description: str, attempt: int,
+                     feedback: Optional[str] = None, scores: Optional[Dict[str, int]] = None,
+                     similarity: Optional[float] = None) -> str:
+    """Render one rejected review as text for the hashed model.
+
+    The structured features become single marker words ("attempt1", "completeness2",
+    "similarity9") next to the feedback and the ticket text.
+    """
+    markers = [f"category{category.lower()}", f"attempt{attempt}"]
+    markers += [f"{key}{value}" for key, value in sorted((scores or {}).items())]
+    if similarity is not None:
+        markers.append(f"similarity{min(9, int(similarity * 10))}")
+    return "\n".join([" ".join(markers), (feedback or "nofeedback").lower(), ticket_text(subject, description)])
+
+
+class EarlyEscalator:
+    """Decides whether a rejected draft is worth another review round.
+
+    Args:
+        model (Optional[HashedLinearModel]): Outcome model; None disables prediction.
+        threshold (float): Escalate below this predicted chance of a later approval.
+        similarity (Optional[float]): Escalate when the new draft is at least this
+            similar to the previous one; None disables the check.
+    """
+
+    def __init__(self, model: Optional[HashedLinearModel] = None,
+                 threshold: float = EARLY_ESCALATION_THRESHOLD,
+                 similarity: Optional[float] = EARLY_ESCALATION_SIMILARITY):
+        """Configure the check; without a model only the similarity test runs."""
+        self.model = model
+        self.threshold = threshold
+        self.similarity = similarity
+
+    def approval_chance(self, category: str, subject: str, description: str, attempt: int,
+                        feedback: Optional[str] = None, scores: Optional[Dict[str, int]] = None,
+                        similarity: Optional[float] = None) -> Optional[float]:
+        """Predicted chance that a later draft is approved, or None without a model."""
+        if self.model is None:
+            return None
+        text = outcome_features(category, subject, description, attempt, feedback, scores, similarity)
+        return float(self.model.predict_proba(text)[self.model.categories.index("Approved")])
+
+    def reason(self, category: str, subject: str, description: str, attempt: int,
+               feedback: Optional[str] = None, scores: Optional[Dict[str, int]] = None,
+               similarity: Optional[float] = None) -> Optional[str]:
+        """Return why the ticket should be escalated now, or None to keep retrying."""
+        if self.similarity is not None and similarity is not None and similarity >= self.similarity:
+            return f"new draft is {similarity:.0%} similar to the previous one"
+        chance = self.approval_chance(category, subject, description, attempt, feedback, scores, similarity)
+        if chance is not None and chance < self.threshold:
+            return f"predicted approval chance {chance:.2f} is below {self.threshold:.2f}"
+        return None
+
+
+_escalator: Optional[EarlyEscalator] = None
+_configured = False
+
+
+def get_early_escalator() -> Optional[EarlyEscalator]:
+    """Return the process-wide escalator, or None when neither check is configured."""
+    global _escalator, _configured
+    if not _configured:
+        model_path = os.getenv("EARLY_ESCALATION_MODEL")
+        model = HashedLinearModel.load(model_path) if model_path else None
+        _escalator = EarlyEscalator(model) if model is not None or EARLY_ESCALATION_SIMILARITY else None
+        _configured = True
+    return _escalator
+
+
+def set_early_escalator(escalator: Optional[EarlyEscalator]) -> None:
+    """Replace the process-wide escalator (None always allows every review round)."""
+    global _escalator, _configured
+    _escalator = escalator
+    _configured = True
+
+
+_history: Optional[EscalationSink] = None
+_history_configured = False
+_history_lock = threading.Lock()
+
+
+def get_review_history() -> Optional[EscalationSink]:
+    """Return the sink writing review outcomes to REVIEW_HISTORY_PATH, or None when unset."""
+    global _history, _history_configured
+    if not _history_configured:
+        with _history_lock:
+            if not _history_configured:
+                _history = EscalationSink(JSONLEscalationBackend(REVIEW_HISTORY_PATH)) if REVIEW_HISTORY_PATH else None
+                _history_configured = True
+    return _history
+
+
+def set_review_history(sink: Optional[EscalationSink]) -> None:
+    """Replace the process-wide review history sink (None stops recording)."""
+    global _history, _history_configured
+    _history = sink
+    _history_configured = True
+
+
+@atexit.register
+def _close_history() -> None:
+    if _history is not None:
+        _history.close()
+
+
+def record_review(category: str, subject: str, description: str, attempt: int, verdict: str,
+                  feedback: Optional[str] = None, scores: Optional[Dict[str, int]] = None,
+                  similarity: Optional[float] = None, early: bool = False) -> None:
+    """Queue one review outcome for the review history; no-op when it is off."""
+    history = get_review_history()
+    if history is None:
+        return
+    history.log({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ticket": cache_key(category, normalize_text(subject, description)),
+        "category": category, "subject": subject, "description": description,
+        "attempt": attempt, "verdict": verdict, "feedback": feedback, "scores": scores,
+        "similarity": similarity, "early": early,
+    })
+
+
+def load_runs(path: str) -> List[List[Dict[str, Any]]]:
+    """Group a review history into runs: the reviews of one ticket, first attempt first."""
+    runs: List[List[Dict[str, Any]]] = []
+    open_runs: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row["attempt"] == 0 or row["ticket"] not in open_runs:
+                open_runs[row["ticket"]] = []
+                runs.append(open_runs[row["ticket"]])
+            open_runs[row["ticket"]].append(row)
+    return runs
+
+
+def _finished(run: List[Dict[str, Any]]) -> bool:
+    """Whether the run's outcome is known: approved, or rejected in every allowed round."""
+    last = run[-1]
+    return last["verdict"] == "Approved" or (last["attempt"] >= MAX_REVIEWS - 1 and not last.get("early"))
+
+
+def training_examples(runs: Sequence[List[Dict[str, Any]]],
+                      escalations: Iterable[Dict[str, str]] = ()) -> Tuple[List[str], List[str]]:
+    """Label every retried rejection with its ticket's final outcome.
+
+    Runs cut short (by an LLM failure or an earlier early escalation) have no known
+    outcome and are skipped. Escalation log rows of tickets that failed every round add
+    a failed example each, with the last feedback and no similarity.
+    """
+    texts, labels = [], []
+    for run in runs:
+        if not _finished(run):
+            continue
+        outcome = run[-1]["verdict"]
+        for row in run:
+            if row["verdict"] == "Approved" or row["attempt"] >= MAX_REVIEWS - 1:
+                continue
+            texts.append(outcome_features(row["category"], row["subject"], row["description"], row["attempt"],
+                                          row.get("feedback"), row.get("scores"), row.get("similarity")))
+            labels.append(outcome)
+    for row in escalations:
+        reason = row.get("reason") or ""
+        if not reason.startswith(_EXHAUSTED_REASON):
+            continue
+        feedback = reason.split("Feedback: ", 1)[1] if "Feedback: " in reason else None
+        texts.append(outcome_features(row.get("category", ""), row.get("subject", ""), row.get("description", ""),
+                                      MAX_REVIEWS - 2, feedback))
+        labels.append("Escalate")
+    return texts, labels
+
+
+def train(runs: Sequence[List[Dict[str, Any]]], escalations: Iterable[Dict[str, str]] = (),
+          epochs: int = 200) -> HashedLinearModel:
+    """Fit the outcome model.
+
+    Raises:
+        ValueError: The data does not contain both outcomes.
+    """
+    texts, labels = training_examples(runs, escalations)
+    if set(labels) != set(OUTCOMES):
+        raise ValueError(f"Need retried rejections with both outcomes, got {len(labels)} examples "
+                         f"labelled {sorted(set(labels))}")
+    return HashedLinearModel(dim=1 << 12, categories=OUTCOMES).fit(texts, labels, epochs=epochs)
+
+
+def evaluate(runs: Sequence[List[Dict[str, Any]]], escalator: EarlyEscalator) -> Dict[str, Any]:
+    """Replay finished runs under `escalator` and report the calls saved and approvals lost.
+
+    A run stops at its first retried rejection the escalator would escalate. The review
+    rounds after it are saved, and an approval in those rounds is lost. `llm_calls`
+    counts the draft and review calls of every round (drafts settled by the local
+    pre-check count as well, so savings are an upper bound).
+    """
+    finished = [run for run in runs if _finished(run)]
+    approved = stopped = saved = lost = 0
+    reasons: Dict[str, int] = defaultdict(int)
+    for run in finished:
+        outcome_approved = run[-1]["verdict"] == "Approved"
+        approved += outcome_approved
+        for index, row in enumerate(run):
+            if row["verdict"] == "Approved" or row["attempt"] >= MAX_REVIEWS - 1:
+                continue
+            reason = escalator.reason(row["category"], row["subject"], row["description"], row["attempt"],
+                                      row.get("feedback"), row.get("scores"), row.get("similarity"))
+            if reason is None:
+                continue
+            stopped += 1
+            reasons["similar_draft" if "similar" in reason else "predicted"] += 1
+            saved += LLM_CALLS_PER_ROUND * (len(run) - index - 1)
+            lost += outcome_approved
+            break
+    n = len(finished)
+    calls = sum(LLM_CALLS_PER_ROUND * len(run) for run in finished)
+    return {
+        "tickets": n,
+        "escalated_early": stopped,
+        "reasons": dict(reasons),
+        "llm_calls": calls,
+        "llm_calls_saved": saved,
+        "llm_calls_saved_share": round(saved / calls, 3) if calls else 0.0,
+        "approval_rate": round(approved / n, 3) if n else 0.0,
+        "approval_rate_with_early_escalation": round((approved - lost) / n, 3) if n else 0.0,
+        "approvals_lost": lost,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.early_escalation train|evaluate ...`."""
+    parser = argparse.ArgumentParser(description="Train or evaluate the early-escalation model.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = commands.add_parser("train", help="fit the outcome model on review history and escalations")
+    train_cmd.add_argument("history", help="review history JSONL (REVIEW_HISTORY_PATH)")
+    train_cmd.add_argument("escalations", nargs="*", help="escalation log CSV/JSONL files")
+    train_cmd.add_argument("--out", default="early_escalation.npz")
+    train_cmd.add_argument("--epochs", type=int, default=200)
+    evaluate_cmd = commands.add_parser("evaluate", help="replay review history with early escalation")
+    evaluate_cmd.add_argument("history", help="review history JSONL (REVIEW_HISTORY_PATH)")
+    evaluate_cmd.add_argument("--model", help="trained model (similarity check only if omitted)")
+    evaluate_cmd.add_argument("--threshold", type=float, default=EARLY_ESCALATION_THRESHOLD)
+    evaluate_cmd.add_argument("--similarity", type=float, default=EARLY_ESCALATION_SIMILARITY)
+    args = parser.parse_args(argv)
+
+    runs = load_runs(args.history)
+    if args.command == "train":
+        escalations = [row for path in args.escalations for row in read_escalation_file(path)]
+        model = train(runs, escalations, epochs=args.epochs)
+        model.save(args.out)
+        print(json.dumps({"runs": len(runs), "examples": len(training_examples(runs, escalations)[0]),  # noqa: T201
+                          "model": args.out}))
+    else:
+        model = HashedLinearModel.load(args.model) if args.model else None
+        report = evaluate(runs, EarlyEscalator(model, threshold=args.threshold, similarity=args.similarity))
+        print(json.dumps(report, indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Escalation log sink.
+
+`review_draft` hands escalations to an `EscalationSink`, which queues them and lets a
+background thread write them in batches (when `batch_size` rows are waiting or every
+`flush_interval` seconds), so the graph never blocks on disk I/O. Writes are serialized
+across threads by the single writer and across processes by an advisory file lock
+(CSV/JSONL) or SQLite's own locking. `query()` serves the escalation dashboard.
+
+Configuration (environment):
+    ESCALATION_BACKEND: "csv" (default), "jsonl" or "sqlite".
+    ESCALATION_LOG_PATH: Log file (default: `escalation_log.csv` at the project root,
+        `.jsonl`/`.sqlite3` for the other backends).
+    ESCALATION_BATCH_SIZE: Rows per write (default 100).
+    ESCALATION_FLUSH_INTERVAL: Maximum seconds a row waits before being written (default 1.0).
+"""
+
+import atexit
+import contextlib
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+ESCALATION_FIELDS = ["timestamp", "subject", "description", "category", "draft", "reason"]
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_LOG_FILES = {
+    "csv": "escalation_log.csv",
+    "jsonl": "escalation_log.jsonl",
+    "sqlite": "escalation_log.sqlite3",
+}
+
+
+@contextlib.contextmanager
+def _locked(f) -> Iterator[None]:
+    """Hold an exclusive advisory lock on an open file (no-op where unsupported)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _matches(row: Dict[str, Any], category: Optional[str], since: Optional[str], until: Optional[str]) -> bool:
+    return ((category is None or row.get("category") == category)
+            and (since is None or row.get("timestamp", "") >= since)
+            and (until is None or row.get("timestamp", "") < until))
+
+
+def read_escalation_csv(path: str) -> Iterator[Dict[str, str]]:
+    """Yield rows of an escalation CSV, with or without a header line.
+
+    A first line naming a `category` column is a header; otherwise the rows are read
+    with the escalation log columns.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        has_header = "category" in next(csv.reader([first]), [])
+        yield from csv.DictReader(f, fieldnames=None if has_header else ESCALATION_FIELDS)
+
+
+def read_escalation_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the rows of an escalation log, CSV or JSONL (by extension)."""
+    if not path.endswith(".jsonl"):
+        yield from read_escalation_csv(path)
+        return
+    with open(path, encoding="utf-8") as f:
+        yield from (json.loads(line) for line in f if line.strip())
+
+
+class CSVEscalationBackend:
+    """Appends rows to a CSV file (the historical `escalation_log.csv` format)."""
+
+    def __init__(self, path: str):
+        """Append to the CSV file at `path`, creating it with a header."""
+        self.path = path
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """Append `rows` under an exclusive file lock."""
+        with open(self.path, "a", encoding="utf-8", newline="") as f, _locked(f):
+            writer = csv.DictWriter(f, fieldnames=ESCALATION_FIELDS)
+            if f.tell() == 0:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def query(self, category: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return matching rows newest first (see `EscalationSink.query`)."""
+        if not os.path.exists(self.path):
+            return []
+        rows = [r for r in read_escalation_csv(self.path) if _matches(r, category, since, until)]
+        rows.reverse()
+        return rows[:limit] if limit else rows
+
+
+class JSONLEscalationBackend:
+    """Appends one JSON object per escalation."""
+
+    def __init__(self, path: str):
+        """Append to the JSONL file at `path`."""
+        self.path = path
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """Append `rows` under an exclusive file lock."""
+        data = "".join(json.dumps(row) + "\n" for row in rows)
+        with open(self.path, "a", encoding="utf-8") as f, _locked(f):
+            f.write(data)
+
+    def query(self, category: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return matching rows newest first (see `EscalationSink.query`)."""
+        if not os.path.exists(self.path):
+            return []
+        rows = [row for row in read_escalation_file(self.path) if _matches(row, category, since, until)]
+        rows.reverse()
+        return rows[:limit] if limit else rows
+
+
+class SQLiteEscalationBackend:
+    """Stores escalations in SQLite, indexed by timestamp and category."""
+
+    def __init__(self, path: str):
+        """Open the database at `path`, creating the table and its indexes."""
+        self.path = path
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS escalations ("
+                " id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, subject TEXT, description TEXT,"
+                " category TEXT, draft TEXT, reason TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS escalations_timestamp ON escalations (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS escalations_category ON escalations (category, timestamp)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert `rows` in one transaction."""
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT INTO escalations ({', '.join(ESCALATION_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                [tuple(row.get(field) for field in ESCALATION_FIELDS) for row in rows],
+            )
+
+    def query(self, category: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return matching rows newest first (see `EscalationSink.query`)."""
+        clauses, params = [], []
+        for clause, value in (("category = ?", category), ("timestamp >= ?", since), ("timestamp < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(ESCALATION_FIELDS)} FROM escalations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with contextlib.closing(self._connect()) as conn:
+            return [dict(zip(ESCALATION_FIELDS, row)) for row in conn.execute(sql, params)]
+
+
+BACKENDS = {
+    "csv": CSVEscalationBackend,
+    "jsonl": JSONLEscalationBackend,
+    "sqlite": SQLiteEscalationBackend,
+}
+
+_FLUSH = object()
+
+
+class EscalationSink:
+    """Non-blocking, batching front end for an escalation backend."""
+
+    def __init__(self, backend, batch_size: int = 100, flush_interval: float = 1.0):
+        """Start the writer thread for `backend`."""
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue[Any] = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="escalation-writer")
+        self._thread.start()
+
+    def log(self, row: Dict[str, Any]) -> None:
+        """Queue an escalation row; returns immediately."""
+        if self._closed:
+            raise RuntimeError("EscalationSink is closed")
+        self._queue.put(row)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every row queued so far has been written."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self) -> None:
+        """Write pending rows and stop the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def query(self, category: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Return escalations newest first, optionally filtered by category and time range.
+
+        Args:
+            category (Optional[str]): Only escalations of this category.
+            since (Optional[str]): Inclusive lower bound, "YYYY-MM-DD[ HH:MM:SS]".
+            until (Optional[str]): Exclusive upper bound, same format.
+            limit (Optional[int]): Maximum number of rows (None for all).
+        """
+        self.flush()
+        return self.backend.query(category=category, since=since, until=until, limit=limit)
+
+    def _run(self) -> None:
+        pending: List[Dict[str, Any]] = []
+        waiters: List[threading.Event] = []
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval if pending else None)
+            except queue.Empty:
+                item = _FLUSH
+            if item is None:
+                stop = True
+            elif isinstance(item, tuple) and item[0] is _FLUSH:
+                waiters.append(item[1])
+            elif item is not _FLUSH:
+                pending.append(item)
+                if len(pending) < self.batch_size:
+                    continue
+            if pending:
+                try:
+                    self.backend.write_batch(pending)
+                except Exception:
+                    # Never take the writer thread down; the rows are lost but counted.
+                    self.dropped += len(pending)
+                pending = []
+            for event in waiters:
+                event.set()
+            waiters = []
+
+
+def sink_from_env() -> EscalationSink:
+    """Build the escalation sink described by the ESCALATION_* environment variables."""
+    backend_name = os.getenv("ESCALATION_BACKEND", "csv").lower()
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown ESCALATION_BACKEND: {backend_name}")
+    path = os.getenv("ESCALATION_LOG_PATH") or os.path.join(PROJECT_ROOT, DEFAULT_LOG_FILES[backend_name])
+    return EscalationSink(
+        BACKENDS[backend_name](path),
+        batch_size=int(os.getenv("ESCALATION_BATCH_SIZE", "100")),
+        flush_interval=float(os.getenv("ESCALATION_FLUSH_INTERVAL", "1.0")),
+    )
+
+
+_sink: Optional[EscalationSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_escalation_sink() -> EscalationSink:
+    """Return the process-wide escalation sink, starting it on first use."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = sink_from_env()
+    return _sink
+
+
+def set_escalation_sink(sink: Optional[EscalationSink]) -> None:
+    """Replace the process-wide sink (None rebuilds from the environment on next use)."""
+    global _sink
+    _sink = sink
+
+
+@atexit.register
+def _close_sink() -> None:
+    if _sink is not None:
+        _sink.close()
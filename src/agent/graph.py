@@ -1,36 +1,188 @@
+import asyncio
+import weakref
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from agent.state import State
-from agent.nodes import classify_ticket, retrieve_context, generate_draft, review_draft, retry_draft
+from agent.state import MAX_REVIEWS, State
+from agent.metrics import instrument_node, REVIEW_ROUTES
+from agent.backends import warm_up_backends
+from agent.checkpoint import aget_checkpointer, get_checkpointer, ticket_config
+from agent.cache import get_response_cache
+from agent.knowledge_index import get_knowledge_index
+from agent.preclassify import get_preclassifier
+from agent.utils import get_async_client, get_client
+from agent.nodes import (
+    classify_ticket,
+    aclassify_ticket,
+    retrieve_context,
+    lookup_cached_response,
+    generate_draft,
+    agenerate_draft,
+    review_draft,
+    areview_draft,
+    retry_draft,
+    aretry_draft,
+    draft_candidate,
+    adraft_candidate,
+    fan_out_drafts,
+    select_draft,
+    speculative_width,
+)
 
 
 # Initialize graph with custom State
 builder = StateGraph(State)
 
+def _node(name, func, afunc=None):
+    """Instrument a node.
+
+    LLM nodes pair a sync and an async implementation so that graph.invoke and
+    graph.ainvoke each use the matching LLM client.
+    """
+    if afunc is None:
+        return instrument_node(name, func)
+    return RunnableLambda(instrument_node(name, func), afunc=instrument_node(name, afunc))
+
 # Add nodes
-builder.add_node("classify", classify_ticket)
-builder.add_node("retrieve", retrieve_context)
-builder.add_node("draft", generate_draft)
-builder.add_node("review", review_draft)
-builder.add_node("retry_draft", retry_draft)
+builder.add_node("classify", _node("classify", classify_ticket, aclassify_ticket))
+builder.add_node("retrieve", _node("retrieve", retrieve_context))
+builder.add_node("cache_lookup", _node("cache_lookup", lookup_cached_response))
+builder.add_node("draft", _node("draft", generate_draft, agenerate_draft))
+builder.add_node("review", _node("review", review_draft, areview_draft))
+builder.add_node("retry_draft", _node("retry_draft", retry_draft, aretry_draft))
+builder.add_node("draft_candidate", _node("draft_candidate", draft_candidate, adraft_candidate))
+builder.add_node("select_draft", _node("select_draft", select_draft))
 
 # Set edges
 builder.add_edge(START, "classify")
 builder.add_edge("classify", "retrieve")
-builder.add_edge("retrieve", "draft")
-builder.add_edge("draft", "review")
+builder.add_edge("retrieve", "cache_lookup")
+
+# Conditional edge for cache lookup
+def route_cache(state: State):
+    """Route to END on a cache hit, else to draft.
+
+    When speculative drafting is enabled for the ticket's category, fan out parallel
+    draft candidates instead.
+    """
+    if state.get("cached"):
+        return END
+    if speculative_width(state["category"]) > 1:
+        return fan_out_drafts(state)
+    return "draft"
+
+builder.add_conditional_edges("cache_lookup", route_cache, ["draft", "draft_candidate", END])
+
+# Conditional edge after drafting
+def route_draft(state: State) -> str:
+    """Route to review, or to END when the draft's LLM call failed and the ticket was escalated."""
+    return END if state.get("llm_error") else "review"
+
+builder.add_conditional_edges("draft", route_draft, {"review": "review", END: END})
+builder.add_edge("draft_candidate", "select_draft")
+
+# Conditional edge for speculative selection
+def route_select(state: State) -> str:
+    """Route to END if a candidate was approved or all of them failed, else continue in the retry loop."""
+    return END if state["approved"] or state.get("llm_error") else "retry_draft"
+
+builder.add_conditional_edges("select_draft", route_select, {"retry_draft": "retry_draft", END: END})
 
 # Conditional edge for review
 def route_review(state: State) -> str:
-    """Route to retry_draft if not approved and attempts < 3, else END."""
-    if state["approved"] or state["attempt"] >= 3:
+    """Route to retry_draft if not approved and attempts < `MAX_REVIEWS`, else END.
+
+    Also ends after an LLM failure or an early escalation.
+    """
+    if state.get("early_escalation"):
+        REVIEW_ROUTES.inc(decision="early_escalation")
+        return END
+    if state["approved"] or state["attempt"] >= MAX_REVIEWS or state.get("llm_error"):
+        REVIEW_ROUTES.inc(decision="end")
         return END
+    REVIEW_ROUTES.inc(decision="retry_draft")
     return "retry_draft"
 
 builder.add_conditional_edges("review", route_review, {"retry_draft": "retry_draft", END: END})
-builder.add_edge("retry_draft", "review")
+builder.add_conditional_edges("retry_draft", route_draft, {"review": "review", END: END})
 
 # Compile graph
-graph = builder.compile(name="Support Agent")
+def compile_graph(checkpointer=None):
+    """Compile the workflow, optionally with a checkpointer (see `agent.checkpoint`)."""
+    return builder.compile(name="Support Agent", checkpointer=checkpointer)
+
+graph = compile_graph(get_checkpointer())
+# Event loop -> graph compiled with its own async checkpointer (Postgres; see `agraph`).
+_async_graphs: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def warm_up() -> None:
+    """Do the setup a first ticket would otherwise pay for.
+
+    Builds the LLM clients (importing `huggingface_hub`), the knowledge index, the
+    pre-classifier and the response cache, and loads the local model if one is used.
+
+    Servers call this before taking traffic; call it in a parent process before
+    forking workers so they share the loaded state.
+    """
+    get_client()
+    get_async_client()
+    warm_up_backends()
+    get_knowledge_index()
+    get_preclassifier()
+    get_response_cache()
+
+
+def invoke_ticket(state: State, ticket_id: str, compiled=None) -> State:
+    """Run a ticket through the graph under its ID, resuming it if it was interrupted.
+
+    Without a checkpointer this is `graph.invoke(state)`. With one, a ticket that has
+    checkpoints continues from its last completed node, and a finished ticket returns its
+    saved final state without running again. Checkpoints are keyed by the ID and the
+    ticket's subject and description, so a reused ID with new content runs afresh.
+
+    Args:
+        state (State): Initial state (see `new_ticket_state`).
+        ticket_id (str): Ticket ID, part of the checkpoint thread ID.
+        compiled: Compiled graph to use (defaults to `graph`).
+
+    Returns:
+        State: Final state.
+    """
+    compiled = compiled or graph
+    config = ticket_config(ticket_id, state.get("ticket"))
+    if compiled.checkpointer is None:
+        return compiled.invoke(state, config)
+    snapshot = compiled.get_state(config)
+    if snapshot.values and not snapshot.next:
+        return snapshot.values
+    # No checkpoint yet: start from `state`; interrupted: continue from the last completed node.
+    return compiled.invoke(None if snapshot.values else state, config)
+
+
+async def agraph():
+    """Return `graph` compiled with the running event loop's checkpointer (see `aget_checkpointer`)."""
+    checkpointer = await aget_checkpointer()
+    if checkpointer is graph.checkpointer:
+        return graph
+    loop = asyncio.get_running_loop()
+    compiled = _async_graphs.get(loop)
+    if compiled is None or compiled.checkpointer is not checkpointer:
+        compiled = _async_graphs[loop] = compile_graph(checkpointer)
+    return compiled
+
+
+async def ainvoke_ticket(state: State, ticket_id: str, compiled=None) -> State:
+    """Async version of `invoke_ticket`."""
+    compiled = compiled or await agraph()
+    config = ticket_config(ticket_id, state.get("ticket"))
+    if compiled.checkpointer is None:
+        return await compiled.ainvoke(state, config)
+    snapshot = await compiled.aget_state(config)
+    if snapshot.values and not snapshot.next:
+        return snapshot.values
+    return await compiled.ainvoke(None if snapshot.values else state, config)
+
 
 if __name__ == "__main__":
     # Sample ticket (Billing, should approve)
@@ -38,6 +190,7 @@ if __name__ == "__main__":
         "subject": "I was charged twice for the same service",
         "description": "Hi, I noticed two charges on my credit card for this month's billing. Can you look into this?"
     }
-    result = graph.invoke({"ticket": ticket_example, "messages": [], "attempt": 0, "drafts": [], "feedbacks": []})
+    result = invoke_ticket({"ticket": ticket_example, "messages": [], "attempt": 0, "drafts": [], "feedbacks": []},
+                           "example")
     print("Ticket Input (Billing):", ticket_example)
     print("Result:", result)
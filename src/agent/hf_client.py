@@ -0,0 +1,229 @@
+"""Hugging Face inference clients.
+
+Importing `huggingface_hub`'s clients takes a few hundred milliseconds, so `agent.utils`
+imports this module only when the first client is built.
+
+Configuration (environment):
+    LLM_CHAT_TEMPLATE: Jinja chat template (or a path to one) used to render batched
+        prompts. Default: the `chat_template` of the model repository's
+        `tokenizer_config.json`.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from huggingface_hub import AsyncInferenceClient, InferenceClient, hf_hub_download
+from huggingface_hub.utils import get_session
+
+__all__ = ["InferenceClient", "PooledAsyncInferenceClient", "chat_template", "clear_chat_templates",
+           "complete_batch"]
+
+LLM_CHAT_TEMPLATE = os.getenv("LLM_CHAT_TEMPLATE", "")
+# Seconds before a model whose template could not be loaded is tried again.
+CHAT_TEMPLATE_RETRY_SEC = 60.0
+
+_chat_templates: Dict[str, Callable[[str], str]] = {}
+_chat_template_failures: Dict[str, float] = {}
+_chat_templates_lock = threading.Lock()
+
+
+class _PooledSession:
+    """Per-request view over a shared aiohttp session.
+
+    `AsyncInferenceClient` closes the session it gets after every request. Closing this
+    view only releases the response, so the underlying connection goes back to the pool.
+    """
+
+    def __init__(self, session, headers: dict, cookies: Optional[dict]):
+        self._session = session
+        self._headers = headers
+        self._cookies = cookies
+        self._response = None
+
+    async def post(self, url: str, **kwargs):
+        self._response = await self._session.post(url, headers=self._headers, cookies=self._cookies, **kwargs)
+        return self._response
+
+    async def close(self) -> None:
+        if self._response is not None:
+            self._response.release()
+
+
+class PooledAsyncInferenceClient(AsyncInferenceClient):
+    """AsyncInferenceClient that keeps one connection pool and concurrency limit per event loop."""
+
+    def __init__(self, *args, max_concurrency: int = 32, **kwargs):
+        """Take `AsyncInferenceClient`'s arguments plus the per-loop concurrency limit."""
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._pools: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple] = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> tuple:
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None or pool[0].closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(self.timeout),
+                trust_env=self.trust_env,
+            )
+            pool = (session, asyncio.Semaphore(self.max_concurrency))
+            self._pools[loop] = pool
+        return pool
+
+    def _get_client_session(self, headers: Optional[dict] = None) -> _PooledSession:
+        session, _ = self._pool()
+        client_headers = self.headers.copy()
+        if headers is not None:
+            client_headers.update(headers)
+        return _PooledSession(session, client_headers, self.cookies)
+
+    def limiter(self) -> asyncio.Semaphore:
+        """Return the semaphore bounding in-flight requests on the running event loop."""
+        return self._pool()[1]
+
+    async def close(self) -> None:
+        """Close the connection pool bound to the running event loop."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool[0].close()
+
+
+def _token_text(token) -> str:
+    # tokenizer_config.json stores special tokens as strings or as AddedToken dicts.
+    return token.get("content", "") if isinstance(token, dict) else token or ""
+
+
+def chat_template(model: str, load: bool = True) -> Optional[Callable[[str], str]]:
+    """Return a function rendering one user message with `model`'s chat template.
+
+    `/v1/completions` takes raw prompts, so batched requests are rendered here the way
+    the chat endpoint would render them. The template comes from `LLM_CHAT_TEMPLATE` or
+    from the model repository's `tokenizer_config.json`. The leading BOS token is
+    dropped because the server adds it when it tokenizes the prompt.
+
+    Loaded templates are kept for the life of the process. A failed load (e.g. the Hub
+    is unreachable) is retried after `CHAT_TEMPLATE_RETRY_SEC`.
+
+    Args:
+        model (str): Model repository to take the template from.
+        load (bool): Load the template if needed; this may download from the Hub, so
+            async callers pass False and load in a worker thread on a miss.
+
+    Returns:
+        Optional[Callable[[str], str]]: None when no template can be loaded (or jinja2 is
+        not installed); requests for such models are not batched.
+    """
+    render = _chat_templates.get(model)
+    if render is not None or not load:
+        return render
+    with _chat_templates_lock:
+        failed_at = _chat_template_failures.get(model)
+        if model in _chat_templates or (failed_at is not None
+                                        and time.monotonic() - failed_at < CHAT_TEMPLATE_RETRY_SEC):
+            return _chat_templates.get(model)
+    render = _load_chat_template(model)
+    with _chat_templates_lock:
+        if render is None:
+            _chat_template_failures[model] = time.monotonic()
+        else:
+            _chat_templates[model] = render
+            _chat_template_failures.pop(model, None)
+    return render
+
+
+def clear_chat_templates() -> None:
+    """Forget loaded templates and failed loads (e.g. after changing `LLM_CHAT_TEMPLATE`)."""
+    with _chat_templates_lock:
+        _chat_templates.clear()
+        _chat_template_failures.clear()
+
+
+def _load_chat_template(model: str) -> Optional[Callable[[str], str]]:
+    try:
+        from jinja2.sandbox import ImmutableSandboxedEnvironment
+    except ImportError:
+        return None
+    config: dict = {}
+    source = LLM_CHAT_TEMPLATE
+    if source and os.path.isfile(source):
+        with open(source, encoding="utf-8") as f:
+            source = f.read()
+    if not source:
+        try:
+            with open(hf_hub_download(model, "tokenizer_config.json"), encoding="utf-8") as f:
+                config = json.load(f)
+        except Exception:
+            return None
+        source = config.get("chat_template") or ""
+        if isinstance(source, list):  # named templates; the chat one is "default"
+            source = next((entry["template"] for entry in source if entry.get("name") == "default"), "")
+        if not source:
+            return None
+
+    def raise_exception(message: str) -> None:
+        raise ValueError(message)
+
+    env = ImmutableSandboxedEnvironment(trim_blocks=True, lstrip_blocks=True)
+    env.globals["raise_exception"] = raise_exception
+    template = env.from_string(source)
+    bos_token, eos_token = _token_text(config.get("bos_token")), _token_text(config.get("eos_token"))
+
+    def render(message: str) -> str:
+        prompt = template.render(messages=[{"role": "user", "content": message}], add_generation_prompt=True,
+                                 bos_token=bos_token, eos_token=eos_token)
+        return prompt[len(bos_token):] if bos_token and prompt.startswith(bos_token) else prompt
+
+    return render
+
+
+def complete_batch(base_url: str, model: str, prompts: List[str], max_tokens: int, temperature: float,
+                   api_key: Optional[str] = None,
+                   timeout: Optional[float] = None) -> List[Tuple[str, Optional[SimpleNamespace]]]:
+    """Send `prompts` as one OpenAI-compatible `/v1/completions` request (TGI, vLLM).
+
+    The prompts are sent as given, so they must already be rendered with the model's
+    chat template (see `chat_template`). The endpoint reports usage for the whole batch;
+    each prompt gets a share in proportion to its length and the length of its completion.
+
+    Returns:
+        List[Tuple[str, Optional[SimpleNamespace]]]: One stripped completion and its usage
+        (`prompt_tokens`, `completion_tokens`; None when the endpoint reports none) per
+        prompt, in order.
+
+    Raises:
+        requests.HTTPError: The endpoint answered with an error status.
+    """
+    url = base_url.rstrip("/")
+    url += "/completions" if url.endswith("/v1") else "/v1/completions"
+    body = {"model": model, "prompt": prompts, "max_tokens": max_tokens, "temperature": temperature}
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    response = get_session().post(url, json=body, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    payload = response.json()
+    choices = sorted(payload["choices"], key=lambda choice: choice["index"])
+    texts = [choice["text"].strip() for choice in choices]
+    usage = payload.get("usage")
+    if not usage:
+        return [(text, None) for text in texts]
+    prompt_tokens = _apportion(usage.get("prompt_tokens", 0), [len(prompt) for prompt in prompts])
+    completion_tokens = _apportion(usage.get("completion_tokens", 0), [len(text) for text in texts])
+    return [(text, SimpleNamespace(prompt_tokens=p, completion_tokens=c))
+            for text, p, c in zip(texts, prompt_tokens, completion_tokens)]
+
+
+def _apportion(total: int, weights: List[int]) -> List[int]:
+    """Split `total` in proportion to `weights`; the shares add up to `total`."""
+    if not weights:
+        return []
+    weights = weights if sum(weights) else [1] * len(weights)
+    bounds = [round(total * sum(weights[:i]) / sum(weights)) for i in range(len(weights) + 1)]
+    return [high - low for low, high in zip(bounds, bounds[1:])]
@@ -0,0 +1,261 @@
+"""In-memory BM25 index over the knowledge base.
+
+Knowledge files are split into sections (numbered headings such as "3. Payment Failures:",
+or blank-line separated blocks for free-form articles) and indexed once per process, one
+index per category. A category's documents are `knowledge/<category>.txt` plus any
+`knowledge/<category>/**/*.txt` articles. Each query scores every section of the ticket's
+category with BM25 using precomputed per-term posting weights, so a lookup is a handful of
+NumPy scatter-adds regardless of how large the articles are.
+
+The index watches the knowledge directory and rebuilds itself when files are added,
+removed or modified. A search checks at most every `reload_interval` seconds, in a
+background thread, so it never waits for the directory walk or a rebuild; it keeps using
+the current index until the new one is swapped in.
+
+Configuration (environment):
+    KNOWLEDGE_DIR: Knowledge base directory (default: the package's `knowledge/`).
+    RETRIEVAL_TOP_K: Maximum sections returned per ticket (default 3).
+    RETRIEVAL_TOKEN_BUDGET: Approximate token budget for the retrieved context (default 500).
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "knowledge")
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "500"))
+
+_SECTION_HEADING = re.compile(r"^\d+\.\s", re.MULTILINE)
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have i if in is it its me my no not of on or "
+    "our so that the their them there this to was we were what when which will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with common stopwords removed."""
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def split_sections(text: str) -> List[str]:
+    """Split a knowledge document into its numbered sections.
+
+    Text before the first numbered heading (usually the document title) is dropped when
+    numbered sections exist; otherwise the document is split on blank lines.
+    """
+    starts = [m.start() for m in _SECTION_HEADING.finditer(text)]
+    if not starts:
+        return [block.strip() for block in re.split(r"\n\s*\n", text) if block.strip()]
+    bounds = starts + [len(text)]
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """One section of a knowledge file, with its position in the file and its token count."""
+    source: str
+    position: int
+    text: str
+    tokens: int
+
+
+class _CategoryIndex:
+    """BM25 scorer over one category's chunks."""
+
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        term_counts = [Counter(tokenize(c.text)) for c in chunks]
+        lengths = np.array([sum(tc.values()) for tc in term_counts], dtype=np.float32)
+        avgdl = float(lengths.mean()) if len(chunks) and lengths.mean() > 0 else 1.0
+        norm = k1 * (1 - b + b * lengths / avgdl)
+
+        doc_ids: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+        for doc_id, tc in enumerate(term_counts):
+            for term, tf in tc.items():
+                doc_ids.setdefault(term, []).append(doc_id)
+                freqs.setdefault(term, []).append(tf)
+
+        n = len(chunks)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, ids in doc_ids.items():
+            ids_arr = np.array(ids, dtype=np.int32)
+            tf = np.array(freqs[term], dtype=np.float32)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self.postings[term] = (ids_arr, (idf * tf * (k1 + 1) / (tf + norm[ids_arr])).astype(np.float32))
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+
+class KnowledgeIndex:
+    """Category-partitioned section index over a knowledge directory, with hot reload."""
+
+    def __init__(self, directory: str = DEFAULT_KNOWLEDGE_DIR, reload_interval: float = 2.0):
+        """Index the files under `directory`, checking for changes every `reload_interval` seconds."""
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()  # serialises checks and rebuilds; searches never take it
+        self._indexes: Dict[str, _CategoryIndex] = {}
+        self._signature: Tuple = ()
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._refreshing_lock = threading.Lock()
+        self.reload()
+
+    def _files(self) -> Dict[str, List[str]]:
+        files: Dict[str, List[str]] = {}
+        if not os.path.isdir(self.directory):
+            return files
+        for entry in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, entry)
+            if entry.endswith(".txt") and os.path.isfile(path):
+                files.setdefault(entry[:-4].lower(), []).append(path)
+            elif os.path.isdir(path):
+                for root, _, names in sorted(os.walk(path)):
+                    files.setdefault(entry.lower(), []).extend(
+                        os.path.join(root, name) for name in sorted(names) if name.endswith(".txt")
+                    )
+        return files
+
+    def _current_signature(self, files: Dict[str, List[str]]) -> Tuple:
+        signature = []
+        for paths in files.values():
+            for path in paths:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(signature))
+
+    def reload(self) -> None:
+        """Rebuild the index from the knowledge directory."""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        files = self._files()
+        signature = self._current_signature(files)
+        indexes = {}
+        for category, paths in files.items():
+            chunks = []
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    sections = split_sections(f.read())
+                chunks.extend(Chunk(path, i, text, estimate_tokens(text)) for i, text in enumerate(sections))
+            if chunks:
+                indexes[category] = _CategoryIndex(chunks)
+        # One reference swap, so a concurrent search sees either the old index or the new one.
+        self._indexes = indexes
+        self._signature = signature
+        self._checked_at = time.monotonic()
+
+    def refresh_if_changed(self) -> bool:
+        """Reload when the knowledge files changed; returns True if a reload happened."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.reload_interval:
+                return False
+            self._checked_at = now
+            try:
+                changed = self._current_signature(self._files()) != self._signature
+                if changed:
+                    self._rebuild()
+            except FileNotFoundError:  # file removed while scanning; pick it up next time
+                return False
+            return changed
+
+    def _refresh_in_background(self) -> None:
+        """Start a `refresh_if_changed` thread when a check is due and none is running."""
+        with self._refreshing_lock:
+            if self._refreshing or time.monotonic() - self._checked_at < self.reload_interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="knowledge-reload", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh_if_changed()
+        finally:
+            self._refreshing = False
+
+    def categories(self) -> List[str]:
+        """Return the categories that have an index, sorted."""
+        return sorted(self._indexes)
+
+    def search(self, category: str, query: str,
+               top_k: Optional[int] = None,
+               token_budget: Optional[int] = None) -> Optional[List[Chunk]]:
+        """Return the best-matching sections of a category that fit the token budget.
+
+        Sections are picked by descending BM25 score and returned in document order. If
+        nothing matches the query, the category's leading sections are used instead.
+
+        Args:
+            category (str): Ticket category (matched case-insensitively to file names).
+            query (str): Ticket text to score sections against.
+            top_k (Optional[int]): Maximum number of sections (default RETRIEVAL_TOP_K).
+            token_budget (Optional[int]): Token budget (default RETRIEVAL_TOKEN_BUDGET).
+
+        Returns:
+            Optional[List[Chunk]]: Selected sections, or None if the category has no documents.
+        """
+        self._refresh_in_background()
+        index = self._indexes.get(category.lower())
+        if index is None:
+            return None
+        top_k = RETRIEVAL_TOP_K if top_k is None else top_k
+        token_budget = RETRIEVAL_TOKEN_BUDGET if token_budget is None else token_budget
+
+        scores = index.scores(query)
+        order = np.argsort(-scores, kind="stable")
+        if not scores[order[0]] > 0:
+            order = np.arange(len(index.chunks))
+
+        selected, used = [], 0
+        for i in order:
+            chunk = index.chunks[i]
+            if used + chunk.tokens > token_budget:
+                continue
+            selected.append(chunk)
+            used += chunk.tokens
+            if len(selected) >= top_k:
+                break
+        if not selected:
+            # Even the best section is over budget: keep its head rather than nothing.
+            best = index.chunks[order[0]]
+            text = best.text[:token_budget * 4]
+            selected.append(Chunk(best.source, best.position, text, estimate_tokens(text)))
+        return sorted(selected, key=lambda c: (c.source, c.position))
+
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Return the process-wide knowledge index, building it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KnowledgeIndex(os.getenv("KNOWLEDGE_DIR") or DEFAULT_KNOWLEDGE_DIR)
+    return _index
@@ -0,0 +1,495 @@
+"""Resilience policy for LLM calls.
+
+`run_with_policy` / `arun_with_policy` wrap a single-request function and add:
+
+* typed errors (`LLMError` subclasses) instead of error strings;
+* retries of retryable failures (timeouts, connection errors, 408/429/5xx) with
+  full-jitter exponential backoff;
+* hedging: if a request is still running after the model's recent p95 latency (or a
+  fixed delay), a duplicate is sent and the first success wins;
+* a circuit breaker per model/endpoint that opens after a burst of failures and lets a
+  single probe through after a cool-down;
+* an ordered fallback chain of models and endpoints tried when one is exhausted.
+
+Configuration (environment):
+    LLM_MAX_ATTEMPTS: Attempts per model/endpoint (default 3).
+    LLM_BACKOFF_BASE / LLM_BACKOFF_MAX: Backoff base and cap in seconds (default 0.25 / 4).
+    LLM_HEDGE: "off" (default), "p95", or a fixed delay in milliseconds. Hedging trades
+        a few percent more requests for a shorter latency tail.
+    LLM_BREAKER_FAILURES: Failures within LLM_BREAKER_WINDOW seconds that open the
+        circuit (default 5 within 30).
+    LLM_BREAKER_RESET: Seconds an open circuit waits before a probe (default 30).
+    LLM_FALLBACK_MODELS: Comma-separated fallbacks, each "model" (same endpoint) or
+        "model@base_url", e.g. "HuggingFaceH4/zephyr-7b-beta,llama3@http://tgi:8080/v1".
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from agent.metrics import LLM_CIRCUIT_TRANSITIONS, LLM_FALLBACKS, LLM_HEDGES
+
+T = TypeVar("T")
+
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.25"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "off").lower()
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "30"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_FALLBACK_MODELS = os.getenv("LLM_FALLBACK_MODELS", "")
+
+# Hedging on p95 needs some latency history first.
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class LLMError(Exception):
+    """Base class for LLM call failures.
+
+    Attributes:
+        model (Optional[str]): Model the failing request was sent to.
+        status (Optional[int]): HTTP status, when there was one.
+        retryable (bool): Whether retrying the same request may succeed.
+    """
+
+    retryable = False
+
+    def __init__(self, message: str, model: Optional[str] = None, status: Optional[int] = None):
+        """Wrap `message` with the model and HTTP status of the failed request."""
+        super().__init__(message)
+        self.model = model
+        self.status = status
+
+
+class LLMTimeoutError(LLMError):
+    """The request timed out; retryable."""
+    retryable = True
+
+
+class LLMConnectionError(LLMError):
+    """The endpoint could not be reached; retryable."""
+    retryable = True
+
+
+class LLMRateLimitError(LLMError):
+    """The endpoint is rate limiting (HTTP 429) or saturated; retryable."""
+    retryable = True
+
+
+class LLMServerError(LLMError):
+    """The endpoint failed (5xx); retryable."""
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """The request itself was rejected (4xx other than 408/429); retrying will not help."""
+
+
+class CircuitOpenError(LLMError):
+    """The model's circuit breaker is open; the request was not sent."""
+
+
+class LLMUnavailableError(LLMError):
+    """Every model/endpoint in the fallback chain failed.
+
+    Attributes:
+        errors (List[LLMError]): Last error per model/endpoint tried, in order.
+    """
+
+    def __init__(self, errors: List[LLMError]):
+        """Summarize the last error of every model/endpoint tried."""
+        detail = "; ".join(f"{e.model}: {type(e).__name__}: {e}" for e in errors)
+        super().__init__(f"All LLM endpoints failed ({detail})", model=errors[-1].model if errors else None)
+        self.errors = errors
+
+
+def _status(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def to_llm_error(error: BaseException, model: Optional[str] = None) -> LLMError:
+    """Map a client exception (requests, aiohttp, huggingface_hub) to a typed `LLMError`."""
+    if isinstance(error, LLMError):
+        return error
+    message = str(error) or type(error).__name__
+    status = _status(error)
+    if status is not None:
+        if status == 429:
+            return LLMRateLimitError(message, model, status)
+        if status == 408 or status >= 500:
+            return LLMServerError(message, model, status)
+        if status >= 400:
+            return LLMRequestError(message, model, status)
+    name = type(error).__name__
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in name:
+        return LLMTimeoutError(message, model)
+    if isinstance(error, (ConnectionError, OSError)) or "Connect" in name:
+        return LLMConnectionError(message, model)
+    return LLMError(message, model)
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """A model on an endpoint; `base_url=None` means the default endpoint."""
+
+    model: str
+    base_url: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Registry key of the endpoint: the model, qualified by its base URL when set."""
+        return f"{self.model}@{self.base_url}" if self.base_url else self.model
+
+
+def parse_fallbacks(spec: str) -> List[Endpoint]:
+    """Parse LLM_FALLBACK_MODELS into endpoints."""
+    endpoints = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, _, base_url = part.partition("@")
+        endpoints.append(Endpoint(model.strip(), base_url.strip() or None))
+    return endpoints
+
+
+FALLBACKS = parse_fallbacks(LLM_FALLBACK_MODELS)
+
+
+def fallback_chain(model: str, base_url: Optional[str] = None) -> List[Endpoint]:
+    """Return the endpoints to try for `model` (on `base_url`), primary first."""
+    chain = [Endpoint(model, base_url)]
+    chain.extend(e for e in FALLBACKS if e not in chain)
+    return chain
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry number."""
+    base = LLM_BACKOFF_BASE if base is None else base
+    cap = LLM_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Per-model/endpoint circuit breaker.
+
+    Closed -> open after `failures` failures within `window` seconds; open -> half-open
+    after `reset_timeout`, when one probe request is let through; its outcome closes or
+    re-opens the circuit. A probe that ends without a verdict (cancelled) frees the probe
+    slot for the next request.
+    """
+
+    def __init__(self, name: str, failures: int = None, window: float = None, reset_timeout: float = None):
+        """Create a closed breaker; unset limits come from the LLM_BREAKER_* settings."""
+        self.name = name
+        self.failures = LLM_BREAKER_FAILURES if failures is None else failures
+        self.window = LLM_BREAKER_WINDOW if window is None else window
+        self.reset_timeout = LLM_BREAKER_RESET if reset_timeout is None else reset_timeout
+        self.state = "closed"
+        self._failures: Deque[float] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now."""
+        return self.enter() is not None
+
+    def enter(self) -> Optional[bool]:
+        """Admit a request: None if it may not be sent now, else whether it is the probe.
+
+        The caller of an admitted probe must call `end_probe` when the request ends.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition("half_open")
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return None
+
+    def end_probe(self) -> None:
+        """Free the probe slot; a no-op if the probe already recorded its outcome."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        """Close the circuit and clear the failure window."""
+        with self._lock:
+            self._failures.clear()
+            self._probing = False
+            if self.state != "closed":
+                self._transition("closed")
+
+    def record_failure(self) -> None:
+        """Count a failure; re-open a half-open circuit or open a closed one past the limit."""
+        with self._lock:
+            now = time.monotonic()
+            self._probing = False
+            if self.state == "half_open":
+                self._opened_at = now
+                self._transition("open")
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if self.state == "closed" and len(self._failures) >= self.failures:
+                self._opened_at = now
+                self._transition("open")
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        LLM_CIRCUIT_TRANSITIONS.inc(model=self.name, state=state)
+
+
+class LatencyTracker:
+    """Rolling window of successful request latencies for one model/endpoint."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        """Keep the latest `size` latencies."""
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Add one successful request latency."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the `q` quantile (0-1), or None until enough samples are in."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(endpoint: Endpoint) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of `endpoint`, creating it on first use."""
+    with _registry_lock:
+        breaker = _breakers.get(endpoint.key)
+        if breaker is None:
+            breaker = _breakers[endpoint.key] = CircuitBreaker(endpoint.key)
+        return breaker
+
+
+def _tracker(endpoint: Endpoint) -> LatencyTracker:
+    with _registry_lock:
+        tracker = _latencies.get(endpoint.key)
+        if tracker is None:
+            tracker = _latencies[endpoint.key] = LatencyTracker()
+        return tracker
+
+
+def reset_policy() -> None:
+    """Forget circuit breaker and latency state (for tests and benchmarks)."""
+    with _registry_lock:
+        _breakers.clear()
+        _latencies.clear()
+
+
+def hedge_delay(endpoint: Endpoint) -> Optional[float]:
+    """Seconds to wait before sending a duplicate request, or None to not hedge."""
+    if LLM_HEDGE == "off":
+        return None
+    if LLM_HEDGE == "p95":
+        return _tracker(endpoint).percentile(0.95)
+    return float(LLM_HEDGE) / 1000
+
+
+_hedge_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def _pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _hedge_pool
+    if _hedge_pool is None:
+        _hedge_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="llm-hedge")
+    return _hedge_pool
+
+
+def _hedged(send: Callable[[Endpoint], T], endpoint: Endpoint, hedge: bool) -> T:
+    delay = hedge_delay(endpoint) if hedge else None
+    if delay is None:
+        return send(endpoint)
+    first = _pool().submit(send, endpoint)
+    try:
+        return first.result(timeout=delay)
+    except concurrent.futures.TimeoutError:
+        pass
+    second = _pool().submit(send, endpoint)
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # The losing thread cannot be interrupted; its result is discarded.
+                LLM_HEDGES.inc(model=endpoint.key, winner="hedge" if future is second else "original")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _ahedged(send: Callable[[Endpoint], Awaitable[T]], endpoint: Endpoint, hedge: bool) -> T:
+    delay = hedge_delay(endpoint) if hedge else None
+    if delay is None:
+        return await send(endpoint)
+    first = asyncio.ensure_future(send(endpoint))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+    second = asyncio.ensure_future(send(endpoint))
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    LLM_HEDGES.inc(model=endpoint.key, winner="hedge" if task is second else "original")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class _Attempts:
+    """Shared bookkeeping of the policy loop for the sync and async runners."""
+
+    def __init__(self, model: str, on_retry: Optional[Callable[[Endpoint, LLMError], None]],
+                 base_url: Optional[str] = None):
+        self.chain = fallback_chain(model, base_url)
+        self.errors: List[LLMError] = []
+        self.on_retry = on_retry
+
+    def failed(self, endpoint: Endpoint, error: BaseException, attempt: int) -> Optional[float]:
+        """Record a failure; return the backoff before retrying, or None to move on."""
+        err = to_llm_error(error, endpoint.model)
+        breaker = get_breaker(endpoint)
+        if err.retryable:
+            breaker.record_failure()
+        elif breaker.state == "half_open":
+            # The endpoint answered (the request itself was bad), so it is up again.
+            breaker.record_success()
+        if not err.retryable or attempt + 1 >= LLM_MAX_ATTEMPTS or get_breaker(endpoint).state == "open":
+            self.errors.append(err)
+            return None
+        if self.on_retry is not None:
+            self.on_retry(endpoint, err)
+        return backoff_delay(attempt)
+
+    def skipped(self, endpoint: Endpoint) -> None:
+        self.errors.append(CircuitOpenError(f"Circuit open for {endpoint.key}", endpoint.model))
+
+    def moved_on(self, endpoint: Endpoint, index: int) -> None:
+        if index + 1 < len(self.chain):
+            LLM_FALLBACKS.inc(model=endpoint.key, fallback=self.chain[index + 1].key)
+
+    def exhausted(self) -> LLMError:
+        return self.errors[0] if len(self.errors) == 1 else LLMUnavailableError(self.errors)
+
+
+def run_with_policy(model: str, send: Callable[[Endpoint], T], hedge: bool = True,
+                    on_retry: Optional[Callable[[Endpoint, LLMError], None]] = None,
+                    base_url: Optional[str] = None,
+                    prepare: Optional[Callable[[Endpoint], None]] = None) -> T:
+    """Call `send(endpoint)` under the retry, hedging, breaker and fallback policy.
+
+    Args:
+        model (str): Primary model; fallbacks come from LLM_FALLBACK_MODELS.
+        send (Callable[[Endpoint], T]): Performs one request against an endpoint.
+        hedge (bool): Allow hedged duplicates (disable for streaming requests).
+        on_retry (Optional[Callable]): Called before each retry of the same endpoint.
+        base_url (Optional[str]): Endpoint of the primary model; None for the default one.
+        prepare (Optional[Callable[[Endpoint], None]]): One-time setup for an endpoint
+            (building its client, loading a model), run before each attempt's clock
+            starts so a cold start neither triggers a hedge nor skews the latency window.
+
+    Raises:
+        LLMError: The typed error of the only endpoint tried, or `LLMUnavailableError`.
+    """
+    attempts = _Attempts(model, on_retry, base_url)
+    for index, endpoint in enumerate(attempts.chain):
+        breaker = get_breaker(endpoint)
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            probe = breaker.enter()
+            if probe is None:
+                attempts.skipped(endpoint)
+                break
+            try:
+                if prepare is not None:
+                    prepare(endpoint)
+                start = time.perf_counter()
+                result = _hedged(send, endpoint, hedge)
+            except Exception as e:
+                delay = attempts.failed(endpoint, e, attempt)
+                if delay is None:
+                    break
+                time.sleep(delay)
+                continue
+            else:
+                # Recorded before the probe slot is freed, so no second probe slips in.
+                breaker.record_success()
+                _tracker(endpoint).observe(time.perf_counter() - start)
+                return result
+            finally:
+                if probe:
+                    breaker.end_probe()
+        attempts.moved_on(endpoint, index)
+    raise attempts.exhausted()
+
+
+async def arun_with_policy(model: str, send: Callable[[Endpoint], Awaitable[T]], hedge: bool = True,
+                           on_retry: Optional[Callable[[Endpoint, LLMError], None]] = None,
+                           base_url: Optional[str] = None,
+                           prepare: Optional[Callable[[Endpoint], None]] = None) -> T:
+    """Async version of `run_with_policy`; hedged duplicates are cancelled when they lose.
+
+    `prepare` runs in a worker thread, so a slow setup does not stall the event loop.
+    """
+    attempts = _Attempts(model, on_retry, base_url)
+    for index, endpoint in enumerate(attempts.chain):
+        breaker = get_breaker(endpoint)
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            probe = breaker.enter()
+            if probe is None:
+                attempts.skipped(endpoint)
+                break
+            try:
+                if prepare is not None:
+                    # Setup may block (loading a local model); keep the event loop serving.
+                    await asyncio.to_thread(prepare, endpoint)
+                start = time.perf_counter()
+                result = await _ahedged(send, endpoint, hedge)
+            except Exception as e:
+                delay = attempts.failed(endpoint, e, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                continue
+            else:
+                breaker.record_success()
+                _tracker(endpoint).observe(time.perf_counter() - start)
+                return result
+            finally:
+                # Also runs on cancellation: a cancelled probe gives no verdict.
+                if probe:
+                    breaker.end_probe()
+        attempts.moved_on(endpoint, index)
+    raise attempts.exhausted()
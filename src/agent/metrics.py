@@ -0,0 +1,459 @@
+"""Low-overhead instrumentation for graph nodes and LLM calls.
+
+Every node and every LLM call records its wall time, token usage, cost and errors into
+in-process counters and fixed-bucket histograms (a lock and a few additions per
+observation, cheap enough to leave on in production). The registry is exported in the
+Prometheus text format by `render_prometheus()` and, when METRICS_PORT is set, served
+over HTTP at `/metrics`. If OpenTelemetry is installed, each node and LLM call also
+opens a span. Wrapping a ticket run in `ticket_trace()` collects a per-ticket summary,
+appended as a JSON line to TRACE_LOG_PATH when that is set.
+
+Configuration (environment):
+    METRICS_PORT: Serve `/metrics` on this port (see `start_metrics_server`).
+    TRACE_LOG_PATH: JSONL file receiving one trace summary per ticket.
+    LLM_COST_PER_1K_PROMPT_TOKENS / LLM_COST_PER_1K_COMPLETION_TOKENS: Cost model in USD.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH") or None
+COST_PER_1K_PROMPT_TOKENS = float(os.getenv("LLM_COST_PER_1K_PROMPT_TOKENS", "0"))
+COST_PER_1K_COMPLETION_TOKENS = float(os.getenv("LLM_COST_PER_1K_COMPLETION_TOKENS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_DELAY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        """Create an empty counter exported as `name` with `documentation` as its help text."""
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add `amount` to the series of `labels`."""
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value of the series of `labels` (0 when unseen)."""
+        return self._values.get(_labels(labels), 0.0)
+
+    def series(self) -> Dict[Labels, float]:
+        """Return the value of every label set."""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> List[str]:
+        """Return the series in the Prometheus text format."""
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+    def reset(self) -> None:
+        """Drop every series."""
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels, exported like a Prometheus histogram."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """Create an empty histogram with upper bucket bounds `buckets`."""
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record `value` in the series of `labels`."""
+        key = _labels(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        """Return the number of observations of the series of `labels`."""
+        series = self._values.get(_labels(labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels: str) -> float:
+        """Return the sum of the observations of the series of `labels`."""
+        series = self._values.get(_labels(labels))
+        return series[1] if series else 0.0
+
+    def series(self) -> Dict[Labels, Tuple[float, int]]:
+        """Return (sum, count) for every label set."""
+        with self._lock:
+            return {k: (v[1], v[2]) for k, v in self._values.items()}
+
+    def samples(self) -> List[str]:
+        """Return the buckets, sum and count of every series in the Prometheus text format."""
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def reset(self) -> None:
+        """Drop every series."""
+        with self._lock:
+            self._values.clear()
+
+
+NODE_DURATION = Histogram("agent_node_duration_seconds", "Wall time per graph node execution.")
+NODE_ERRORS = Counter("agent_node_errors_total", "Graph node executions that raised.")
+LLM_DURATION = Histogram("agent_llm_duration_seconds", "Wall time per LLM call.")
+LLM_TTFT = Histogram("agent_llm_time_to_first_token_seconds", "Time to first streamed token per LLM call.")
+LLM_CALLS = Counter("agent_llm_calls_total", "LLM calls by node, model and status.")
+LLM_RETRIES = Counter("agent_llm_retries_total", "LLM call retries by node and model.")
+LLM_PROMPT_TOKENS = Histogram("agent_llm_prompt_tokens", "Prompt tokens per LLM call.", TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = Histogram("agent_llm_completion_tokens", "Completion tokens per LLM call.", TOKEN_BUCKETS)
+LLM_COST = Counter("agent_llm_cost_usd_total", "Estimated LLM spend in USD.")
+LLM_HEDGES = Counter("agent_llm_hedges_total", "Hedged LLM requests by model and winning request.")
+LLM_FALLBACKS = Counter("agent_llm_fallbacks_total", "Moves from an exhausted model/endpoint to the next fallback.")
+LLM_CIRCUIT_TRANSITIONS = Counter("agent_llm_circuit_transitions_total", "Circuit breaker state changes by model.")
+LLM_ROUTE_CALLS = Counter("agent_llm_route_calls_total", "Routed LLM calls by route, model and status.")
+LLM_ROUTE_DURATION = Histogram("agent_llm_route_duration_seconds", "Wall time per routed LLM call.")
+LLM_ROUTE_COST = Counter("agent_llm_route_cost_usd_total", "Estimated LLM spend in USD per route.")
+LLM_ROUTE_ESCALATIONS = Counter("agent_llm_route_escalations_total", "Unusable routed answers re-asked on the escalation route.")
+LLM_BATCH_SIZE = Histogram("agent_llm_batch_size", "Requests per micro-batched LLM request.", BATCH_SIZE_BUCKETS)
+LLM_BATCH_QUEUE_DELAY = Histogram("agent_llm_batch_queue_delay_seconds", "Time a request waited for its micro-batch.", QUEUE_DELAY_BUCKETS)
+PROMPT_SECTION_TOKENS = Histogram("agent_prompt_section_tokens", "Tokens per assembled prompt section (section=total for the whole prompt).", TOKEN_BUCKETS)
+PROMPT_TRIMMED_TOKENS = Counter("agent_prompt_trimmed_tokens_total", "Tokens cut from prompt sections to fit node budgets.")
+REVIEW_ROUTES = Counter("agent_review_routes_total", "route_review decisions (retry_draft or end).")
+REVIEW_PRECHECKS = Counter("agent_review_prechecks_total", "Local draft pre-check outcomes (Approved, Escalate or deferred).")
+EARLY_ESCALATIONS = Counter("agent_early_escalations_total", "Retry loops cut short by early escalation, by reason.")
+TICKETS_COALESCED = Counter("agent_tickets_coalesced_total", "Tickets that shared an in-flight run of a matching ticket.")
+RESPONSE_CACHE_LOOKUPS = Counter("agent_response_cache_lookups_total", "Response cache lookups by result (exact_hit, similar_hit or miss).")
+RESPONSE_CACHE_EVICTIONS = Counter("agent_response_cache_evictions_total", "Response cache entries evicted to stay within capacity.")
+TICKET_DURATION = Histogram("agent_ticket_duration_seconds", "End-to-end wall time per traced ticket.")
+
+REGISTRY: List[Any] = [
+    NODE_DURATION, NODE_ERRORS, LLM_DURATION, LLM_TTFT, LLM_CALLS, LLM_RETRIES,
+    LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS, LLM_COST, LLM_HEDGES, LLM_FALLBACKS, LLM_CIRCUIT_TRANSITIONS,
+    LLM_ROUTE_CALLS, LLM_ROUTE_DURATION, LLM_ROUTE_COST, LLM_ROUTE_ESCALATIONS,
+    LLM_BATCH_SIZE, LLM_BATCH_QUEUE_DELAY, PROMPT_SECTION_TOKENS, PROMPT_TRIMMED_TOKENS,
+    REVIEW_ROUTES, REVIEW_PRECHECKS, EARLY_ESCALATIONS, TICKETS_COALESCED,
+    RESPONSE_CACHE_LOOKUPS, RESPONSE_CACHE_EVICTIONS, TICKET_DURATION,
+]
+
+
+def render_prometheus() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """Clear all recorded values (mainly for tests and benchmarks)."""
+    for metric in REGISTRY:
+        metric.reset()
+
+
+try:  # OpenTelemetry is optional
+    from opentelemetry import trace as _otel_trace
+
+    _tracer = _otel_trace.get_tracer("agent")
+except ImportError:  # pragma: no cover - depends on the environment
+    _tracer = None
+
+
+def _span(name: str, **attributes: Any):
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+@dataclass
+class TicketTrace:
+    """Per-ticket record of node timings and LLM calls."""
+
+    ticket_id: Optional[str] = None
+    nodes: List[Dict[str, Any]] = field(default_factory=list)
+    llm_calls: List[Dict[str, Any]] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the trace as a JSON-ready dict with per-node seconds and LLM totals."""
+        node_seconds: Dict[str, float] = {}
+        for record in self.nodes:
+            node_seconds[record["node"]] = node_seconds.get(record["node"], 0.0) + record["seconds"]
+        return {
+            "ticket_id": self.ticket_id,
+            "duration_seconds": round(self.duration, 6),
+            "node_seconds": {k: round(v, 6) for k, v in node_seconds.items()},
+            "review_rounds": sum(1 for r in self.nodes if r["node"] == "review"),
+            "llm_calls": len(self.llm_calls),
+            "llm_errors": sum(1 for c in self.llm_calls if c["error"]),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in self.llm_calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in self.llm_calls),
+            "cost_usd": round(sum(c["cost_usd"] for c in self.llm_calls), 6),
+            "node_errors": [r["node"] for r in self.nodes if r["error"]],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[TicketTrace]] = contextvars.ContextVar("agent_trace", default=None)
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar("agent_node", default="none")
+_trace_log_lock = threading.Lock()
+
+
+def current_node() -> str:
+    """Name of the graph node currently executing in this context."""
+    return _current_node.get()
+
+
+def _finish_trace(trace: TicketTrace, path: Optional[str]) -> None:
+    trace.duration = time.perf_counter() - trace.started_at
+    TICKET_DURATION.observe(trace.duration)
+    path = path or TRACE_LOG_PATH
+    if path:
+        line = json.dumps(trace.summary())
+        with _trace_log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextlib.contextmanager
+def ticket_trace(ticket_id: Optional[str] = None, path: Optional[str] = None) -> Iterator[TicketTrace]:
+    """Collect a per-ticket trace for everything run inside the block.
+
+    The summary is appended to `path` (default TRACE_LOG_PATH) as a JSON line.
+    """
+    trace = TicketTrace(ticket_id=ticket_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        _finish_trace(trace, path)
+
+
+def traced_stream(make_stream: Callable[[], Iterator], ticket_id: Optional[str] = None,
+                  path: Optional[str] = None) -> Iterator:
+    """Iterate `make_stream()` with a ticket trace active.
+
+    Unlike `ticket_trace`, this works when the consumer resumes the iterator from
+    different threads (as Gradio does), because every step runs in one private context.
+    """
+    ctx = contextvars.copy_context()
+    trace = TicketTrace(ticket_id=ticket_id)
+    ctx.run(_current_trace.set, trace)
+    try:
+        iterator = ctx.run(make_stream)
+        while True:
+            try:
+                item = ctx.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        _finish_trace(trace, path)
+
+
+def _record_node(name: str, seconds: float, error: Optional[BaseException]) -> None:
+    NODE_DURATION.observe(seconds, node=name)
+    if error is not None:
+        NODE_ERRORS.inc(node=name, error=type(error).__name__)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.nodes.append({"node": name, "seconds": seconds, "error": error is not None})
+
+
+def instrument_node(name: str, func: Callable) -> Callable:
+    """Wrap a (sync or async) node function so each execution is timed and traced."""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(state, *args, **kwargs):
+            token = _current_node.set(name)
+            start = time.perf_counter()
+            error = None
+            try:
+                with _span(f"node.{name}"):
+                    return await func(state, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _record_node(name, time.perf_counter() - start, error)
+                _current_node.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state, *args, **kwargs):
+        token = _current_node.set(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            with _span(f"node.{name}"):
+                return func(state, *args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _record_node(name, time.perf_counter() - start, error)
+            _current_node.reset(token)
+
+    return wrapper
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used when the backend does not report usage."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class LLMCall:
+    """Measurement of one LLM request; finish with `finish()` or `fail()`.
+
+    Calls made on a route (`agent.routing`) are also recorded under the route's name,
+    priced with the route's `prices` (per 1K prompt and completion tokens) when given.
+    """
+
+    def __init__(self, model: str, prompt: str, route: Optional[str] = None,
+                 prices: Optional[Tuple[Optional[float], Optional[float]]] = None):
+        """Start measuring a call to `model` and open its trace span."""
+        self.model = model
+        self.prompt = prompt
+        self.route = route
+        self.prices = prices or (None, None)
+        self.node = _current_node.get()
+        self.start = time.perf_counter()
+        self.retries = 0
+        self._span = _span("llm.call", model=model, node=self.node)
+        self._span.__enter__()
+
+    def first_token(self) -> float:
+        """Record and return the time to first token in seconds."""
+        seconds = time.perf_counter() - self.start
+        LLM_TTFT.observe(seconds, node=self.node, model=self.model)
+        return seconds
+
+    def retry(self) -> None:
+        """Count one retry of this call."""
+        self.retries += 1
+        LLM_RETRIES.inc(node=self.node, model=self.model)
+
+    def finish(self, completion: str, usage: Any = None) -> None:
+        """Record a successful call, using the reported usage or estimated token counts."""
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or estimate_tokens(self.prompt)
+        completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(completion)
+        self._record(prompt_tokens, completion_tokens, None)
+
+    def fail(self, error: BaseException) -> None:
+        """Record a failed call with its estimated prompt tokens."""
+        self._record(estimate_tokens(self.prompt), 0, error)
+
+    def _record(self, prompt_tokens: int, completion_tokens: int, error: Optional[BaseException]) -> None:
+        seconds = time.perf_counter() - self.start
+        labels = {"node": self.node, "model": self.model}
+        prompt_price, completion_price = self.prices
+        prompt_price = COST_PER_1K_PROMPT_TOKENS if prompt_price is None else prompt_price
+        completion_price = COST_PER_1K_COMPLETION_TOKENS if completion_price is None else completion_price
+        cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+        status = "error" if error else "ok"
+        LLM_DURATION.observe(seconds, **labels)
+        LLM_CALLS.inc(status=status, **labels)
+        LLM_PROMPT_TOKENS.observe(prompt_tokens, **labels)
+        LLM_COMPLETION_TOKENS.observe(completion_tokens, **labels)
+        if cost:
+            LLM_COST.inc(cost, **labels)
+        if self.route is not None:
+            route_labels = {"route": self.route, "model": self.model}
+            LLM_ROUTE_DURATION.observe(seconds, **route_labels)
+            LLM_ROUTE_CALLS.inc(status=status, **route_labels)
+            if cost:
+                LLM_ROUTE_COST.inc(cost, **route_labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.llm_calls.append({
+                "node": self.node, "model": self.model, "route": self.route, "seconds": seconds,
+                "retries": self.retries,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "cost_usd": cost, "error": type(error).__name__ if error else None,
+            })
+        self._span.__exit__(type(error) if error else None, error, None)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Serve `/metrics` from a daemon thread; uses METRICS_PORT when `port` is omitted.
+
+    Returns None when no port is configured.
+    """
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0")) or None
+    if port is None:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
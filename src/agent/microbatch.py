@@ -0,0 +1,177 @@
+"""Cross-ticket micro-batching of LLM requests.
+
+With many tickets in flight, `classify_ticket` and `review_draft` send many small
+requests with identical parameters. `MicroBatcher` holds each request for up to a short
+window (or until `max_size` requests with the same `BatchKey` are waiting) and sends
+them as one batched request. Inference servers that batch on the GPU (TGI, vLLM)
+answer a batch in about the time of one request, so throughput rises at the cost of
+up to one window of added latency per request.
+
+Batched requests go to the OpenAI-compatible `/v1/completions` endpoint, which accepts
+a list of prompts. They therefore need a self-hosted endpoint (`HUGGINGFACE_BASE_URL`),
+and each prompt is rendered with the model's chat template first
+(`agent.hf_client.chat_template`); models without a known template are not batched.
+Streaming calls and requests with a `response_format` (which `/v1/completions` does
+not take) are never batched.
+
+Configuration (environment):
+    LLM_MICROBATCH_WINDOW_MS: Longest time a request waits for its batch to fill
+        (default 0: micro-batching disabled).
+    LLM_MICROBATCH_MAX_SIZE: Requests per batch; a full batch is sent at once (default 16).
+    LLM_MICROBATCH_WORKERS: Batches in flight at the same time (default 8).
+"""
+
+import concurrent.futures
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from agent.metrics import LLM_BATCH_QUEUE_DELAY, LLM_BATCH_SIZE
+
+LLM_MICROBATCH_WINDOW_MS = float(os.getenv("LLM_MICROBATCH_WINDOW_MS", "0"))
+LLM_MICROBATCH_MAX_SIZE = int(os.getenv("LLM_MICROBATCH_MAX_SIZE", "16"))
+LLM_MICROBATCH_WORKERS = int(os.getenv("LLM_MICROBATCH_WORKERS", "8"))
+
+
+class BatchKey(NamedTuple):
+    """Parameters shared by every request in a batch."""
+
+    model: str
+    max_tokens: int
+    temperature: float
+    base_url: Optional[str] = None  # None: the default endpoint
+    timeout: Optional[float] = None  # None: LLM_TIMEOUT
+
+
+class _Request(NamedTuple):
+    prompt: str
+    future: concurrent.futures.Future
+    queued_at: float
+
+
+# Sends one batch; returns one result (e.g. completion and usage) per prompt, in order.
+SendBatch = Callable[[BatchKey, List[str]], List[Any]]
+
+
+class MicroBatcher:
+    """Groups concurrent requests with the same `BatchKey` into batched requests.
+
+    Callers get a `concurrent.futures.Future` from `submit`, so sync code waits on
+    `result()` and async code awaits `asyncio.wrap_future(...)`. A failed batch fails
+    every request in it. Requests cancelled before their batch is sent are left out of
+    it; the others are unaffected.
+
+    Args:
+        send (SendBatch): Sends one batch (called from a worker thread).
+        window (float): Seconds the oldest request of a key may wait for more requests.
+        max_size (int): Requests per batch.
+        workers (int): Batches sent concurrently.
+    """
+
+    def __init__(self, send: SendBatch, window: float = LLM_MICROBATCH_WINDOW_MS / 1000,
+                 max_size: int = LLM_MICROBATCH_MAX_SIZE, workers: int = LLM_MICROBATCH_WORKERS):
+        """Start the dispatcher thread and the pool that sends batches."""
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self._queues: Dict[BatchKey, Deque[_Request]] = {}
+        self._cond = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                               thread_name_prefix="llm-batch")
+        self._stats = {"requests": 0, "batches": 0, "max_batch_size": 0, "failed_batches": 0}
+        self._delays: Deque[float] = deque(maxlen=10000)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="llm-microbatcher")
+        self._thread.start()
+
+    def submit(self, key: BatchKey, prompt: str) -> concurrent.futures.Future:
+        """Queue `prompt` for the next batch of `key`; the future resolves to its result."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            queue = self._queues.setdefault(key, deque())
+            queue.append(_Request(prompt, future, time.perf_counter()))
+            self._stats["requests"] += 1
+            if len(queue) == 1 or len(queue) >= self.max_size:
+                self._cond.notify()
+        return future
+
+    def _due(self, now: float) -> Tuple[List[Tuple[BatchKey, List[_Request]]], Optional[float]]:
+        """Pop the batches that are full or whose oldest request has waited a full window."""
+        batches, wake_at = [], None
+        for key, queue in list(self._queues.items()):
+            while queue and (len(queue) >= self.max_size or now - queue[0].queued_at >= self.window
+                             or self._closed):
+                batches.append((key, [queue.popleft() for _ in range(min(self.max_size, len(queue)))]))
+            if queue:
+                deadline = queue[0].queued_at + self.window
+                wake_at = deadline if wake_at is None else min(wake_at, deadline)
+            else:
+                del self._queues[key]
+        return batches, wake_at
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                batches, wake_at = self._due(time.perf_counter())
+                if not batches:
+                    if self._closed:
+                        return
+                    self._cond.wait(None if wake_at is None else max(0.0, wake_at - time.perf_counter()))
+                    continue
+            for key, requests in batches:
+                self._executor.submit(self._flush, key, requests)
+
+    def _flush(self, key: BatchKey, requests: List[_Request]) -> None:
+        # Claim each future; requests whose caller gave up (e.g. a cancelled await) are not sent.
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+        sent_at = time.perf_counter()
+        for request in requests:
+            LLM_BATCH_QUEUE_DELAY.observe(sent_at - request.queued_at, model=key.model)
+        LLM_BATCH_SIZE.observe(len(requests), model=key.model)
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(requests))
+            self._delays.extend(sent_at - request.queued_at for request in requests)
+        try:
+            completions = self.send(key, [request.prompt for request in requests])
+            if len(completions) != len(requests):
+                raise ValueError(f"Batch of {len(requests)} prompts got {len(completions)} completions")
+        except BaseException as e:
+            with self._cond:
+                self._stats["failed_batches"] += 1
+            for request in requests:
+                with contextlib.suppress(concurrent.futures.InvalidStateError):
+                    request.future.set_exception(e)
+            return
+        for request, completion in zip(requests, completions):
+            with contextlib.suppress(concurrent.futures.InvalidStateError):
+                request.future.set_result(completion)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request and batch counts, batch sizes and queueing delay (ms)."""
+        with self._cond:
+            stats: Dict[str, Any] = dict(self._stats)
+            delays = np.array(self._delays) * 1000
+        stats["mean_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queue_delay_ms"] = {
+            "mean": round(float(delays.mean()), 2) if len(delays) else 0.0,
+            "p99": round(float(np.percentile(delays, 99)), 2) if len(delays) else 0.0,
+        }
+        return stats
+
+    def close(self) -> None:
+        """Send whatever is queued, then stop the dispatcher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
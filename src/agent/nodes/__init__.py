@@ -1,13 +1,25 @@
-from .classify import classify_ticket
+from .classify import classify_ticket, aclassify_ticket
 from .retrieval import retrieve_context
-from .draft import generate_draft
-from .review import review_draft
-from .retry_draft import retry_draft
+from .cache import lookup_cached_response
+from .draft import generate_draft, agenerate_draft
+from .review import review_draft, areview_draft
+from .retry_draft import retry_draft, aretry_draft
+from .speculative import draft_candidate, adraft_candidate, fan_out_drafts, select_draft, speculative_width
 
 __all__ = [
     "classify_ticket",
+    "aclassify_ticket",
     "retrieve_context",
+    "lookup_cached_response",
     "generate_draft",
+    "agenerate_draft",
     "review_draft",
+    "areview_draft",
     "retry_draft",
-]
\ No newline at end of file
+    "aretry_draft",
+    "draft_candidate",
+    "adraft_candidate",
+    "fan_out_drafts",
+    "select_draft",
+    "speculative_width",
+]
@@ -0,0 +1,42 @@
+"""Response cache lookup node and the helper that stores approved drafts."""
+
+from langchain_core.messages import HumanMessage
+
+from agent.cache import get_response_cache
+from agent.state import State
+
+
+def lookup_cached_response(state: State) -> State:
+    """Reuse an approved draft for an identical or near-identical ticket, if one is cached.
+
+    Args:
+        state (State): Current state with ticket, category, and context.
+
+    Returns:
+        State: On a hit, the approved cached draft as output; otherwise an empty update.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return {"cached": False}
+
+    ticket = state["ticket"]
+    entry = cache.lookup(state["category"], ticket["subject"], ticket["description"])
+    if entry is None:
+        return {"cached": False}
+
+    messages = [HumanMessage(content="Approved response found in cache.")]
+    return {
+        "cached": True,
+        "approved": True,
+        "output": entry.draft,
+        "drafts": [entry.draft],
+        "messages": messages
+    }
+
+
+def cache_approved_draft(state: State, draft: str) -> None:
+    """Store an approved draft so later duplicates of this ticket can skip drafting and review."""
+    cache = get_response_cache()
+    if cache is not None:
+        ticket = state["ticket"]
+        cache.store(state["category"], ticket["subject"], ticket["description"], draft)
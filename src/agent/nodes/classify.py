@@ -1,51 +1,149 @@
 from langchain_core.messages import HumanMessage
 from agent.state import State
 from agent.prompts import classify_prompt
-from agent.utils import call_llm
+from agent.utils import call_llm, acall_llm
+from agent.preclassify import get_preclassifier
+from agent.prompt_budget import assemble_prompt
+from agent.llm_policy import LLMError
+from agent.routing import escalated_request, routed_request
 
 MOCK_RESPONSE = False  # Toggle to False for API calls
 
-def classify_ticket(state: State) -> State:
-    """Classify the ticket into a category.
+VALID_CATEGORIES = ["Billing", "Technical", "Security", "General"]
 
-    Args:
-        state (State): Current state with ticket details.
 
-    Returns:
-        State: Updated state with category and messages.
-    """
-    
+def _classify_request(state: State) -> dict:
+    """Build the `call_llm` keyword arguments for classifying the ticket in `state`."""
     ticket = state["ticket"]
-    message = classify_prompt.format(subject=ticket["subject"], description=ticket["description"])
-    
-    valid_categories = ["Billing", "Technical", "Security", "General"]
-    mock_response = "Billing" if MOCK_RESPONSE else None
-    
-    try:
-        response = call_llm(
-            message=message,
-            mock_response=mock_response,
-            max_tokens=50,
-            temperature=0
-        )
-        # Validate output
-        if response.rstrip('.').strip() not in valid_categories:
-            error_msg = f"Invalid category: {response}. Using fallback: General"
-            messages = state["messages"] + [HumanMessage(content=error_msg)]
-            return {
-                "category": "General",
-                "messages": messages
-            }
-    except ValueError as e:
-        error_msg = f"Classification error: {str(e)}. Using fallback: General"
-        messages = state["messages"] + [HumanMessage(content=error_msg)]
+    return routed_request({
+        "message": assemble_prompt("classify", classify_prompt,
+                                   {"subject": ticket["subject"], "description": ticket["description"]}),
+        "mock_response": "Billing" if MOCK_RESPONSE else None,
+        "max_tokens": 50,
+        "temperature": 0,
+    }, "classify")
+
+
+def _valid_category(response: str) -> bool:
+    return response.rstrip('.').strip() in VALID_CATEGORIES
+
+
+def _classification_update(state: State, response: str) -> State:
+    """Validate the LLM label and build the state update, falling back to General."""
+    if not _valid_category(response):
+        error_msg = f"Invalid category: {response}. Using fallback: General"
+        messages = [HumanMessage(content=error_msg)]
         return {
             "category": "General",
             "messages": messages
         }
-    
-    messages = state["messages"] + [HumanMessage(content=f"Ticket classified as: {response}")]
+
+    messages = [HumanMessage(content=f"Ticket classified as: {response}")]
     return {
         "category": response,
         "messages": messages
-    } 
\ No newline at end of file
+    }
+
+
+def _classification_error(state: State, error: Exception) -> State:
+    """Fall back when the LLM label is unavailable.
+
+    Uses the pre-classifier's best guess if the LLM failed and a pre-classifier is
+    configured, else General.
+    """
+    preclassifier = get_preclassifier() if isinstance(error, LLMError) else None
+    if preclassifier is not None:
+        ticket = state["ticket"]
+        prediction = preclassifier.predict(ticket["subject"], ticket["description"])
+        messages = [HumanMessage(
+            content=f"Classification error: {str(error)}. Using pre-classifier: {prediction.category}"
+        )]
+        return {
+            "category": prediction.category,
+            "messages": messages
+        }
+    error_msg = f"Classification error: {str(error)}. Using fallback: General"
+    messages = [HumanMessage(content=error_msg)]
+    return {
+        "category": "General",
+        "messages": messages
+    }
+
+
+def _local_classification(state: State):
+    """Return a state update from the local pre-classifier if it is confident, else None."""
+    preclassifier = get_preclassifier()
+    if preclassifier is None:
+        return None
+    ticket = state["ticket"]
+    prediction = preclassifier.classify(ticket["subject"], ticket["description"])
+    if prediction is None:
+        return None
+    messages = [HumanMessage(
+        content=f"Ticket pre-classified as: {prediction.category} (confidence {prediction.confidence:.2f})"
+    )]
+    return {
+        "category": prediction.category,
+        "messages": messages
+    }
+
+
+def llm_classify_ticket(state: State) -> State:
+    """Classify the ticket with the LLM only, bypassing the local pre-classifier.
+
+    An invalid label from a routed model is re-asked once on the route's escalation
+    target, if it has one (see `agent.routing`).
+
+    Args:
+        state (State): Current state with ticket details.
+
+    Returns:
+        State: Updated state with category and messages.
+    """
+    request = _classify_request(state)
+    try:
+        response = call_llm(**request)
+        escalated = None if _valid_category(response) else escalated_request(request, "invalid_category")
+        if escalated is not None:
+            response = call_llm(**escalated)
+    except (ValueError, LLMError) as e:
+        return _classification_error(state, e)
+    return _classification_update(state, response)
+
+
+def classify_ticket(state: State) -> State:
+    """Classify the ticket into a category.
+
+    Confident local pre-classifier predictions are used as-is; everything else goes
+    to the LLM.
+
+    Args:
+        state (State): Current state with ticket details.
+
+    Returns:
+        State: Updated state with category and messages.
+    """
+    return _local_classification(state) or llm_classify_ticket(state)
+
+
+async def aclassify_ticket(state: State) -> State:
+    """Async version of `classify_ticket`.
+
+    Args:
+        state (State): Current state with ticket details.
+
+    Returns:
+        State: Updated state with category and messages.
+    """
+    local = _local_classification(state)
+    if local is not None:
+        return local
+    request = _classify_request(state)
+    try:
+        response = await acall_llm(**request)
+        escalated = None if _valid_category(response) else escalated_request(request, "invalid_category")
+        if escalated is not None:
+            response = await acall_llm(**escalated)
+    except (ValueError, LLMError) as e:
+        return _classification_error(state, e)
+    return _classification_update(state, response)
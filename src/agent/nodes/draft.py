@@ -1,31 +1,27 @@
 from langchain_core.messages import HumanMessage
 from agent.state import State
 from agent.prompts import draft_prompt
-from agent.utils import call_llm
+from agent.utils import stream_llm, astream_llm
+from agent.prompt_budget import assemble_prompt
+from agent.llm_policy import LLMError
+from agent.routing import routed_request
+from agent.nodes.failure import llm_failure_update
 
 MOCK_RESPONSE = False  # Toggle to False for API calls
 
-def generate_draft(state: State) -> State:
-    """Generate a draft response based on ticket and context.
-    
-    Args:
-        state (State): Current state with ticket, category, and context.
-        
-    Returns:
-        State: Updated state with draft response and messages.
-    """
-    
+
+def _draft_request(state: State) -> dict:
+    """Build the `call_llm` keyword arguments for drafting a response to the ticket in `state`."""
     ticket = state["ticket"]
-    category = state["category"]
-    context = state["context"]
-    
-    message = draft_prompt.format(
-        subject=ticket["subject"],
-        description=ticket["description"],
-        category=category,
-        context=context
+
+    message = assemble_prompt(
+        "draft",
+        draft_prompt,
+        {"subject": ticket["subject"], "description": ticket["description"],
+         "category": state["category"], "feedback": ""},
+        trimmable=[("context", state["context"])],
     )
-    
+
     mock_response = (
         "Dear Customer,\n\nThank you for reaching out. We apologize for the double charge on your account. "
         "Please verify your transaction history in the billing portal to confirm the charges. "
@@ -33,16 +29,52 @@ def generate_draft(state: State) -> State:
         "We have escalated your case to our billing team for further investigation, and you will hear back within 24-48 hours.\n\n"
         "Best regards,\nSupport Team"
     ) if MOCK_RESPONSE else None
-    
-    response = call_llm(
-        message=message,
-        mock_response=mock_response,
-        max_tokens=400,
-        temperature=0.3
-    )
-    
-    messages = state["messages"] + [HumanMessage(content=f"Draft response generated: {response}")]
+
+    return routed_request({
+        "message": message,
+        "mock_response": mock_response,
+        "max_tokens": 400,
+        "temperature": 0.3,
+        "node": "draft",
+    }, "draft", state["category"])
+
+
+def _draft_update(state: State, response: str) -> State:
+    # The text is stored once in `drafts`; the message log only references it by index.
+    index = len(state.get("drafts") or [])
     return {
-        "draft": response,
-        "messages": messages
-    }
\ No newline at end of file
+        "drafts": [response],
+        "messages": [HumanMessage(content=f"Draft response generated: drafts[{index}]")]
+    }
+
+
+def generate_draft(state: State) -> State:
+    """Generate a draft response based on ticket and context.
+
+    Args:
+        state (State): Current state with ticket, category, and context.
+
+    Returns:
+        State: Update appending the draft to `drafts` and a message referencing it, or
+        an escalation if the LLM is unavailable.
+    """
+    try:
+        return _draft_update(state, stream_llm(**_draft_request(state)))
+    except LLMError as e:
+        return llm_failure_update(state, "draft", e)
+
+
+async def agenerate_draft(state: State) -> State:
+    """Async version of `generate_draft`.
+
+    Args:
+        state (State): Current state with ticket, category, and context.
+
+    Returns:
+        State: Update appending the draft to `drafts` and a message referencing it, or
+        an escalation if the LLM is unavailable.
+    """
+    try:
+        return _draft_update(state, await astream_llm(**_draft_request(state)))
+    except LLMError as e:
+        return llm_failure_update(state, "draft", e)
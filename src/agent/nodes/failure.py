@@ -0,0 +1,46 @@
+"""Escalation logging and the state update for tickets whose LLM calls failed."""
+
+from datetime import datetime
+
+from langchain_core.messages import HumanMessage
+
+from agent.escalation import get_escalation_sink
+from agent.llm_policy import LLMError
+from agent.state import State, current_draft
+
+LLM_FAILURE_OUTPUT = "Ticket escalated to human agent: the language model is unavailable."
+
+
+def log_escalation(state: State, draft: str, reason: str) -> None:
+    """Queue the ticket in `state` for a human agent; never blocks the graph on disk I/O."""
+    ticket = state["ticket"]
+    get_escalation_sink().log({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "subject": ticket["subject"],
+        "description": ticket["description"],
+        "category": state.get("category", ""),
+        "draft": draft,
+        "reason": reason,
+    })
+
+
+def llm_failure_update(state: State, node: str, error: LLMError) -> State:
+    """Escalate the ticket after an LLM failure that survived retries and fallbacks.
+
+    Args:
+        state (State): Current state.
+        node (str): Node whose LLM call failed.
+        error (LLMError): The typed failure.
+
+    Returns:
+        State: Update setting `llm_error` and the escalation output; the graph routes
+        such tickets straight to END.
+    """
+    description = f"{type(error).__name__}: {error}"
+    log_escalation(state, current_draft(state), f"LLM failure in {node}. {description}")
+    return {
+        "llm_error": description,
+        "approved": False,
+        "output": LLM_FAILURE_OUTPUT,
+        "messages": [HumanMessage(content=f"LLM failure in {node}: {description}. Escalating.")],
+    }
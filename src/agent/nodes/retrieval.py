@@ -1,31 +1,31 @@
-import os
 from agent.state import State
+from agent.knowledge_index import get_knowledge_index
 from langchain_core.messages import HumanMessage
 
 def retrieve_context(state: State) -> State:
-    """Retrieve context from knowledge base based on ticket category.
-    
+    """Retrieve the knowledge base sections most relevant to the ticket within its category.
+
     Args:
-        state (State): Current state with ticket category.
-        
+        state (State): Current state with ticket and category.
+
     Returns:
         State: Updated state with retrieved context and messages.
-    
+
     """
-    
+
     category = state["category"].rstrip(".")
-    filepath = f"src/agent/knowledge/{category.lower()}.txt"
-    
-    if not os.path.exists(filepath):
+    ticket = state["ticket"]
+    chunks = get_knowledge_index().search(category, f"{ticket['subject']} {ticket['description']}")
+
+    if not chunks:
         context = "No relevant documentation found."
-        messages = state["messages"] + [HumanMessage(content=f"Retrieval failed: No documentation for category {category}.")]
+        messages = [HumanMessage(content=f"Retrieval failed: No documentation for category {category}.")]
         return {"context": context, "messages": messages}
-    
-    with open(filepath, "r") as file:
-        context = file.read().strip()[:1500]
-    
-    messages = state["messages"] + [HumanMessage(content=f"Retrieved context for category {category}.")]
+
+    context = "\n\n".join(chunk.text for chunk in chunks)
+
+    messages = [HumanMessage(content=f"Retrieved {len(chunks)} sections for category {category}.")]
     return {
         "context": context,
         "messages": messages
-    }
\ No newline at end of file
+    }
@@ -1,48 +1,82 @@
 from langchain_core.messages import HumanMessage
 from agent.state import State
-from agent.prompts import draft_prompt
-from agent.utils import call_llm
+from agent.prompts import draft_prompt, retry_feedback_section
+from agent.utils import stream_llm, astream_llm
+from agent.prompt_budget import assemble_prompt, format_feedback
+from agent.llm_policy import LLMError
+from agent.routing import routed_request
+from agent.nodes.failure import llm_failure_update
 
 MOCK_RESPONSE = False  # Toggle to False for API calls
 
-def retry_draft(state: State) -> State:
-    """Regenerate the draft using feedback.
 
-    Args:
-        state (State): Current state with ticket, category, context, and feedbacks.
-        
-    Returns:
-        State: Updated state with new draft response and messages.
-    
-    """
-    
+def _retry_request(state: State) -> dict:
+    """Build the `call_llm` keyword arguments for redrafting with the reviewer feedback in `state`."""
     ticket = state["ticket"]
-    category = state["category"]
     context = state["context"]
-    feedbacks = state["feedbacks"]
-    
-    message = draft_prompt.format(
-        subject=ticket["subject"],
-        description=ticket["description"],
-        category=category,
-        context=f"{context}\n\nFeedback from previous draft: {feedbacks or 'No specific feedback provided. Ensure the response is concise and actionable.'}"
+    feedback = format_feedback(state.get("feedbacks") or []) or (
+        "- No specific feedback provided. Ensure the response is concise and actionable."
+    )
+
+    # Feedback is kept over context when the prompt must be trimmed to its budget.
+    message = assemble_prompt(
+        "retry_draft",
+        draft_prompt,
+        {"subject": ticket["subject"], "description": ticket["description"], "category": state["category"]},
+        trimmable=[("feedback", retry_feedback_section.format(feedback=feedback)), ("context", context)],
     )
-    
+
     mock_response = (
         "Hello Customer,\n\nThank you for contacting us regarding the double charge on your account. We apologize for the inconvenience. "
         "Please check your transaction history at https://billing.company.com to confirm the charges. If duplicates are found, submit a ticket with the transaction IDs, "
         "and a refund will be processed within 5-7 business days. If the issue persists, contact our billing team for further assistance.\n\nBest regards,\nSupport Team"
     ) if MOCK_RESPONSE else None
-    
-    response = call_llm(
-        message=message,
-        mock_response=mock_response,
-        max_tokens=400,
-        temperature=0.3
-    )
-    
-    messages = state["messages"] + [HumanMessage(content=f"Retry draft generated: {response}")]
+
+    return routed_request({
+        "message": message,
+        "mock_response": mock_response,
+        "max_tokens": 400,
+        "temperature": 0.3,
+        "node": "retry_draft",
+    }, "retry_draft", state["category"])
+
+
+def _retry_update(state: State, response: str) -> State:
+    index = len(state.get("drafts") or [])
     return {
-        "draft": response,
-        "messages": messages
-    }
\ No newline at end of file
+        "drafts": [response],
+        "messages": [HumanMessage(content=f"Retry draft generated: drafts[{index}]")]
+    }
+
+
+def retry_draft(state: State) -> State:
+    """Regenerate the draft using feedback.
+
+    Args:
+        state (State): Current state with ticket, category, context, and feedbacks.
+
+    Returns:
+        State: Update appending the new draft to `drafts` and a message referencing it, or
+        an escalation if the LLM is unavailable.
+
+    """
+    try:
+        return _retry_update(state, stream_llm(**_retry_request(state)))
+    except LLMError as e:
+        return llm_failure_update(state, "retry_draft", e)
+
+
+async def aretry_draft(state: State) -> State:
+    """Async version of `retry_draft`.
+
+    Args:
+        state (State): Current state with ticket, category, context, and feedbacks.
+
+    Returns:
+        State: Update appending the new draft to `drafts` and a message referencing it, or
+        an escalation if the LLM is unavailable.
+    """
+    try:
+        return _retry_update(state, await astream_llm(**_retry_request(state)))
+    except LLMError as e:
+        return llm_failure_update(state, "retry_draft", e)
@@ -1,113 +1,286 @@
+import json
 import os
-import csv
-from datetime import datetime
+import re
+from typing import Optional
 from langchain_core.messages import HumanMessage
-from agent.state import State
-from agent.prompts import review_prompt, feedback_prompt
-from agent.utils import call_llm
+from agent.state import MAX_REVIEWS, State, current_draft
+from agent.prompts import review_prompt, structured_review_prompt
+from agent.utils import call_llm, acall_llm
+from agent.nodes.cache import cache_approved_draft
+from agent.llm_policy import LLMError
+from agent.nodes.failure import llm_failure_update, log_escalation
+from agent.metrics import EARLY_ESCALATIONS, REVIEW_PRECHECKS
+from agent.early_escalation import (
+    EARLY_ESCALATION_OUTPUT, draft_similarity, get_early_escalator, get_review_history, record_review,
+)
+from agent.precheck import precheck_draft
+from agent.prompt_budget import assemble_prompt
+from agent.routing import escalated_request, routed_request
 
 MOCK_RESPONSE = False  # Toggle to False for API calls
 
-def review_draft(state: State) -> State:
-    """Review the draft response for relevance, completeness, and professionalism.
+# "structured" asks for schema-constrained JSON (verdict, scores, feedback); "text" uses the
+# original free-text "Approved"/"Escalate" prompt. Both parsers accept either format.
+REVIEW_MODE = os.getenv("REVIEW_MODE", "structured").lower()
 
-    Args:
-        state (State): Current state with ticket, category, context, and draft.
+# Free-text verdicts, as `review_prompt` asks for them ("Response: Approved" and
+# "Feedback (if Escalate): ...") or bare ("Escalate" and "Feedback: ...").
+_TEXT_VERDICT = re.compile(r"(?:Response:\s*)?\[?(Approved|Escalate)\b")
+_TEXT_FEEDBACK = re.compile(r"^Feedback(?: \(if Escalate\))?:[ \t]*(.*)", re.MULTILINE | re.DOTALL)
 
-    Returns:
-        State: Updated state with approval status, output, and feedback if rejected.
-    """
-    
+SCORE_KEYS = ("relevance", "completeness", "professionalism")
+REVIEW_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verdict": {"type": "string", "enum": ["Approved", "Escalate"]},
+        "scores": {
+            "type": "object",
+            "properties": {key: {"type": "integer", "minimum": 1, "maximum": 5} for key in SCORE_KEYS},
+            "required": list(SCORE_KEYS),
+        },
+        "feedback": {"type": "string"},
+    },
+    "required": ["verdict", "scores", "feedback"],
+}
+
+
+def _review_request(state: State) -> dict:
+    """Build the `call_llm` keyword arguments for reviewing the draft in `state`."""
     ticket = state["ticket"]
-    category = state["category"]
-    context = state["context"]
-    draft = state["draft"]
-    attempt = state.get("attempt", 0)
-    drafts = state.get("drafts", []) + [draft]
-    feedbacks = state.get("feedbacks", [])
-    
-    message = review_prompt.format(
-        subject=ticket["subject"],
-        description=ticket["description"],
-        category=category,
-        context=context,
-        draft=draft
+    structured = REVIEW_MODE == "structured"
+    # The draft under review is never trimmed; only the context gives way to the budget.
+    message = assemble_prompt(
+        "review",
+        structured_review_prompt if structured else review_prompt,
+        {"subject": ticket["subject"], "description": ticket["description"],
+         "category": state["category"], "draft": current_draft(state)},
+        trimmable=[("context", state["context"])],
     )
-    
-    mock_response = "Approved" if MOCK_RESPONSE else None
+    mock_response = None
+    if MOCK_RESPONSE:
+        mock_response = json.dumps({
+            "verdict": "Approved", "scores": dict.fromkeys(SCORE_KEYS, 5), "feedback": ""
+        }) if structured else "Approved"
+    request = {
+        "message": message,
+        "mock_response": mock_response,
+        "max_tokens": 150 if structured else 100,
+        "temperature": 0,
+    }
+    if structured:
+        request["response_format"] = {"type": "json", "value": REVIEW_SCHEMA}
+    return routed_request(request, "review", state["category"])
+
+
+def _local_review(state: State) -> Optional[tuple]:
+    """Settle obvious drafts with the rule-based pre-check; None defers to the LLM."""
+    ticket = state["ticket"]
+    result = precheck_draft(current_draft(state), ticket["subject"], ticket["description"])
+    REVIEW_PRECHECKS.inc(verdict=result.verdict or "deferred")
+    if result.verdict is None:
+        return None
+    messages = [HumanMessage(content=f"Draft pre-check result: {result.verdict}")]
+    return result.verdict, result.feedback, messages, None
+
+
+def _parse_json_review(response: str) -> Optional[tuple]:
+    """Parse a structured review into (review_result, feedback, scores), or None if it isn't JSON."""
+    start, end = response.find("{"), response.rfind("}")
+    if start < 0 or end < start:
+        return None
     try:
-        response = call_llm(
-            message=message,
-            mock_response=mock_response,
-            max_tokens=100,
-            temperature=0
-        )
-        # Validate output
-        response = response.strip()
-        valid_responses = ["Approved", "Escalate"]
-        if not response.startswith(tuple(valid_responses)):
-            error_msg = f"Invalid review response: {response}. Falling back to Escalate."
-            feedback = "Invalid review output. Please ensure draft is relevant and complete."
-            messages = state["messages"] + [HumanMessage(content=error_msg)]
-            review_result = "Escalate"
-        else:
-            review_result = "Approved" if response.startswith("Approved") else "Escalate"
-            feedback = response.split("\nFeedback: ")[1].strip() if "\nFeedback: " in response else None
-            messages = state["messages"] + [HumanMessage(content=f"Draft review result: {review_result}")]
-    except ValueError as e:
-        error_msg = f"Review error: {str(e)}. Falling back to Escalate."
-        feedback = "API error occurred. Please ensure draft is relevant and complete."
-        messages = state["messages"] + [HumanMessage(content=error_msg)]
-        review_result = "Escalate"
-    
+        data = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    raw_scores = data.get("scores") if isinstance(data.get("scores"), dict) else {}
+    scores = {key: int(raw_scores[key]) for key in SCORE_KEYS if isinstance(raw_scores.get(key), (int, float))}
+    verdict = str(data.get("verdict", "")).strip().capitalize()
+    if verdict not in ("Approved", "Escalate"):
+        if not scores:
+            return None
+        # No usable verdict: approve when every score is acceptable.
+        verdict = "Approved" if min(scores.values()) >= 3 else "Escalate"
+    feedback = str(data.get("feedback") or "").strip() or None
+    return verdict, feedback if verdict == "Escalate" else None, scores or None
+
+
+def _parseable_review(response: str) -> bool:
+    """Whether `_parse_review` can read a verdict from `response`."""
+    response = response.strip()
+    return _TEXT_VERDICT.match(response) is not None or _parse_json_review(response) is not None
+
+
+def _parse_review(state: State, response: str) -> tuple:
+    """Parse the reviewer output into (review_result, feedback, messages, scores)."""
+    response = response.strip()
+    structured = _parse_json_review(response)
+    if structured is not None:
+        review_result, feedback, scores = structured
+        detail = f" ({', '.join(f'{k} {v}' for k, v in scores.items())})" if scores else ""
+        messages = [HumanMessage(content=f"Draft review result: {review_result}{detail}")]
+        return review_result, feedback, messages, scores
+
+    # Free-text fallback
+    verdict = _TEXT_VERDICT.match(response)
+    if verdict is None:
+        error_msg = f"Invalid review response: {response}. Falling back to Escalate."
+        feedback = "Invalid review output. Please ensure draft is relevant and complete."
+        messages = [HumanMessage(content=error_msg)]
+        return "Escalate", feedback, messages, None
+
+    review_result = verdict.group(1)
+    feedback = None
+    if review_result == "Escalate":
+        match = _TEXT_FEEDBACK.search(response, verdict.end())
+        if match:
+            feedback = match.group(1).strip().strip("[]").strip() or None
+    messages = [HumanMessage(content=f"Draft review result: {review_result}")]
+    return review_result, feedback, messages, None
+
+
+def _review_error(state: State, error: Exception) -> tuple:
+    error_msg = f"Review error: {str(error)}. Falling back to Escalate."
+    feedback = "API error occurred. Please ensure draft is relevant and complete."
+    messages = [HumanMessage(content=error_msg)]
+    return "Escalate", feedback, messages, None
+
+
+def _early_escalation_reason(state: State, attempt: int, feedback, scores, similarity) -> Optional[str]:
+    """Return why a rejected draft should not get another round, or None (see `agent.early_escalation`)."""
+    escalator = get_early_escalator()
+    if escalator is None or attempt >= MAX_REVIEWS - 1:
+        return None
+    ticket = state["ticket"]
+    return escalator.reason(state["category"], ticket["subject"], ticket["description"], attempt,
+                            feedback, scores, similarity)
+
+
+def _review_update(state: State, review_result: str, feedback, messages: list, scores=None) -> State:
+    """Build the state update for a review verdict, logging the ticket on final or early escalation."""
+    draft = current_draft(state)
+    attempt = state.get("attempt", 0)
+    drafts = state.get("drafts") or []
+    similarity = None
+    if len(drafts) > 1 and (get_review_history() is not None or get_early_escalator() is not None):
+        similarity = draft_similarity(draft, drafts[-2])
+    early = None
+    if review_result != "Approved":
+        early = _early_escalation_reason(state, attempt, feedback, scores, similarity)
+    ticket = state["ticket"]
+    record_review(state["category"], ticket["subject"], ticket["description"], attempt, review_result,
+                  feedback, scores, similarity, early=early is not None)
+
     if review_result == "Approved":
-        return {
+        cache_approved_draft(state, draft)
+        update = {
             "approved": True,
             "output": draft,
             "messages": messages,
-            "drafts": drafts,
-            "feedbacks": feedbacks,
             "attempt": attempt
         }
-    
-    if feedback:
-        messages = messages + [HumanMessage(content=f"Feedback for rejected draft: {feedback}")]
-    
-    if attempt >= 2:
-        log_filepath = "escalation_log.csv"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = {
-            "timestamp": timestamp,
-            "subject": ticket["subject"],
-            "description": ticket["description"],
-            "category": category,
-            "draft": draft,
-            "reason": f"Draft rejected after {attempt + 1} attempts. Feedback: {feedback or 'No specific feedback provided.'}"
-        }
-        
-        file_exists = os.path.exists(log_filepath)
-        with open(log_filepath, "a", newline="") as csvfile:
-            fieldnames = ["timestamp", "subject", "description", "category", "draft", "reason"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(log_entry)
-        
-        return {
-            "approved": False,
-            # "feedback": feedback,
-            "messages": messages,
-            "drafts": drafts,
-            "feedbacks": feedbacks + [feedback] if feedback else feedbacks,
-            "attempt": attempt + 1,
-            "output": "Ticket escalated to human agent after max retries."
-        }
-    
-    return {
+        if scores:
+            update["review_scores"] = scores
+        return update
+
+    update = {
         "approved": False,
-        # "feedback": feedback,
         "messages": messages,
-        "drafts": drafts,
-        "feedbacks": feedbacks + [feedback] if feedback else feedbacks,
         "attempt": attempt + 1
-    }
\ No newline at end of file
+    }
+    if scores:
+        update["review_scores"] = scores
+    if feedback:
+        # Appended by the `feedbacks` reducer; the message log only references it.
+        index = len(state.get("feedbacks") or [])
+        update["feedbacks"] = [feedback]
+        update["messages"] = messages + [HumanMessage(content=f"Feedback for rejected draft: feedbacks[{index}]")]
+
+    if attempt >= MAX_REVIEWS - 1:
+        log_escalation(state, draft, f"Draft rejected after {attempt + 1} attempts. "
+                                     f"Feedback: {feedback or 'No specific feedback provided.'}")
+        update["output"] = "Ticket escalated to human agent after max retries."
+    elif early is not None:
+        EARLY_ESCALATIONS.inc(reason="similar_draft" if "similar" in early else "predicted")
+        log_escalation(state, draft, f"Escalated early after {attempt + 1} attempts: {early}. "
+                                     f"Feedback: {feedback or 'No specific feedback provided.'}")
+        update["early_escalation"] = early
+        update["output"] = EARLY_ESCALATION_OUTPUT
+        update["messages"] = update["messages"] + [HumanMessage(content=f"Escalating early: {early}.")]
+
+    return update
+
+
+def assess_draft(state: State) -> tuple:
+    """Judge the current draft without updating state: pre-check first, then one LLM review.
+
+    A routed review that cannot be parsed is re-asked once on the route's escalation
+    target, if it has one (see `agent.routing`).
+
+    Returns:
+        tuple: (review_result, feedback, messages, scores).
+
+    Raises:
+        LLMError: The review call failed after retries and fallbacks.
+    """
+    verdict = _local_review(state)
+    if verdict is not None:
+        return verdict
+    request = _review_request(state)
+    try:
+        response = call_llm(**request)
+        escalated = None if _parseable_review(response) else escalated_request(request, "unparseable_review")
+        if escalated is not None:
+            response = call_llm(**escalated)
+        return _parse_review(state, response)
+    except ValueError as e:
+        return _review_error(state, e)
+
+
+async def aassess_draft(state: State) -> tuple:
+    """Async version of `assess_draft`."""
+    verdict = _local_review(state)
+    if verdict is not None:
+        return verdict
+    request = _review_request(state)
+    try:
+        response = await acall_llm(**request)
+        escalated = None if _parseable_review(response) else escalated_request(request, "unparseable_review")
+        if escalated is not None:
+            response = await acall_llm(**escalated)
+        return _parse_review(state, response)
+    except ValueError as e:
+        return _review_error(state, e)
+
+
+def review_draft(state: State) -> State:
+    """Review the draft response for relevance, completeness, and professionalism.
+
+    Obvious cases are settled by the local pre-check; the rest take one structured LLM call.
+
+    Args:
+        state (State): Current state with ticket, category, context, and draft.
+
+    Returns:
+        State: Updated state with approval status, output, and feedback if rejected.
+    """
+    try:
+        return _review_update(state, *assess_draft(state))
+    except LLMError as e:
+        return llm_failure_update(state, "review", e)
+
+
+async def areview_draft(state: State) -> State:
+    """Async version of `review_draft`.
+
+    Args:
+        state (State): Current state with ticket, category, context, and draft.
+
+    Returns:
+        State: Updated state with approval status, output, and feedback if rejected.
+    """
+    try:
+        return _review_update(state, *await aassess_draft(state))
+    except LLMError as e:
+        return llm_failure_update(state, "review", e)
@@ -0,0 +1,174 @@
+"""Speculative drafting: several draft candidates per ticket, reviewed in parallel.
+
+`SPECULATIVE_DRAFTS` sets the number of candidates per category. `fan_out_drafts`
+sends one `draft_candidate` per style and `select_draft` keeps the best reviewed one.
+"""
+
+import os
+from typing import Any, Dict, List
+
+from langchain_core.messages import HumanMessage
+from langgraph.types import Send
+
+from agent.llm_policy import LLMError
+from agent.nodes.cache import cache_approved_draft
+from agent.nodes.failure import llm_failure_update
+from agent.nodes.review import aassess_draft, assess_draft
+from agent.prompt_budget import assemble_prompt
+from agent.prompts import draft_prompt
+from agent.routing import routed_request
+from agent.state import State
+from agent.utils import acall_llm, call_llm
+
+
+def parse_widths(spec: str) -> Dict[str, int]:
+    """Parse a fan-out spec such as "3" or "Security=3,Technical=2,*=1" into {category: width}.
+
+    "*" (or a bare number) sets the default for categories that are not listed.
+    """
+    widths: Dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        category, _, width = part.rpartition("=")
+        widths[category.strip() or "*"] = max(1, int(width))
+    return widths
+
+
+# Number of draft candidates generated in parallel per category; 1 keeps the sequential loop.
+SPECULATIVE_WIDTHS = parse_widths(os.getenv("SPECULATIVE_DRAFTS", "1"))
+
+# Each candidate varies the sampling temperature and the instruction it gets.
+CANDIDATE_STYLES = [
+    "",
+    "Lead with the concrete resolution steps and timelines from the context.",
+    "Keep it especially brief and direct, under 120 words.",
+    "Acknowledge the customer's concern first, then give the steps.",
+]
+
+
+def speculative_width(category: str) -> int:
+    """Return how many draft candidates to generate for `category`."""
+    return SPECULATIVE_WIDTHS.get(category, SPECULATIVE_WIDTHS.get("*", 1))
+
+
+def fan_out_drafts(state: State) -> List[Send]:
+    """Build one `Send` per draft candidate for the ticket in `state`."""
+    width = speculative_width(state["category"])
+    payload = {key: state[key] for key in ("ticket", "category", "context")}
+    return [Send("draft_candidate", {**payload, "candidate": i}) for i in range(width)]
+
+
+def _candidate_request(candidate: Dict[str, Any]) -> dict:
+    """Build the `call_llm` keyword arguments for one draft candidate."""
+    ticket = candidate["ticket"]
+    index = candidate["candidate"]
+    message = assemble_prompt(
+        "draft_candidate",
+        draft_prompt,
+        {"subject": ticket["subject"], "description": ticket["description"],
+         "category": candidate["category"], "feedback": ""},
+        trimmable=[("context", candidate["context"])],
+    )
+    style = CANDIDATE_STYLES[index % len(CANDIDATE_STYLES)]
+    if style:
+        head, _, tail = message.rpartition("Response:")
+        message = f"{head}Style: {style}\n\nResponse:{tail}"
+    return routed_request({
+        "message": message,
+        "max_tokens": 400,
+        "temperature": min(1.0, 0.3 + 0.2 * index),
+    }, "draft_candidate", candidate["category"])
+
+
+def _candidate_update(candidate: Dict[str, Any], draft: str, verdict: tuple) -> State:
+    review_result, feedback, _, scores = verdict
+    return {"candidates": [{
+        "candidate": candidate["candidate"],
+        "draft": draft,
+        "approved": review_result == "Approved",
+        "feedback": feedback,
+        "scores": scores or {},
+        "error": None,
+    }]}
+
+
+def _candidate_failure(candidate: Dict[str, Any], error: LLMError) -> State:
+    return {"candidates": [{
+        "candidate": candidate["candidate"],
+        "draft": "",
+        "approved": False,
+        "feedback": None,
+        "scores": {},
+        "error": f"{type(error).__name__}: {error}",
+    }]}
+
+
+def draft_candidate(candidate: Dict[str, Any]) -> State:
+    """Generate and review one speculative draft candidate.
+
+    Args:
+        candidate (Dict[str, Any]): `Send` payload with ticket, category, context and candidate index.
+
+    Returns:
+        State: Update appending the reviewed candidate (or its LLM failure) to `candidates`.
+    """
+    try:
+        draft = call_llm(**_candidate_request(candidate))
+        return _candidate_update(candidate, draft, assess_draft({**candidate, "drafts": [draft]}))
+    except LLMError as e:
+        return _candidate_failure(candidate, e)
+
+
+async def adraft_candidate(candidate: Dict[str, Any]) -> State:
+    """Async version of `draft_candidate`.
+
+    Args:
+        candidate (Dict[str, Any]): `Send` payload with ticket, category, context and candidate index.
+
+    Returns:
+        State: Update appending the reviewed candidate (or its LLM failure) to `candidates`.
+    """
+    try:
+        draft = await acall_llm(**_candidate_request(candidate))
+        return _candidate_update(candidate, draft, await aassess_draft({**candidate, "drafts": [draft]}))
+    except LLMError as e:
+        return _candidate_failure(candidate, e)
+
+
+def _rank(candidate: Dict[str, Any]) -> tuple:
+    return candidate["approved"], sum(candidate["scores"].values()), -candidate["candidate"]
+
+
+def select_draft(state: State) -> State:
+    """Pick the best reviewed candidate: the highest-scoring approved one, if any.
+
+    Without an approved candidate, the best one becomes the current draft, the distinct
+    feedback is recorded and the round counts as one review attempt, so the ticket
+    continues in the sequential retry loop. Candidates whose LLM calls failed are
+    ignored; if all of them failed, the ticket is escalated.
+
+    Args:
+        state (State): Current state with `candidates`.
+
+    Returns:
+        State: Updated state with the selected draft, approval status and output or feedback.
+    """
+    candidates = [c for c in state["candidates"] if not c.get("error")]
+    if not candidates:
+        errors = "; ".join(c["error"] for c in state["candidates"])
+        return llm_failure_update(state, "draft_candidate", LLMError(f"All draft candidates failed ({errors})"))
+    best = max(candidates, key=_rank)
+    approved = sum(1 for c in candidates if c["approved"])
+    messages = [HumanMessage(
+        content=f"Selected draft candidate {best['candidate']} of {len(candidates)} ({approved} approved)"
+    )]
+    update = {"drafts": [best["draft"]], "messages": messages}
+    if best["scores"]:
+        update["review_scores"] = best["scores"]
+    if best["approved"]:
+        cache_approved_draft(state, best["draft"])
+        update.update({"approved": True, "output": best["draft"], "attempt": state.get("attempt", 0)})
+        return update
+
+    feedbacks = list(dict.fromkeys(c["feedback"] for c in candidates if c["feedback"]))
+    update.update({"approved": False, "feedbacks": feedbacks, "attempt": state.get("attempt", 0) + 1})
+    return update
@@ -0,0 +1,109 @@
+"""Local rule-based draft pre-check.
+
+Runs before the review LLM call and settles obvious cases in microseconds. A draft
+that breaks a hard requirement of the draft prompt (no greeting or closing, too short
+or too long, placeholders left in, an LLM error string) is rejected with feedback
+naming the problems. Everything else goes to the LLM reviewer: passing the rules says
+nothing about whether the answer is right, so by default the pre-check never approves.
+In "full" mode a draft that passes every rule and shares enough vocabulary with the
+ticket is also approved locally, trading the reviewer's quality gate for latency.
+
+Configuration (environment):
+    REVIEW_PRECHECK: "reject" (only reject, default), "full" (also approve) or "off".
+    REVIEW_PRECHECK_MIN_OVERLAP: Fraction of the ticket's content words a draft must
+        mention to be approved locally (default 0.3).
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from agent.knowledge_index import tokenize
+
+PRECHECK_MODE = os.getenv("REVIEW_PRECHECK", "reject").lower()
+MIN_OVERLAP = float(os.getenv("REVIEW_PRECHECK_MIN_OVERLAP", "0.3"))
+
+MIN_WORDS = 20
+MAX_WORDS = 300
+
+_GREETING = re.compile(r"^\s*(hello|hi|dear|greetings|good (morning|afternoon|evening))\b", re.IGNORECASE)
+_CLOSING = re.compile(r"\b(regards|sincerely|thank you|thanks|support team|best wishes)\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(
+    r"\[(customer|name|your name|agent|company|date|link|insert[^\]]*)\]|\{[a-z_]+\}|<[a-z_ ]+>|\b(TBD|TODO|XXX|lorem ipsum)\b",
+    re.IGNORECASE,
+)
+_ERROR_PREFIX = "Error calling LLM"
+
+
+@dataclass
+class PrecheckResult:
+    """Outcome of the local checks.
+
+    Attributes:
+        verdict (Optional[str]): "Approved", "Escalate", or None when the LLM should decide.
+        problems (List[str]): Rule violations, phrased as reviewer feedback.
+    """
+
+    verdict: Optional[str]
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def feedback(self) -> Optional[str]:
+        """The problems joined into one feedback string, or None when there are none."""
+        return "; ".join(self.problems) if self.problems else None
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def ticket_overlap(draft: str, subject: str, description: str) -> float:
+    """Fraction of the ticket's distinct content words that also appear in the draft."""
+    ticket_words = {_stem(w) for w in tokenize(f"{subject} {description}") if not any(c.isdigit() for c in w)}
+    if not ticket_words:
+        return 1.0
+    draft_words = {_stem(w) for w in tokenize(draft)}
+    return len(ticket_words & draft_words) / len(ticket_words)
+
+
+def check_draft(draft: str, subject: str, description: str) -> PrecheckResult:
+    """Apply the structural rules to `draft` (ignores `PRECHECK_MODE`)."""
+    text = (draft or "").strip()
+    if not text or text.startswith(_ERROR_PREFIX):
+        return PrecheckResult("Escalate", ["Draft generation failed; write a complete response"])
+
+    problems = []
+    if not _GREETING.search(text):
+        problems.append("Start with a polite greeting (e.g., 'Hello Customer')")
+    if not _CLOSING.search(text[-200:]):
+        problems.append("End with a professional closing (e.g., 'Best regards, Support Team')")
+    words = len(text.split())
+    if words < MIN_WORDS:
+        problems.append("Add specific, actionable steps; the response is too short")
+    elif words > MAX_WORDS:
+        problems.append(f"Shorten the response to under {MAX_WORDS} words")
+    placeholder = _PLACEHOLDER.search(text)
+    if placeholder:
+        problems.append(f"Replace the placeholder '{placeholder.group(0)}'")
+    if problems:
+        return PrecheckResult("Escalate", problems)
+
+    if ticket_overlap(text, subject, description) >= MIN_OVERLAP:
+        return PrecheckResult("Approved")
+    return PrecheckResult(None)
+
+
+def precheck_draft(draft: str, subject: str, description: str) -> PrecheckResult:
+    """Run the pre-check according to `PRECHECK_MODE`.
+
+    Returns:
+        PrecheckResult: A verdict the review node can use without an LLM call, or
+        `verdict=None` to defer to the LLM reviewer.
+    """
+    if PRECHECK_MODE == "off":
+        return PrecheckResult(None)
+    result = check_draft(draft, subject, description)
+    if result.verdict == "Approved" and PRECHECK_MODE != "full":
+        return PrecheckResult(None)
+    return result
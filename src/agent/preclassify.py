@@ -0,0 +1,306 @@
+"""Local ticket pre-classifier.
+
+A keyword/regex rule table and an optional hashed n-gram linear model score every
+ticket in a few microseconds. When the combined confidence reaches the threshold the
+category is used directly and the classify LLM call is skipped; otherwise the ticket
+falls through to the LLM.
+
+Configuration (environment):
+    PRECLASSIFY_THRESHOLD: Minimum confidence to skip the LLM (default 0.85; >1 disables).
+    PRECLASSIFY_MODEL: Path to a model trained with `python -m agent.preclassify train`.
+
+Usage:
+    python -m agent.preclassify train escalation_log.csv history.jsonl --out preclassify.npz
+    python -m agent.preclassify benchmark labelled.jsonl --model preclassify.npz
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.escalation import read_escalation_file
+
+CATEGORIES = ["Billing", "Technical", "Security", "General"]
+
+PRECLASSIFY_THRESHOLD = float(os.getenv("PRECLASSIFY_THRESHOLD", "0.85"))
+
+# One hit per matching pattern, not per occurrence.
+RULES: Dict[str, List[str]] = {
+    "Billing": [
+        r"\b(charg(e|ed|es|ing)|overcharg\w*)\b",
+        r"\brefund\w*\b",
+        r"\b(invoice\w*|receipt\w*)\b",
+        r"\bbill(ing|ed)?\b",
+        r"\b(payment\w*|pay|paid)\b",
+        r"\bsubscription\w*\b",
+        r"\b(credit|debit) card\b",
+        r"\b(price|pricing|plan) (change|upgrade|downgrade)\b",
+    ],
+    "Technical": [
+        r"\b(crash\w*|freez\w*|hang\w*)\b",
+        r"\berror\w*\b",
+        r"\bbug\w*\b",
+        r"\b(can'?t|cannot|unable to) (log ?in|sign ?in|access|load|open|connect)\b",
+        r"\b(not|isn'?t|won'?t|doesn'?t) (work\w*|load\w*|open\w*|sync\w*)\b",
+        r"\b(slow|timeout|time out|outage|down)\b",
+        r"\b(app|website|browser|upload|download|install\w*|update)\b",
+        r"\b(connect\w*|network|wifi|server)\b",
+    ],
+    "Security": [
+        r"\b(hack\w*|compromis\w*|breach\w*)\b",
+        r"\bunauthori[sz]ed\b",
+        r"\b(phishing|scam|fraud\w*|malware|virus)\b",
+        r"\bsuspicious\b",
+        r"\b(2fa|two.factor|mfa)\b",
+        r"\b(privacy|gdpr|personal data|data (deletion|request))\b",
+        r"\b(someone|somebody) (else )?(logged|accessed|used)\b",
+    ],
+    "General": [
+        r"\b(question|inquiry|enquiry|information|info)\b",
+        r"\b(feedback|suggestion\w*|feature request|idea)\b",
+        r"\b(how (do|can) i|where can i)\b",
+        r"\b(pricing|plans|hours|contact)\b",
+        r"\b(delete|close|update) my (account|profile)\b",
+    ],
+}
+
+_COMPILED_RULES = {category: [re.compile(p) for p in patterns] for category, patterns in RULES.items()}
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def ticket_text(subject: str, description: str) -> str:
+    """Join and lowercase a ticket's subject and description, the text every model sees."""
+    return f"{subject}\n{description}".lower()
+
+
+def rule_scores(text: str) -> np.ndarray:
+    """Count the matching rule patterns per category, in `CATEGORIES` order."""
+    return np.array(
+        [sum(1 for pattern in _COMPILED_RULES[c] if pattern.search(text)) for c in CATEGORIES],
+        dtype=np.float32,
+    )
+
+
+def rule_distribution(hits: np.ndarray) -> np.ndarray:
+    """Turn rule hit counts into a probability-like distribution.
+
+    The top category gets `1 - 0.5 ** hits` scaled by its share of all hits, so one
+    keyword is a weak signal, several agreeing keywords are a strong one, and
+    competing keywords from other categories lower the confidence.
+    """
+    total = hits.sum()
+    if total == 0:
+        return np.full(len(CATEGORIES), 1.0 / len(CATEGORIES), dtype=np.float32)
+    top = int(np.argmax(hits))
+    confidence = (1 - 0.5 ** hits[top]) * hits[top] / total
+    dist = np.full(len(CATEGORIES), (1 - confidence) / (len(CATEGORIES) - 1), dtype=np.float32)
+    dist[top] = confidence
+    return dist
+
+
+class HashedLinearModel:
+    """Multinomial logistic regression over hashed word unigrams and bigrams."""
+
+    def __init__(self, dim: int = 1 << 14, categories: Sequence[str] = CATEGORIES):
+        """Start with zero weights over `dim` hashed features for `categories`."""
+        self.dim = dim
+        self.categories = list(categories)
+        self.weights = np.zeros((dim, len(self.categories)), dtype=np.float32)
+        self.bias = np.zeros(len(self.categories), dtype=np.float32)
+
+    def features(self, text: str) -> np.ndarray:
+        """Return the hashed feature indices of `text` (words and word bigrams)."""
+        words = _WORD.findall(text)
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return np.unique(np.array([zlib.crc32(g.encode("utf-8")) % self.dim for g in grams], dtype=np.int64))
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        """Return the probability of each of `categories` for `text`."""
+        logits = self.weights[self.features(text)].sum(axis=0) + self.bias
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str],
+            epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-4) -> "HashedLinearModel":
+        """Train with full-batch gradient descent on sparse hashed features."""
+        rows = [self.features(t) for t in texts]
+        row_ids = np.concatenate([np.full(len(r), i) for i, r in enumerate(rows)])
+        col_ids = np.concatenate(rows)
+        targets = np.zeros((len(texts), len(self.categories)), dtype=np.float32)
+        targets[np.arange(len(texts)), [self.categories.index(label) for label in labels]] = 1.0
+
+        for _ in range(epochs):
+            logits = np.zeros_like(targets)
+            np.add.at(logits, row_ids, self.weights[col_ids])
+            logits += self.bias
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            error = (probs - targets) / len(texts)
+            grad = np.zeros_like(self.weights)
+            np.add.at(grad, col_ids, error[row_ids])
+            self.weights -= learning_rate * (grad + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        return self
+
+    def save(self, path: str) -> None:
+        """Write the weights and categories to an `.npz` file."""
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, categories=np.array(self.categories))
+
+    @classmethod
+    def load(cls, path: str) -> "HashedLinearModel":
+        """Read a model written by `save`."""
+        data = np.load(path)
+        model = cls(dim=data["weights"].shape[0], categories=[str(c) for c in data["categories"]])
+        model.weights = data["weights"]
+        model.bias = data["bias"]
+        return model
+
+
+@dataclass(frozen=True)
+class Prediction:
+    """A category and the confidence of the prediction."""
+    category: str
+    confidence: float
+
+
+class PreClassifier:
+    """Rules plus an optional linear model; confident predictions bypass the LLM."""
+
+    def __init__(self, model: Optional[HashedLinearModel] = None,
+                 threshold: float = PRECLASSIFY_THRESHOLD, rule_weight: float = 1.0):
+        """Combine the keyword rules (scaled by `rule_weight`) with `model`, if given."""
+        self.model = model
+        self.threshold = threshold
+        self.rule_weight = rule_weight
+
+    def predict(self, subject: str, description: str) -> Prediction:
+        """Return the most likely category and its confidence, whatever the threshold."""
+        text = ticket_text(subject, description)
+        hits = rule_scores(text)
+        dist = rule_distribution(hits)
+        if self.model is not None:
+            probs = self.model.predict_proba(text)
+            dist = (probs + self.rule_weight * dist) / (1 + self.rule_weight) if hits.any() else probs
+        top = int(np.argmax(dist))
+        return Prediction(CATEGORIES[top], float(dist[top]))
+
+    def classify(self, subject: str, description: str) -> Optional[Prediction]:
+        """Return the prediction if it is confident enough to skip the LLM, else None."""
+        prediction = self.predict(subject, description)
+        return prediction if prediction.confidence >= self.threshold else None
+
+
+_preclassifier: Optional[PreClassifier] = None
+_configured = False
+
+
+def get_preclassifier() -> Optional[PreClassifier]:
+    """Return the process-wide pre-classifier, or None when disabled by the threshold."""
+    global _preclassifier, _configured
+    if not _configured:
+        model_path = os.getenv("PRECLASSIFY_MODEL")
+        model = HashedLinearModel.load(model_path) if model_path else None
+        _preclassifier = PreClassifier(model) if PRECLASSIFY_THRESHOLD <= 1 else None
+        _configured = True
+    return _preclassifier
+
+
+def set_preclassifier(preclassifier: Optional[PreClassifier]) -> None:
+    """Replace the process-wide pre-classifier (None always uses the LLM)."""
+    global _preclassifier, _configured
+    _preclassifier = preclassifier
+    _configured = True
+
+
+def load_labelled(paths: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """Load `(subject, description, category)` examples from CSV or JSONL files.
+
+    CSV files without a header are read with the escalation log columns (see
+    `agent.escalation.read_escalation_file`).
+    """
+    return [(r.get("subject", ""), r.get("description", ""), r["category"])
+            for path in paths for r in read_escalation_file(path) if r.get("category") in CATEGORIES]
+
+
+def benchmark(examples: Sequence[Tuple[str, str, str]], preclassifier: PreClassifier,
+              use_llm: bool = True) -> Dict[str, float]:
+    """Compare accuracy and latency of the local, LLM and hybrid classification paths."""
+    from agent.nodes.classify import llm_classify_ticket
+
+    local_times, local_correct, covered, covered_correct = [], 0, 0, 0
+    llm_times, llm_correct, hybrid_correct = [], 0, 0
+    for subject, description, label in examples:
+        start = time.perf_counter()
+        prediction = preclassifier.predict(subject, description)
+        local_times.append(time.perf_counter() - start)
+        local_correct += prediction.category == label
+        confident = prediction.confidence >= preclassifier.threshold
+        covered += confident
+        covered_correct += confident and prediction.category == label
+
+        if use_llm:
+            start = time.perf_counter()
+            state = {"ticket": {"subject": subject, "description": description}, "messages": []}
+            llm_category = llm_classify_ticket(state)["category"]
+            llm_times.append(time.perf_counter() - start)
+            llm_correct += llm_category == label
+            hybrid_correct += (prediction.category if confident else llm_category) == label
+
+    n = len(examples)
+    report = {
+        "examples": n,
+        "local_accuracy": local_correct / n,
+        "local_latency_us_p50": statistics.median(local_times) * 1e6,
+        "local_latency_us_mean": statistics.fmean(local_times) * 1e6,
+        "coverage": covered / n,
+        "covered_accuracy": covered_correct / covered if covered else 0.0,
+        "llm_calls_saved": covered,
+    }
+    if use_llm:
+        report.update({
+            "llm_accuracy": llm_correct / n,
+            "llm_latency_ms_p50": statistics.median(llm_times) * 1e3,
+            "llm_latency_ms_mean": statistics.fmean(llm_times) * 1e3,
+            "hybrid_accuracy": hybrid_correct / n,
+        })
+    return report
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.preclassify train|benchmark ...`."""
+    parser = argparse.ArgumentParser(description="Train or benchmark the local ticket pre-classifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="train the hashed n-gram model on labelled tickets")
+    train.add_argument("data", nargs="+", help="CSV/JSONL files with subject, description, category")
+    train.add_argument("--out", default="preclassify.npz")
+    train.add_argument("--epochs", type=int, default=200)
+    bench = commands.add_parser("benchmark", help="compare local and LLM classification")
+    bench.add_argument("data", nargs="+", help="CSV/JSONL files with subject, description, category")
+    bench.add_argument("--model", help="trained model (rules only if omitted)")
+    bench.add_argument("--threshold", type=float, default=PRECLASSIFY_THRESHOLD)
+    bench.add_argument("--no-llm", action="store_true", help="only measure the local path")
+    args = parser.parse_args(argv)
+
+    examples = load_labelled(args.data)
+    if args.command == "train":
+        model = HashedLinearModel().fit(
+            [ticket_text(s, d) for s, d, _ in examples], [c for _, _, c in examples], epochs=args.epochs
+        )
+        model.save(args.out)
+        print(json.dumps({"examples": len(examples), "model": args.out}))  # noqa: T201
+    else:
+        model = HashedLinearModel.load(args.model) if args.model else None
+        report = benchmark(examples, PreClassifier(model, threshold=args.threshold), use_llm=not args.no_llm)
+        print(json.dumps(report, indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Prompt assembly with token budgets.
+
+Prompts are laid out static-first: instructions, then category and retrieved context
+(shared by similar tickets in a category), then the ticket and feedback. Servers with
+prefix/KV caching can then reuse the shared head across tickets. `assemble_prompt`
+counts tokens with a local tokenizer, and trims the lowest-priority sections (context
+first) until the prompt fits the node's budget. Section sizes and trimmed tokens are
+exported as metrics.
+
+Configuration (environment):
+    PROMPT_TOKENIZER: Path to a Hugging Face `tokenizer.json` for exact counts (needs the
+        optional `tokenizers` package); otherwise a word-piece estimate is used.
+    PROMPT_BUDGET_<NODE>: Token budget for a node's prompt, e.g. PROMPT_BUDGET_DRAFT=1200.
+    PROMPT_MAX_FEEDBACK: Distinct reviewer feedback items kept in retry prompts (default 3).
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.prompts import PromptTemplate
+
+from agent.metrics import PROMPT_SECTION_TOKENS, PROMPT_TRIMMED_TOKENS
+
+TOKENIZER_PATH = os.getenv("PROMPT_TOKENIZER")
+MAX_FEEDBACK_ITEMS = int(os.getenv("PROMPT_MAX_FEEDBACK", "3"))
+
+DEFAULT_BUDGETS: Dict[str, int] = {
+    "classify": 300,
+    "draft": 1200,
+    "draft_candidate": 1200,
+    "retry_draft": 1400,
+    "review": 1600,
+}
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        if TOKENIZER_PATH:
+            try:
+                from tokenizers import Tokenizer
+            except ImportError:
+                Tokenizer = None
+            if Tokenizer is not None:
+                _tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in `text` with the configured tokenizer, or a word-piece estimate.
+
+    The estimate counts each punctuation mark as one token and each word as one token
+    per four characters, which tracks SentencePiece tokenizers within a few percent
+    on English support text.
+    """
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return sum(math.ceil(len(piece) / 4) for piece in _PIECE.findall(text))
+
+
+def node_budget(node: str) -> int:
+    """Return the prompt token budget for `node` (PROMPT_BUDGET_<NODE> overrides the default)."""
+    override = os.getenv(f"PROMPT_BUDGET_{node.upper()}")
+    return int(override) if override else DEFAULT_BUDGETS.get(node, 1500)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens`, keeping whole paragraphs where possible."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for paragraph in text.split("\n\n"):
+        tokens = count_tokens(paragraph)
+        if used + tokens > max_tokens:
+            if not kept:
+                # A single oversized paragraph: keep as many words as fit.
+                words = []
+                for word in paragraph.split():
+                    used += count_tokens(word)
+                    if used > max_tokens:
+                        break
+                    words.append(word)
+                kept.append(" ".join(words))
+            break
+        kept.append(paragraph)
+        used += tokens
+    return "\n\n".join(kept)
+
+
+def dedupe_feedback(feedbacks: Sequence[Optional[str]], limit: int = MAX_FEEDBACK_ITEMS) -> List[str]:
+    """Return the `limit` most recent distinct feedback items, oldest first.
+
+    Items are compared case- and whitespace-insensitively, ignoring trailing punctuation.
+    """
+    seen = set()
+    recent: List[str] = []
+    for item in reversed([f for f in feedbacks if f]):
+        key = re.sub(r"\s+", " ", item).strip().rstrip(".!").lower()
+        if key and key not in seen:
+            seen.add(key)
+            recent.append(item.strip())
+    return list(reversed(recent[:limit]))
+
+
+def format_feedback(feedbacks: Sequence[Optional[str]]) -> str:
+    """Render deduplicated feedback as the bullet list used in retry prompts."""
+    items = dedupe_feedback(feedbacks)
+    return "\n".join(f"- {item}" for item in items)
+
+
+def assemble_prompt(node: str, template: PromptTemplate, fixed: Dict[str, str],
+                    trimmable: Sequence[Tuple[str, str]] = (), budget: Optional[int] = None) -> str:
+    """Format `template`, trimming sections so the prompt fits the node's token budget.
+
+    Args:
+        node (str): Graph node the prompt is for (selects the budget and metric labels).
+        template (PromptTemplate): Prompt template.
+        fixed (Dict[str, str]): Variables that are never trimmed (ticket fields, draft).
+        trimmable (Sequence[Tuple[str, str]]): `(variable, text)` pairs in priority order;
+            later sections are trimmed first.
+        budget (Optional[int]): Token budget (defaults to `node_budget(node)`).
+
+    Returns:
+        str: The formatted prompt.
+    """
+    budget = node_budget(node) if budget is None else budget
+    empty = {name: "" for name, _ in trimmable}
+    remaining = budget - count_tokens(template.format(**fixed, **empty))
+    values = dict(fixed)
+    for name, text in trimmable:
+        tokens = count_tokens(text)
+        allowed = max(0, remaining)
+        if tokens > allowed:
+            text = truncate_tokens(text, allowed)
+            PROMPT_TRIMMED_TOKENS.inc(tokens - count_tokens(text), node=node, section=name)
+            tokens = count_tokens(text)
+        values[name] = text
+        remaining -= tokens
+        PROMPT_SECTION_TOKENS.observe(tokens, node=node, section=name)
+    prompt = template.format(**values)
+    PROMPT_SECTION_TOKENS.observe(count_tokens(prompt), node=node, section="total")
+    return prompt
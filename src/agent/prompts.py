@@ -1,14 +1,20 @@
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
+
+# Prompts are laid out static-first: fixed instructions, then category and retrieved
+# context, then the per-ticket fields. Tickets in the same category share the longest
+# possible prefix, which inference servers with prefix/KV caching can reuse.
 
 # Classification prompt
 classify_prompt = PromptTemplate.from_template("""
 Classify the ticket into one of: [Billing, Technical, Security, General]
+Respond ONLY with the category name (e.g., Billing).
+
 Subject: {subject}
 Description: {description}
-Respond ONLY with the category name (e.g., Billing).
 """)
 
-# Draft generation prompt
+# Draft generation prompt; `feedback` is empty for first drafts and holds the
+# deduplicated reviewer feedback for retries.
 draft_prompt = PromptTemplate.from_template("""
 You are a support agent. Generate a concise, professional response to the customer based on the ticket and context. Ensure the response:
 1. Starts with a polite, personal greeting (e.g., 'Hello [Customer]').
@@ -17,14 +23,21 @@ You are a support agent. Generate a concise, professional response to the custom
 4. Is concise, under 300 words, avoiding repetition or unnecessary details.
 5. Avoids placeholders like '[Customer]' and uses 'Customer' or a generic term.
 
-Ticket Subject: {subject}
-Ticket Description: {description}
 Category: {category}
 Context: {context}
 
+Ticket Subject: {subject}
+Ticket Description: {description}
+{feedback}
 Response:
 """)
 
+# Retry section appended to the draft prompt
+retry_feedback_section = """
+Feedback on previous drafts (address every point):
+{feedback}
+"""
+
 # Review prompt
 review_prompt = PromptTemplate.from_template("""
 You are a senior support agent. Review the draft response for:
@@ -36,26 +49,33 @@ Return 'Approved' if the draft is relevant, mostly complete (minor issues like s
 Return 'Escalate' only if the draft is irrelevant, significantly incomplete (e.g., missing key steps or closing), or unprofessional.
 
 If escalating, provide specific, concise feedback on what to improve (e.g., 'Add a closing', 'Include refund timeline', 'Simplify instructions').
+Answer in this format:
+Response: [Approved or Escalate]
+Feedback (if Escalate): [specific feedback]
 
-Ticket Subject: {subject}
-Ticket Description: {description}
 Category: {category}
 Context: {context}
-Draft Response: {draft}
 
-Response: [Approved or Escalate]
-Feedback (if Escalate): [specific feedback]
+Ticket Subject: {subject}
+Ticket Description: {description}
+Draft Response: {draft}
 """)
 
-# Feedback prompt
-feedback_prompt = PromptTemplate.from_template("""
-You are a senior support agent. The draft response was rejected. Provide concise, specific feedback on why the draft is not suitable (e.g., irrelevant, missing key steps, unprofessional) and suggest improvements (e.g., 'Add refund timeline', 'Include a closing').
+# Structured review prompt: verdict, scores and feedback in one JSON object
+structured_review_prompt = PromptTemplate.from_template("""
+You are a senior support agent. Review the draft response and score it from 1 (poor) to 5 (excellent) on:
+- relevance: Does it address the ticket's issue and match the category?
+- completeness: Does it include actionable steps (e.g., refund timeline, troubleshooting) and a closing?
+- professionalism: Is the tone polite and professional, with a personal greeting?
+
+Set "verdict" to "Approved" if the draft is relevant, mostly complete (minor issues like slight verbosity are acceptable), and professional.
+Set "verdict" to "Escalate" only if it is irrelevant, significantly incomplete, or unprofessional, and put specific, concise improvements in "feedback" (e.g., 'Add a closing', 'Include refund timeline').
+Respond ONLY with JSON: {{"verdict": "Approved" | "Escalate", "scores": {{"relevance": 1-5, "completeness": 1-5, "professionalism": 1-5}}, "feedback": "..."}}
 
-Ticket Subject: {subject}
-Ticket Description: {description}
 Category: {category}
 Context: {context}
-Draft Response: {draft}
 
-Feedback:
-""")
\ No newline at end of file
+Ticket Subject: {subject}
+Ticket Description: {description}
+Draft Response: {draft}
+""")
@@ -0,0 +1,226 @@
+"""Per-node model routing.
+
+Without routing every LLM call goes to the same model; only `max_tokens` and
+`temperature` differ per node. A routing table sends each node (and optionally each
+node/category pair) to its own model and endpoint with its own limits, so that short
+calls such as classification and review can use a small, fast model while drafting
+keeps a large one.
+
+A call from node `node` for a ticket in `category` uses the first route found among
+"node:category", "node" and "default"; a node without a route keeps its built-in
+parameters. A route may name another route in `escalate_to`. Classification and
+review are re-sent to it once when the routed model's output is unusable (a label
+outside the category list, a review that cannot be parsed), never because of a valid
+answer. The target keeps the endpoint, backend and timeout of the route it escalates
+from unless it sets its own. Entries that are not node names only serve as escalation
+targets:
+
+    {
+      "large": {"model": "mistralai/Mixtral-8x7B-Instruct-v0.1", "backend": "hf",
+                "base_url": "http://large-tgi:8080/v1", "timeout": 120},
+      "classify": {"model": "Qwen/Qwen2.5-1.5B-Instruct", "max_tokens": 8, "timeout": 10,
+                   "escalate_to": "large", "cost_per_1k_prompt_tokens": 0.0001},
+      "review": {"model": "qwen2.5-3b-instruct-q4", "backend": "local", "escalate_to": "large"},
+      "draft:Security": {"model": "mistralai/Mixtral-8x7B-Instruct-v0.1"}
+    }
+
+Routed calls are also recorded per route (calls, errors, latency, cost and
+escalations; see `route_stats`), so cheaper routing can be checked against quality.
+
+Configuration (environment):
+    LLM_ROUTES: The routing table, as inline JSON or the path of a JSON file (default:
+        unset, no routing).
+"""
+
+import json
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional
+
+from agent.metrics import (
+    LLM_ROUTE_CALLS,
+    LLM_ROUTE_COST,
+    LLM_ROUTE_DURATION,
+    LLM_ROUTE_ESCALATIONS,
+)
+
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+
+
+@dataclass(frozen=True)
+class Route:
+    """Model, endpoint and limits for the calls of one node (or node/category pair).
+
+    Fields left as None keep the node's own value (or the process-wide default).
+
+    Attributes:
+        name (str): Key of the route in the routing table.
+        model (Optional[str]): Model to call.
+        base_url (Optional[str]): Endpoint serving the model; None uses the default endpoint.
+        backend (Optional[str]): Backend sending the calls (`agent.backends`); None uses
+            `LLM_BACKEND`.
+        max_tokens (Optional[int]): Completion token limit.
+        temperature (Optional[float]): Sampling temperature.
+        timeout (Optional[float]): Per-request timeout in seconds.
+        escalate_to (Optional[str]): Route re-asked when this route's output is unusable.
+        cost_per_1k_prompt_tokens (Optional[float]): Price used for this route's cost metrics.
+        cost_per_1k_completion_tokens (Optional[float]): Price used for this route's cost metrics.
+    """
+
+    name: str
+    model: Optional[str] = None
+    base_url: Optional[str] = None
+    backend: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None
+    escalate_to: Optional[str] = None
+    cost_per_1k_prompt_tokens: Optional[float] = None
+    cost_per_1k_completion_tokens: Optional[float] = None
+
+    def apply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the `call_llm` keyword arguments `request` with this route's settings applied."""
+        routed = dict(request, route=self)
+        for key in ("model", "max_tokens", "temperature"):
+            value = getattr(self, key)
+            if value is not None:
+                routed[key] = value
+        return routed
+
+
+_ROUTE_FIELDS = {f.name for f in fields(Route)} - {"name"}
+# Settings an escalation target inherits from the route it escalates from when it leaves them
+# unset (model, max_tokens and temperature are already carried in the request).
+_INHERITED_FIELDS = ("base_url", "backend", "timeout")
+
+
+def parse_routes(config: Dict[str, Any]) -> Dict[str, Route]:
+    """Build routes from a routing table (see the module docstring).
+
+    Raises:
+        ValueError: An entry has unknown keys, an unknown backend or escalates to a route
+            that does not exist.
+    """
+    from agent.backends import BACKENDS
+
+    routes = {}
+    for name, entry in config.items():
+        unknown = set(entry) - _ROUTE_FIELDS
+        if unknown:
+            raise ValueError(f"Route {name!r} has unknown settings: {', '.join(sorted(unknown))}")
+        if entry.get("backend") is not None and entry["backend"] not in BACKENDS:
+            raise ValueError(f"Route {name!r} uses unknown backend {entry['backend']!r}")
+        routes[name] = Route(name=name, **entry)
+    for route in routes.values():
+        if route.escalate_to is not None and route.escalate_to not in routes:
+            raise ValueError(f"Route {route.name!r} escalates to unknown route {route.escalate_to!r}")
+    return routes
+
+
+class Router:
+    """Looks up the route of each LLM call."""
+
+    def __init__(self, routes: Dict[str, Route]):
+        """Wrap a table parsed by `parse_routes`."""
+        self.routes = routes
+
+    def route_for(self, node: str, category: Optional[str] = None) -> Optional[Route]:
+        """Return the route for `node` (and `category`), or None to keep the node's defaults."""
+        keys = ([f"{node}:{category}"] if category else []) + [node, "default"]
+        return next((self.routes[key] for key in keys if key in self.routes), None)
+
+    def escalation_for(self, route: Route) -> Optional[Route]:
+        """Return the route to re-ask when `route` gives an unusable answer, if any."""
+        return self.routes.get(route.escalate_to) if route.escalate_to else None
+
+
+def load_router(spec: str) -> Optional[Router]:
+    """Build a router from LLM_ROUTES (inline JSON or a file path); None when `spec` is empty."""
+    spec = spec.strip()
+    if not spec:
+        return None
+    if spec.startswith("{"):
+        config = json.loads(spec)
+    else:
+        with open(spec, encoding="utf-8") as f:
+            config = json.load(f)
+    return Router(parse_routes(config))
+
+
+_router: Optional[Router] = None
+_router_configured = False
+
+
+def get_router() -> Optional[Router]:
+    """Return the process-wide router, or None when no routing table is configured."""
+    global _router, _router_configured
+    if not _router_configured:
+        _router = load_router(LLM_ROUTES)
+        _router_configured = True
+    return _router
+
+
+def set_router(router: Optional[Router]) -> None:
+    """Replace the process-wide router (None disables routing)."""
+    global _router, _router_configured
+    _router = router
+    _router_configured = True
+
+
+def routed_request(request: Dict[str, Any], node: str, category: Optional[str] = None) -> Dict[str, Any]:
+    """Apply the route of `node`/`category` to the `call_llm` keyword arguments `request`."""
+    router = get_router()
+    route = router.route_for(node, category) if router is not None else None
+    return route.apply(request) if route is not None else request
+
+
+def escalated_request(request: Dict[str, Any], reason: str) -> Optional[Dict[str, Any]]:
+    """Return `request` re-routed to its route's escalation target, or None if it has none.
+
+    The model, endpoint, backend and limits the target does not set are kept from the
+    original route; the target's prices are its own.
+
+    Args:
+        request (Dict[str, Any]): Keyword arguments built by `routed_request`.
+        reason (str): Why the routed answer was unusable (a metric label).
+    """
+    route = request.get("route")
+    router = get_router()
+    if route is None or router is None:
+        return None
+    target = router.escalation_for(route)
+    if target is None:
+        return None
+    LLM_ROUTE_ESCALATIONS.inc(route=route.name, target=target.name, reason=reason)
+    inherited = {key: getattr(route, key) for key in _INHERITED_FIELDS if getattr(target, key) is None}
+    return replace(target, **inherited).apply(request)
+
+
+def route_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-route call counts, errors, mean latency (ms), cost (USD) and escalations."""
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    def entry(route: str) -> Dict[str, Any]:
+        return stats.setdefault(route, {"models": [], "calls": 0, "errors": 0, "mean_latency_ms": 0.0,
+                                        "cost_usd": 0.0, "escalations": 0})
+
+    for labels, count in LLM_ROUTE_CALLS.series().items():
+        values = dict(labels)
+        route = entry(values["route"])
+        route["calls"] += int(count)
+        if values["status"] == "error":
+            route["errors"] += int(count)
+        if values["model"] not in route["models"]:
+            route["models"].append(values["model"])
+    seconds: Dict[str, list] = {}
+    for labels, (total, count) in LLM_ROUTE_DURATION.series().items():
+        totals = seconds.setdefault(dict(labels)["route"], [0.0, 0])
+        totals[0] += total
+        totals[1] += count
+    for name, (total, count) in seconds.items():
+        entry(name)["mean_latency_ms"] = round(total / count * 1000, 2) if count else 0.0
+    for labels, cost in LLM_ROUTE_COST.series().items():
+        entry(dict(labels)["route"])["cost_usd"] += round(cost, 6)
+    for labels, count in LLM_ROUTE_ESCALATIONS.series().items():
+        entry(dict(labels)["route"])["escalations"] += int(count)
+    return stats
@@ -0,0 +1,348 @@
+"""HTTP API for ticket resolution.
+
+An ASGI (FastAPI) service in front of the compiled graph. Tickets are admitted into a
+bounded in-process queue and processed by a fixed pool of async workers; when the queue
+is full, new tickets get `429 Too Many Requests` instead of piling up. Every job has a
+deadline; a job that runs past it is cancelled, which also cancels its in-flight LLM
+requests.
+
+Endpoints:
+    POST /tickets              Submit a ticket. `mode: "sync"` (default) waits for the
+                               result; `mode: "async"` returns 202 and, if `callback_url`
+                               is set, POSTs the result there when done.
+    POST /tickets/bulk         Submit up to SERVER_BULK_LIMIT tickets asynchronously.
+    GET  /tickets/{id}         Job status and result.
+    GET  /healthz              Queue depth and worker utilisation.
+    GET  /metrics              Prometheus metrics.
+
+Configuration (environment):
+    SERVER_WORKERS: Tickets processed concurrently (default 16).
+    SERVER_QUEUE_SIZE: Tickets waiting beyond the workers before 429s (default 256).
+    SERVER_DEADLINE_SEC: Default per-ticket deadline, queueing included (default 60).
+    SERVER_JOB_HISTORY: Finished jobs kept for GET /tickets/{id} (default 10000).
+    SERVER_BULK_LIMIT: Maximum tickets per bulk request (default 1000).
+
+Usage:
+    python -m agent.server --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from agent.batch import result_record
+from agent.cache import get_response_cache
+from agent.checkpoint import aclose_checkpointer
+from agent.coalesce import arun_coalesced, get_coalescer
+from agent.graph import ainvoke_ticket, warm_up
+from agent.metrics import render_prometheus, ticket_trace
+from agent.state import new_ticket_state, validate_ticket
+from agent.utils import aclose_async_client
+
+logger = logging.getLogger(__name__)
+
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "16"))
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "256"))
+SERVER_DEADLINE_SEC = float(os.getenv("SERVER_DEADLINE_SEC", "60"))
+SERVER_JOB_HISTORY = int(os.getenv("SERVER_JOB_HISTORY", "10000"))
+SERVER_BULK_LIMIT = int(os.getenv("SERVER_BULK_LIMIT", "1000"))
+
+
+class TicketRequest(BaseModel):
+    """Body of `POST /tickets` and of each item in `POST /tickets/bulk`."""
+
+    id: Optional[str] = Field(None, description="Caller's ticket ID; generated if omitted")
+    subject: str
+    description: str
+    mode: Literal["sync", "async"] = "sync"
+    callback_url: Optional[str] = None
+    deadline_sec: Optional[float] = Field(None, gt=0, description="Overrides SERVER_DEADLINE_SEC")
+
+
+class BulkRequest(BaseModel):
+    """Body of `POST /tickets/bulk`: tickets plus a default callback URL for all of them."""
+    tickets: List[TicketRequest]
+    callback_url: Optional[str] = None
+
+
+class QueueFull(Exception):
+    """Raised when a ticket cannot be admitted because the job queue is full."""
+
+
+@dataclass
+class Job:
+    """A submitted ticket and its progress, kept for status lookups."""
+    id: str
+    subject: str
+    description: str
+    deadline: float
+    callback_url: Optional[str] = None
+    status: str = "queued"  # queued | running | done | failed | timeout
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def view(self) -> Dict[str, Any]:
+        """Public representation returned by the API."""
+        view = {"id": self.id, "status": self.status, "created": self.created, "finished": self.finished}
+        if self.result is not None:
+            view["result"] = self.result
+        if self.error is not None:
+            view["error"] = self.error
+        return view
+
+
+class TicketService:
+    """Bounded job queue plus a pool of workers running tickets through the graph.
+
+    Args:
+        workers (int): Number of tickets processed concurrently.
+        queue_size (int): Tickets allowed to wait for a worker.
+        deadline_sec (float): Default deadline per ticket, measured from admission.
+        history (int): Finished jobs kept for status lookups.
+    """
+
+    def __init__(self, workers: int = SERVER_WORKERS, queue_size: int = SERVER_QUEUE_SIZE,
+                 deadline_sec: float = SERVER_DEADLINE_SEC, history: int = SERVER_JOB_HISTORY):
+        """Configure the service; `start()` creates the queue and the workers."""
+        self.workers = workers
+        self.queue_size = queue_size
+        self.deadline_sec = deadline_sec
+        self.history = history
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.running = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: set = set()
+
+    async def start(self) -> None:
+        """Warm up the graph, then create the queue and start the workers."""
+        await asyncio.to_thread(warm_up)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"ticket-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers and close the async LLM client and checkpointer."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await aclose_async_client()
+        await aclose_checkpointer()
+
+    def submit(self, request: TicketRequest, callback_url: Optional[str] = None) -> Job:
+        """Validate and enqueue a ticket without waiting.
+
+        Raises:
+            ValueError: The ticket is invalid or its ID is already in progress.
+            QueueFull: The queue is full; the caller should retry later.
+        """
+        error = validate_ticket(request.subject, request.description)
+        if error:
+            raise ValueError(error)
+        job_id = request.id or uuid.uuid4().hex
+        existing = self.jobs.get(job_id)
+        if existing is not None and existing.status in ("queued", "running"):
+            raise ValueError(f"Ticket {job_id} is already in progress.")
+        job = Job(
+            id=job_id,
+            subject=request.subject,
+            description=request.description,
+            deadline=time.monotonic() + (request.deadline_sec or self.deadline_sec),
+            callback_url=request.callback_url or callback_url,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull("Ticket queue is full.") from None
+        self.jobs[job_id] = job
+        self.jobs.move_to_end(job_id)
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with `job_id`, or None if it is unknown or evicted."""
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker, queue and rejection counts (and coalescing and cache stats when enabled)."""
+        stats = {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+        if get_coalescer() is not None:
+            stats["coalescing"] = get_coalescer().stats()
+        if get_response_cache() is not None:
+            stats["response_cache"] = get_response_cache().stats()
+        return stats
+
+    def _evict(self) -> None:
+        """Drop the oldest finished jobs beyond the history limit."""
+        excess = len(self.jobs) - self.history
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].done.is_set():
+                del self.jobs[job_id]
+                excess -= 1
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+            if job.callback_url:
+                task = asyncio.create_task(_post_callback(job))
+                self._callbacks.add(task)
+                task.add_done_callback(self._callbacks.discard)
+
+    async def _run(self, job: Job) -> None:
+        remaining = job.deadline - time.monotonic()
+        if remaining <= 0:
+            self._finish(job, "timeout", error="Deadline exceeded while queued.")
+            return
+        job.status = "running"
+        try:
+            with ticket_trace(job.id):
+                def run():
+                    return ainvoke_ticket(new_ticket_state(job.subject, job.description), job.id)
+
+                result = await asyncio.wait_for(arun_coalesced(job.subject, job.description, run), timeout=remaining)
+        except asyncio.TimeoutError:
+            # wait_for cancelled the graph run, including any in-flight LLM requests.
+            self._finish(job, "timeout", error="Deadline exceeded.")
+        except Exception as e:
+            logger.exception("Ticket %s failed", job.id)
+            self._finish(job, "failed", error=f"Error processing ticket: {str(e)}")
+        else:
+            self._finish(job, "done", result=result_record(job.id, result))
+
+    @staticmethod
+    def _finish(job: Job, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        job.done.set()
+
+
+async def _post_callback(job: Job, attempts: int = 3) -> None:
+    """POST the job view to its callback URL, retrying with backoff."""
+    import aiohttp
+
+    for attempt in range(attempts):
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+                async with session.post(job.callback_url, json=job.view()) as response:
+                    if response.status < 500:
+                        return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(2 ** attempt)
+    logger.warning("Callback for ticket %s to %s failed", job.id, job.callback_url)
+
+
+def _too_many_requests() -> JSONResponse:
+    return JSONResponse({"detail": "Ticket queue is full, retry later."}, status_code=429,
+                        headers={"Retry-After": "1"})
+
+
+def create_app(service: Optional[TicketService] = None) -> FastAPI:
+    """Build the API around `service` (a default `TicketService` if omitted)."""
+    service = service or TicketService()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+
+    app = FastAPI(title="Support Ticket Resolution Agent", lifespan=lifespan)
+    app.state.service = service
+
+    @app.post("/tickets")
+    async def create_ticket(request: TicketRequest):
+        try:
+            job = service.submit(request)
+        except QueueFull:
+            return _too_many_requests()
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if request.mode == "async":
+            return JSONResponse(job.view(), status_code=202, headers={"Location": f"/tickets/{job.id}"})
+        await job.done.wait()
+        return JSONResponse(job.view(), status_code=504 if job.status == "timeout" else 200)
+
+    @app.post("/tickets/bulk")
+    async def create_tickets(request: BulkRequest):
+        if len(request.tickets) > SERVER_BULK_LIMIT:
+            raise HTTPException(status_code=413, detail=f"At most {SERVER_BULK_LIMIT} tickets per request.")
+        results = []
+        for index, ticket in enumerate(request.tickets):
+            try:
+                job = service.submit(ticket, callback_url=request.callback_url)
+                results.append({"index": index, "id": job.id, "status": job.status})
+            except QueueFull:
+                results.append({"index": index, "id": ticket.id, "status": "rejected", "error": "queue full"})
+            except ValueError as e:
+                results.append({"index": index, "id": ticket.id, "status": "invalid", "error": str(e)})
+        accepted = sum(1 for r in results if r["status"] == "queued")
+        if request.tickets and accepted == 0 and any(r["status"] == "rejected" for r in results):
+            return _too_many_requests()
+        return JSONResponse({"accepted": accepted, "tickets": results}, status_code=202)
+
+    @app.get("/tickets/{job_id}")
+    async def get_ticket(job_id: str):
+        job = service.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown ticket.")
+        return job.view()
+
+    @app.get("/healthz")
+    async def healthz():
+        return service.stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return render_prometheus()
+
+    return app
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Command-line entry point: `python -m agent.server --port 8000`."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the support agent over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,78 @@
-from typing import Dict, Any, Annotated
+import operator
+import os
+from typing import Dict, Any, Annotated, Optional
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
+from langchain_core.messages import AnyMessage, HumanMessage
+
+# Upper bound on the message log per ticket (0 disables). Older messages are folded into a
+# single "omitted" marker; the first message (the received ticket) is always kept.
+MAX_MESSAGES = int(os.getenv("STATE_MAX_MESSAGES", "20"))
+
+_OMITTED_ID = "omitted-messages"
+
+# Review rounds a ticket gets before it is escalated; a rejection before the last one is retried.
+MAX_REVIEWS = 3
+
+
+def bounded_messages(left: list, right: Any) -> list[AnyMessage]:
+    """`add_messages` reducer that caps the log at `MAX_MESSAGES` entries."""
+    merged = add_messages(left, right)
+    if not MAX_MESSAGES or len(merged) <= MAX_MESSAGES:
+        return merged
+    keep = max(MAX_MESSAGES, 3) - 2
+    head, dropped, tail = merged[0], merged[1:-keep], merged[-keep:]
+    omitted = sum(m.additional_kwargs.get("omitted", 1) for m in dropped)
+    marker = HumanMessage(content=f"[{omitted} earlier messages omitted]", id=_OMITTED_ID,
+                          additional_kwargs={"omitted": omitted})
+    return [head, marker] + tail
+
 
 class State(TypedDict):
-    messages: Annotated[list, add_messages] # Tracks interactions
+    messages: Annotated[list, bounded_messages]  # Tracks interactions (append-only, capped)
     ticket: Dict[str, str]                  # Ticket details (subject, description)
     category: str                           # Classified category
     attempt: int                            # Retry attempts
     context: str                            # Retrieved context
-    draft: str                              # Draft response
+    drafts: Annotated[list, operator.add]   # Every draft, in order; the last one is current
     approved: bool                          # Draft approval status
-    feedbacks: list                         # Reviewer feedback
-    drafts: list                            # List of drafts
-    feedbacks: list                         # List of feedback
-    output: str                             # Final response or escalation
\ No newline at end of file
+    cached: bool                            # Output served from the response cache
+    feedbacks: Annotated[list, operator.add]  # Reviewer feedback, one per rejected draft
+    review_scores: Dict[str, int]           # Latest reviewer scores (relevance, completeness, professionalism)
+    candidates: Annotated[list, operator.add]  # Reviewed speculative draft candidates
+    output: str                             # Final response or escalation
+    llm_error: str                          # LLM failure that escalated the ticket, if any
+    early_escalation: str                   # Why the retry loop was cut short, if it was
+
+MAX_SUBJECT_LENGTH = 100
+MAX_DESCRIPTION_LENGTH = 500
+
+
+def current_draft(state: State) -> str:
+    """Return the latest draft, or an empty string before the first one."""
+    drafts = state.get("drafts") or []
+    return drafts[-1] if drafts else ""
+
+
+def validate_ticket(subject: str, description: str) -> Optional[str]:
+    """Return a user-facing error message if the ticket is invalid, else None."""
+    if not isinstance(subject, str) or not isinstance(description, str):
+        return "Subject and description must be text."
+    if not subject or not description:
+        return "Please provide both subject and description."
+    if len(subject) > MAX_SUBJECT_LENGTH:
+        return f"Subject must be {MAX_SUBJECT_LENGTH} characters or less."
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        return f"Description must be {MAX_DESCRIPTION_LENGTH} characters or less."
+    return None
+
+
+def new_ticket_state(subject: str, description: str) -> State:
+    """Build the initial graph input for a ticket."""
+    return {
+        "ticket": {"subject": subject, "description": description},
+        "messages": [HumanMessage(content=f"Received ticket: {subject}")],
+        "attempt": 0,
+        "drafts": [],
+        "feedbacks": []
+    }
@@ -1,39 +1,469 @@
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from agent.backends import Backend, LLMRequest, get_backend
+from agent.metrics import LLMCall
+from agent.llm_policy import Endpoint, LLMError, LLMRequestError, arun_with_policy, run_with_policy, to_llm_error
+
+if TYPE_CHECKING:
+    from agent.hf_client import InferenceClient, PooledAsyncInferenceClient
+    from agent.microbatch import BatchKey, MicroBatcher
+    from agent.routing import Route
 
 load_dotenv()
 
-client = InferenceClient(api_key=os.getenv("HUGGINGFACE_API_TOKEN"))
+LLM_BASE_URL = os.getenv("HUGGINGFACE_BASE_URL") or None
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Clients are built on first use (see `agent.hf_client`), so importing this module does
+# not pay for `huggingface_hub`.
+_client: Optional["InferenceClient"] = None
+_async_client: Optional["PooledAsyncInferenceClient"] = None
+
+
+def get_client() -> "InferenceClient":
+    """Return the shared sync client, creating it on first use."""
+    global _client
+    if _client is None:
+        from agent.hf_client import InferenceClient
+
+        _client = InferenceClient(api_key=os.getenv("HUGGINGFACE_API_TOKEN"), base_url=LLM_BASE_URL,
+                                  timeout=LLM_TIMEOUT)
+    return _client
+
+
+def get_async_client() -> "PooledAsyncInferenceClient":
+    """Return the shared async client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        from agent.hf_client import PooledAsyncInferenceClient
+
+        _async_client = PooledAsyncInferenceClient(
+            api_key=os.getenv("HUGGINGFACE_API_TOKEN"),
+            base_url=LLM_BASE_URL,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            timeout=LLM_TIMEOUT,
+        )
+    return _async_client
+
+
+# Clients for other endpoints (LLM_FALLBACK_MODELS entries and routes with their own base
+# URL) and for routes with their own timeout, keyed by (base URL, timeout).
+_endpoint_clients: Dict[tuple, "InferenceClient"] = {}
+_async_endpoint_clients: Dict[tuple, "PooledAsyncInferenceClient"] = {}
+
+
+def _client_for(endpoint: Endpoint, timeout: Optional[float] = None) -> "InferenceClient":
+    if endpoint.base_url is None and timeout is None:
+        return get_client()
+    key = (endpoint.base_url or LLM_BASE_URL, timeout or LLM_TIMEOUT)
+    if key not in _endpoint_clients:
+        from agent.hf_client import InferenceClient
+
+        _endpoint_clients[key] = InferenceClient(
+            api_key=os.getenv("HUGGINGFACE_API_TOKEN"), base_url=key[0], timeout=key[1]
+        )
+    return _endpoint_clients[key]
+
+
+def _async_client_for(endpoint: Endpoint, timeout: Optional[float] = None) -> "PooledAsyncInferenceClient":
+    if endpoint.base_url is None and timeout is None:
+        return get_async_client()
+    key = (endpoint.base_url or LLM_BASE_URL, timeout or LLM_TIMEOUT)
+    if key not in _async_endpoint_clients:
+        from agent.hf_client import PooledAsyncInferenceClient
+
+        _async_endpoint_clients[key] = PooledAsyncInferenceClient(
+            api_key=os.getenv("HUGGINGFACE_API_TOKEN"), base_url=key[0],
+            max_concurrency=LLM_MAX_CONCURRENCY, timeout=key[1],
+        )
+    return _async_endpoint_clients[key]
+
+
+async def aclose_async_client() -> None:
+    """Close the shared async clients' pools and drop them so the next call rebuilds them."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    for endpoint_client in _async_endpoint_clients.values():
+        await endpoint_client.close()
+
+
+def _send_batch(key: "BatchKey", prompts: List[str]) -> List[tuple]:
+    """Send one micro-batch under the resilience policy (retries, breakers, fallbacks).
+
+    Each prompt is rendered with the chat template of the model it is sent to, so a
+    fallback model gets its own format. Returns (text, usage) per prompt.
+    """
+    from agent.hf_client import chat_template, complete_batch
+
+    def send(endpoint: Endpoint) -> List[tuple]:
+        try:
+            render = chat_template(endpoint.model)
+            if render is None:
+                raise LLMRequestError(f"No chat template for {endpoint.model}; cannot batch its requests",
+                                      endpoint.model)
+            return complete_batch(endpoint.base_url or LLM_BASE_URL, endpoint.model,
+                                  [render(prompt) for prompt in prompts], key.max_tokens, key.temperature,
+                                  api_key=os.getenv("HUGGINGFACE_API_TOKEN"), timeout=key.timeout or LLM_TIMEOUT)
+        except LLMError:
+            raise
+        except Exception as e:
+            raise to_llm_error(e, endpoint.model) from e
+
+    return run_with_policy(key.model, send, hedge=False, base_url=key.base_url)
+
+
+_microbatcher: Optional["MicroBatcher"] = None
+_microbatch_configured = False
+
+
+def get_microbatcher() -> Optional["MicroBatcher"]:
+    """Return the process-wide micro-batcher, or None when micro-batching is disabled.
+
+    It is enabled by `LLM_MICROBATCH_WINDOW_MS` and needs a self-hosted endpoint
+    (`HUGGINGFACE_BASE_URL`); see `agent.microbatch`.
+    """
+    global _microbatcher, _microbatch_configured
+    if not _microbatch_configured:
+        from agent.microbatch import LLM_MICROBATCH_WINDOW_MS, MicroBatcher
+
+        _microbatcher = MicroBatcher(_send_batch) if LLM_MICROBATCH_WINDOW_MS > 0 and LLM_BASE_URL else None
+        _microbatch_configured = True
+    return _microbatcher
+
+
+def set_microbatcher(batcher: Optional["MicroBatcher"]) -> None:
+    """Replace the process-wide micro-batcher (None sends every request on its own)."""
+    global _microbatcher, _microbatch_configured
+    _microbatcher = batcher
+    _microbatch_configured = True
+
+
+def _batcher_for(backend: "Backend", model: str, response_format: Optional[dict]) -> Optional["MicroBatcher"]:
+    """Return the micro-batcher a request should go through, or None to send it alone.
+
+    Only backends that can batch are eligible, and only requests without a
+    `response_format` (`/v1/completions` does not take one) for a model whose chat
+    template is known (see `agent.hf_client.chat_template`).
+    """
+    batcher = get_microbatcher() if backend.batchable and response_format is None else None
+    if batcher is None:
+        return None
+    from agent.hf_client import chat_template
+
+    return batcher if chat_template(model) is not None else None
+
+
+async def _abatcher_for(backend: "Backend", model: str,
+                        response_format: Optional[dict]) -> Optional["MicroBatcher"]:
+    """Async `_batcher_for`: a template not loaded yet is loaded in a worker thread."""
+    batcher = get_microbatcher() if backend.batchable and response_format is None else None
+    if batcher is None:
+        return None
+    from agent.hf_client import chat_template
+
+    render = chat_template(model, load=False) or await asyncio.to_thread(chat_template, model)
+    return batcher if render is not None else None
+
+
+def _batch_key(model: str, max_tokens: int, temperature: float, route: Optional["Route"] = None) -> "BatchKey":
+    from agent.microbatch import BatchKey
+
+    return BatchKey(model, max_tokens, temperature, route.base_url if route else None,
+                    route.timeout if route else None)
+
+
+class _Call:
+    """`LLMCall` shared by the attempts of one logical request.
+
+    The measurement (and its trace span) is opened in the caller's context, since hedged
+    attempts run in their own threads or tasks. Its clock starts when the first attempt
+    gets a connection slot, so time queued behind `LLM_MAX_CONCURRENCY` is not counted.
+    """
+
+    def __init__(self, model: str, message: str, route: Optional["Route"] = None):
+        if route is None:
+            self.measurement = LLMCall(model, message)
+        else:
+            self.measurement = LLMCall(model, message, route.name,
+                                       (route.cost_per_1k_prompt_tokens, route.cost_per_1k_completion_tokens))
+        self._started = False
+
+    def start(self) -> None:
+        if not self._started:
+            self._started = True
+            self.measurement.start = time.perf_counter()
+
+    def retry(self, endpoint: Endpoint, error: LLMError) -> None:
+        self.measurement.retry()
+
 
 def call_llm(message: str, mock_response: Optional[str] = None,
             model: str = "mistralai/Mistral-7B-Instruct-v0.2",
             max_tokens: int = 200,
-            temperature: float = 0.3) -> str:
+            temperature: float = 0.3,
+            response_format: Optional[dict] = None,
+            route: Optional["Route"] = None) -> str:
     """Call the LLM with the given message, returning the response.
-    
+
+    The request runs under the resilience policy in `agent.llm_policy`: retries with
+    backoff, hedging, per-model circuit breakers and the fallback model chain. With
+    micro-batching enabled (`agent.microbatch`) it is sent together with concurrent
+    requests that use the same parameters. Each attempt is sent by the route's backend
+    or `LLM_BACKEND` (`agent.backends`).
+
     Args:
         message (str): The input message to send to the LLM.
         mock_response (Optional[str]): Mock response for testing purposes.
         model (str): The model to use for the LLM call.
         max_tokens (int): Maximum number of tokens in the response.
         temperature (float): Sampling temperature for the LLM response.
-        
+        response_format (Optional[dict]): Constrained-output spec, e.g.
+            `{"type": "json", "value": <JSON schema>}`.
+        route (Optional[Route]): Route the request was built for (`agent.routing`); sets
+            the endpoint, timeout and backend, and the call is also recorded under the route.
+
     Returns:
         str: The response from the LLM or mock response.
-    
+
+    Raises:
+        LLMError: The request failed on every model/endpoint it was allowed to try.
     """
     if mock_response is not None:
         return mock_response
-    
+
+    call = _Call(model, message, route)
+    base_url, timeout = (route.base_url, route.timeout) if route else (None, None)
+    backend = get_backend(route.backend if route else None)
+    batcher = _batcher_for(backend, model, response_format)
+    if batcher is not None:
+        call.start()
+        try:
+            text, usage = batcher.submit(_batch_key(model, max_tokens, temperature, route), message).result()
+        except LLMError as e:
+            call.measurement.fail(e)
+            raise
+        call.measurement.finish(text, usage)
+        return text
+
+    def send(endpoint: Endpoint) -> tuple:
+        try:
+            return backend.complete(LLMRequest(endpoint, message, max_tokens, temperature, response_format, timeout))
+        except Exception as e:
+            raise to_llm_error(e, endpoint.model) from e
+
+    call.start()
     try:
-        result = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": message}],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        return result.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error calling LLM: {str(e)}"
\ No newline at end of file
+        text, usage = run_with_policy(model, send, on_retry=call.retry, base_url=base_url,
+                                      prepare=lambda endpoint: backend.prepare(endpoint, timeout))
+    except LLMError as e:
+        call.measurement.fail(e)
+        raise
+    call.measurement.finish(text, usage)
+    return text
+
+
+async def acall_llm(message: str, mock_response: Optional[str] = None,
+                    model: str = "mistralai/Mistral-7B-Instruct-v0.2",
+                    max_tokens: int = 200,
+                    temperature: float = 0.3,
+                    response_format: Optional[dict] = None,
+                    route: Optional["Route"] = None) -> str:
+    """Async counterpart of `call_llm`.
+
+    On the hf backend at most `LLM_MAX_CONCURRENCY` requests are in flight per event
+    loop; extra callers wait for a slot instead of opening new connections.
+
+    Args:
+        message (str): The input message to send to the LLM.
+        mock_response (Optional[str]): Mock response for testing purposes.
+        model (str): The model to use for the LLM call.
+        max_tokens (int): Maximum number of tokens in the response.
+        temperature (float): Sampling temperature for the LLM response.
+        response_format (Optional[dict]): Constrained-output spec, as for `call_llm`.
+        route (Optional[Route]): Route the request was built for, as for `call_llm`.
+
+    Returns:
+        str: The response from the LLM or mock response.
+
+    Raises:
+        LLMError: The request failed on every model/endpoint it was allowed to try.
+    """
+    if mock_response is not None:
+        return mock_response
+
+    call = _Call(model, message, route)
+    base_url, timeout = (route.base_url, route.timeout) if route else (None, None)
+    backend = get_backend(route.backend if route else None)
+    batcher = await _abatcher_for(backend, model, response_format)
+    if batcher is not None:
+        call.start()
+        try:
+            future = batcher.submit(_batch_key(model, max_tokens, temperature, route), message)
+            text, usage = await asyncio.wrap_future(future)
+        except (LLMError, asyncio.CancelledError) as e:
+            call.measurement.fail(e)
+            raise
+        call.measurement.finish(text, usage)
+        return text
+
+    async def send(endpoint: Endpoint) -> tuple:
+        try:
+            return await backend.acomplete(LLMRequest(endpoint, message, max_tokens, temperature, response_format,
+                                                      timeout, call.start))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise to_llm_error(e, endpoint.model) from e
+
+    try:
+        text, usage = await arun_with_policy(model, send, on_retry=call.retry, base_url=base_url,
+                                             prepare=lambda endpoint: backend.prepare(endpoint, timeout, True))
+    except (LLMError, asyncio.CancelledError) as e:
+        # CancelledError: deadline or client disconnect; close the measurement and propagate.
+        call.measurement.fail(e)
+        raise
+    call.measurement.finish(text, usage)
+    return text
+
+
+def _token_writer() -> Callable[[dict], None]:
+    """Return the graph's custom stream writer, or a no-op outside a graph run."""
+    from langgraph.config import get_stream_writer
+
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+
+def stream_llm(message: str, mock_response: Optional[str] = None,
+               model: str = "mistralai/Mistral-7B-Instruct-v0.2",
+               max_tokens: int = 200,
+               temperature: float = 0.3,
+               node: str = "llm",
+               route: Optional["Route"] = None) -> str:
+    """Call the LLM with token streaming and return the full response.
+
+    Each token is forwarded to LangGraph's custom stream as `{"node", "token"}`; the
+    first event also carries `ttft_ms`, the time to first token. Consumers see the
+    tokens with `graph.stream(..., stream_mode="custom")`. Streaming requests are
+    retried and fall back like `call_llm` but are never hedged; when an attempt fails
+    after emitting tokens, a `{"node", "reset": True}` event tells consumers to discard
+    them.
+
+    Args:
+        message (str): The input message to send to the LLM.
+        mock_response (Optional[str]): Mock response for testing purposes.
+        model (str): The model to use for the LLM call.
+        max_tokens (int): Maximum number of tokens in the response.
+        temperature (float): Sampling temperature for the LLM response.
+        node (str): Name of the graph node the tokens belong to.
+        route (Optional[Route]): Route the request was built for, as for `call_llm`.
+
+    Returns:
+        str: The response from the LLM or mock response.
+
+    Raises:
+        LLMError: The request failed on every model/endpoint it was allowed to try.
+    """
+    write = _token_writer()
+    if mock_response is not None:
+        write({"node": node, "token": mock_response, "ttft_ms": 0.0})
+        return mock_response
+
+    call = _Call(model, message, route)
+    base_url, timeout = (route.base_url, route.timeout) if route else (None, None)
+
+    backend = get_backend(route.backend if route else None)
+
+    def send(endpoint: Endpoint) -> str:
+        parts = []
+        try:
+            for token in backend.stream(LLMRequest(endpoint, message, max_tokens, temperature, timeout=timeout)):
+                event = {"node": node, "token": token}
+                if not parts and call.measurement.retries == 0:
+                    event["ttft_ms"] = call.measurement.first_token() * 1000
+                parts.append(token)
+                write(event)
+        except Exception as e:
+            if parts:
+                write({"node": node, "reset": True})
+            raise to_llm_error(e, endpoint.model) from e
+        return "".join(parts).strip()
+
+    call.start()
+    try:
+        text = run_with_policy(model, send, hedge=False, on_retry=call.retry, base_url=base_url,
+                               prepare=lambda endpoint: backend.prepare(endpoint, timeout))
+    except LLMError as e:
+        call.measurement.fail(e)
+        raise
+    call.measurement.finish(text)
+    return text
+
+
+async def astream_llm(message: str, mock_response: Optional[str] = None,
+                      model: str = "mistralai/Mistral-7B-Instruct-v0.2",
+                      max_tokens: int = 200,
+                      temperature: float = 0.3,
+                      node: str = "llm",
+                      route: Optional["Route"] = None) -> str:
+    """Async counterpart of `stream_llm`.
+
+    Args:
+        message (str): The input message to send to the LLM.
+        mock_response (Optional[str]): Mock response for testing purposes.
+        model (str): The model to use for the LLM call.
+        max_tokens (int): Maximum number of tokens in the response.
+        temperature (float): Sampling temperature for the LLM response.
+        node (str): Name of the graph node the tokens belong to.
+        route (Optional[Route]): Route the request was built for, as for `call_llm`.
+
+    Returns:
+        str: The response from the LLM or mock response.
+
+    Raises:
+        LLMError: The request failed on every model/endpoint it was allowed to try.
+    """
+    write = _token_writer()
+    if mock_response is not None:
+        write({"node": node, "token": mock_response, "ttft_ms": 0.0})
+        return mock_response
+
+    call = _Call(model, message, route)
+    base_url, timeout = (route.base_url, route.timeout) if route else (None, None)
+
+    backend = get_backend(route.backend if route else None)
+
+    async def send(endpoint: Endpoint) -> str:
+        parts = []
+        try:
+            async for token in backend.astream(LLMRequest(endpoint, message, max_tokens, temperature,
+                                                          timeout=timeout, started=call.start)):
+                event = {"node": node, "token": token}
+                if not parts and call.measurement.retries == 0:
+                    event["ttft_ms"] = call.measurement.first_token() * 1000
+                parts.append(token)
+                write(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if parts:
+                write({"node": node, "reset": True})
+            raise to_llm_error(e, endpoint.model) from e
+        return "".join(parts).strip()
+
+    try:
+        text = await arun_with_policy(model, send, hedge=False, on_retry=call.retry, base_url=base_url,
+                                     prepare=lambda endpoint: backend.prepare(endpoint, timeout, True))
+    except (LLMError, asyncio.CancelledError) as e:
+        call.measurement.fail(e)
+        raise
+    call.measurement.finish(text)
+    return text
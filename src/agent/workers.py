@@ -0,0 +1,297 @@
+"""Multi-process ticket worker pool.
+
+A single process runs every ticket under one GIL, so CPU-side work (graph
+bookkeeping, retrieval scoring, classification, prompt assembly, logging) stops
+scaling past one core. `WorkerPool` shards tickets across N worker processes, each
+with its own compiled graph, LLM clients and event loop running up to `concurrency`
+tickets at a time.
+
+The parent talks to every worker over its own pipe and tracks which tickets each
+worker holds. Results come back in input order. If a worker dies, the pool starts a
+replacement and re-sends the tickets the dead worker held. A ticket that was in flight
+during `max_attempts` crashes gets an error record instead, so one poison ticket
+cannot take the pool down.
+
+Workers read the same environment as a single-process run, so set
+`HUGGINGFACE_BASE_URL`, `CHECKPOINT_BACKEND` and similar before starting the pool.
+
+Configuration (environment):
+    WORKER_PROCESSES: Worker processes (default: CPU count).
+    WORKER_START_METHOD: multiprocessing start method (default "spawn").
+    WORKER_MAX_ATTEMPTS: Crashes a ticket may be in flight for before it fails (default 2).
+    WORKER_MAX_RESTARTS: Worker restarts before the pool gives up (default 10).
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agent.batch import DEFAULT_CONCURRENCY, completed_ids, read_tickets
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0")) or os.cpu_count() or 1
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "2"))
+WORKER_MAX_RESTARTS = int(os.getenv("WORKER_MAX_RESTARTS", "10"))
+
+CRASH_ERROR = "Worker process crashed while processing the ticket."
+
+Task = Tuple[int, str, Dict[str, Any]]
+
+
+def _worker_main(conn: Connection, concurrency: int) -> None:
+    """Worker process entry point: run tickets received on `conn` until told to stop."""
+    # Ctrl-C goes to the whole process group; the parent decides how to shut down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from agent.escalation import get_escalation_sink
+    from agent.graph import warm_up
+
+    warm_up()
+    try:
+        asyncio.run(_serve(conn, concurrency))
+    finally:
+        # Process.run exits with os._exit, which skips atexit: flush queued escalations.
+        get_escalation_sink().close()
+
+
+async def _serve(conn: Connection, concurrency: int) -> None:
+    from agent.batch import aprocess_ticket
+    from agent.checkpoint import aclose_checkpointer
+    from agent.utils import aclose_async_client
+
+    # The parent sends at most `concurrency` tickets per worker; this also holds if it does not.
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def handle(seq: int, ticket_id: str, ticket: Dict[str, Any]) -> None:
+        try:
+            async with slots:
+                record = await aprocess_ticket(ticket_id, ticket)
+        except Exception as e:
+            # Every ticket must be answered, or the parent waits for it forever.
+            record = {"id": ticket_id, "error": f"Error processing ticket: {e}"}
+        conn.send((seq, record))
+
+    tasks: set = set()
+    try:
+        while True:
+            try:
+                message = await asyncio.to_thread(conn.recv)
+            except EOFError:  # the parent went away
+                break
+            if message is None:
+                break
+            task = asyncio.create_task(handle(*message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await aclose_async_client()
+        await aclose_checkpointer()
+
+
+class _Worker:
+    def __init__(self, index: int, context, concurrency: int):
+        self.index = index
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, concurrency),
+                                       name=f"ticket-worker-{index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.assigned: Dict[int, Task] = {}
+        self.completed = 0
+
+
+class WorkerPool:
+    """Runs tickets across worker processes and returns their results in input order.
+
+    Args:
+        processes (Optional[int]): Worker processes (default `WORKER_PROCESSES`).
+        concurrency (int): Tickets each worker runs at the same time.
+        max_attempts (int): Crashes a ticket may be in flight for before it gets an error record.
+        max_restarts (int): Worker restarts allowed before `map` raises RuntimeError.
+        start_method (Optional[str]): multiprocessing start method (default `WORKER_START_METHOD`).
+    """
+
+    def __init__(self, processes: Optional[int] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_attempts: int = WORKER_MAX_ATTEMPTS, max_restarts: int = WORKER_MAX_RESTARTS,
+                 start_method: Optional[str] = None):
+        """Configure the pool; processes start on `start` or `with`."""
+        self.processes = processes or WORKER_PROCESSES
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.max_restarts = max_restarts
+        self._context = multiprocessing.get_context(start_method or WORKER_START_METHOD)
+        self._workers: List[_Worker] = []
+        self._attempts: Dict[int, int] = {}
+        self.restarts = 0
+        self.crashed_tickets = 0
+
+    def start(self) -> "WorkerPool":
+        """Start the worker processes (once) and return the pool."""
+        if not self._workers:
+            self._workers = [_Worker(i, self._context, self.concurrency) for i in range(self.processes)]
+        return self
+
+    def close(self) -> None:
+        """Let workers finish their tickets and exit; kill those that do not within 10 s."""
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(10)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+        self._workers = []
+
+    def __enter__(self) -> "WorkerPool":
+        """Start the pool."""
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        """Close the pool."""
+        self.close()
+
+    def pids(self) -> List[int]:
+        """Return the worker process IDs (for monitoring and tests)."""
+        return [worker.process.pid for worker in self._workers]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return process, restart and crash counts and tickets completed per worker."""
+        return {
+            "processes": self.processes,
+            "restarts": self.restarts,
+            "crashed_tickets": self.crashed_tickets,
+            "completed_per_worker": [worker.completed for worker in self._workers],
+        }
+
+    def _restart(self, worker: _Worker, retry: Deque[Task], results: Dict[int, Dict[str, Any]]) -> None:
+        """Replace a dead worker and re-send (or fail) the tickets it held."""
+        self.restarts += 1
+        if self.restarts > self.max_restarts:
+            raise RuntimeError(f"Worker pool gave up after {self.restarts - 1} worker restarts")
+        worker.conn.close()
+        worker.process.join()
+        for seq, task in sorted(worker.assigned.items(), reverse=True):
+            self._attempts[seq] = self._attempts.get(seq, 0) + 1
+            if self._attempts[seq] >= self.max_attempts:
+                self.crashed_tickets += 1
+                results[seq] = {"id": task[1], "error": CRASH_ERROR}
+            else:
+                retry.appendleft(task)
+        self._workers[worker.index] = _Worker(worker.index, self._context, self.concurrency)
+
+    def _receive(self, worker: _Worker, results: Dict[int, Dict[str, Any]]) -> bool:
+        """Collect everything `worker` has sent; return False once its pipe is closed."""
+        try:
+            while worker.conn.poll():
+                seq, record = worker.conn.recv()
+                worker.assigned.pop(seq, None)
+                worker.completed += 1
+                results[seq] = record
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def map(self, tickets: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Yield one result record per `(ticket_id, ticket)`, in input order.
+
+        Tickets are read from `tickets` only as workers have room, and at most a few
+        times `processes * concurrency` finished results wait behind a slow ticket.
+        """
+        self.start()
+        pending = iter(enumerate(tickets))
+        retry: Deque[Task] = deque()
+        results: Dict[int, Dict[str, Any]] = {}
+        self._attempts = {}
+        buffer_limit = 4 * self.processes * self.concurrency
+        next_seq, exhausted = 0, False
+
+        while True:
+            # Hand out tickets to the least-loaded workers.
+            for worker in sorted(self._workers, key=lambda w: len(w.assigned)):
+                while len(worker.assigned) < self.concurrency:
+                    # Retries go out even with a full buffer: one of them may be the ticket it waits on.
+                    if retry:
+                        task = retry.popleft()
+                    elif not exhausted and len(results) < buffer_limit:
+                        try:
+                            seq, (ticket_id, ticket) = next(pending)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        task = (seq, ticket_id, ticket)
+                    else:
+                        break
+                    worker.assigned[task[0]] = task
+                    try:
+                        worker.conn.send(task)
+                    except OSError:
+                        break  # dead worker; restarted below
+
+            while next_seq in results:
+                yield results.pop(next_seq)
+                next_seq += 1
+            if exhausted and not retry and not any(w.assigned for w in self._workers):
+                return
+
+            ready = wait([w.conn for w in self._workers] + [w.process.sentinel for w in self._workers], timeout=1.0)
+            for worker in list(self._workers):
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    alive = self._receive(worker, results)
+                    if not alive or not worker.process.is_alive():
+                        self._receive(worker, results)
+                        self._restart(worker, retry, results)
+
+
+def run_batch_pool(input_path: str, output_path: str, processes: Optional[int] = None,
+                   concurrency: int = DEFAULT_CONCURRENCY, resume: bool = True,
+                   progress_every: Optional[int] = None) -> Dict[str, Any]:
+    """Run `agent.batch.arun_batch` on a `WorkerPool`.
+
+    Same files, resume rules and statistics; results are written in input order.
+    """
+    done = completed_ids(output_path) if resume else set()
+    stats: Dict[str, Any] = {"processed": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    def todo() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for ticket_id, ticket in read_tickets(input_path):
+            if ticket_id in done:
+                stats["skipped"] += 1
+                continue
+            yield ticket_id, ticket
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            WorkerPool(processes, concurrency) as pool:
+        for record in pool.map(todo()):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            stats["processed"] += 1
+            if record.get("error"):
+                stats["failed"] += 1
+            if progress_every and stats["processed"] % progress_every == 0:
+                rate = stats["processed"] / (time.perf_counter() - start)
+                print(f"{stats['processed']} tickets, {rate:.2f} tickets/sec", file=sys.stderr)  # noqa: T201
+        stats["workers"] = pool.stats()
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_sec"] = round(elapsed, 3)
+    stats["tickets_per_sec"] = round(stats["processed"] / elapsed, 3) if elapsed > 0 else 0.0
+    return stats
+
+
+def run_tickets(tickets: Iterable[Tuple[str, Dict[str, Any]]], processes: Optional[int] = None,
+                **kwargs: Any) -> List[Dict[str, Any]]:
+    """Run `tickets` on a temporary `WorkerPool` and return the result records in order."""
+    with WorkerPool(processes, **kwargs) as pool:
+        return list(pool.map(tickets))
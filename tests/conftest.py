@@ -1,6 +1,34 @@
 import pytest
 
+from agent import escalation, llm_policy
+from agent.bench.mock_server import DEFAULT_DRAFT, MockLLMServer, use_endpoint
+from agent.escalation import EscalationSink, JSONLEscalationBackend
+
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+STUB_DRAFT = DEFAULT_DRAFT
+
+
+@pytest.fixture
+def llm_stub(tmp_path):
+    """Run a local mock inference endpoint and point the agent's LLM clients at it.
+
+    Escalations are diverted to a temporary file so tests never touch the real log, and
+    circuit breakers and latency history start empty.
+    """
+    llm_policy.reset_policy()
+    previous_sink = escalation._sink
+    sink = EscalationSink(JSONLEscalationBackend(str(tmp_path / "escalations.jsonl")))
+    escalation.set_escalation_sink(sink)
+    server = MockLLMServer().start()
+    try:
+        with use_endpoint(server.url):
+            yield server
+    finally:
+        server.stop()
+        sink.close()
+        escalation.set_escalation_sink(previous_sink)
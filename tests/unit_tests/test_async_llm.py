@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import utils
+from agent.graph import graph
+
+pytestmark = pytest.mark.anyio
+
+
+def _ticket(i: int) -> dict:
+    return {
+        "ticket": {"subject": f"I was charged twice #{i}", "description": "Two charges on my card this month."},
+        "messages": [],
+        "attempt": 0,
+        "drafts": [],
+        "feedbacks": [],
+    }
+
+
+async def test_acall_llm_uses_stub(llm_stub) -> None:
+    try:
+        assert await utils.acall_llm("Classify the ticket: refund please") == "Billing"
+    finally:
+        await utils.aclose_async_client()
+
+
+async def test_acall_llm_returns_mock_without_request(llm_stub) -> None:
+    assert await utils.acall_llm("anything", mock_response="mocked") == "mocked"
+    assert llm_stub.requests == 0
+
+
+async def test_ainvoke_runs_tickets_concurrently(llm_stub, monkeypatch) -> None:
+    llm_stub.latency = 0.05
+    monkeypatch.setattr(utils, "LLM_MAX_CONCURRENCY", 8)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(graph.ainvoke(_ticket(i)) for i in range(40)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await utils.aclose_async_client()
+
+    assert all(r["approved"] and r["category"] == "Billing" for r in results)
+    assert llm_stub.requests == 40 * 3
+    assert llm_stub.max_in_flight <= 8
+    # 120 requests at 50 ms each would take 6 s serially.
+    assert elapsed < 3
+
+
+def test_invoke_still_uses_sync_client(llm_stub) -> None:
+    result = graph.invoke(_ticket(0))
+    assert result["approved"]
+    assert llm_stub.requests == 3
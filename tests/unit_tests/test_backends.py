@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent import backends, routing
+from agent.backends import LLMRequest, LocalBackend, set_backend
+from agent.bench.mock_server import DEFAULT_DRAFT
+from agent.graph import graph
+from agent.llm_policy import Endpoint, LLMRateLimitError, LLMRequestError
+from agent.routing import Router, parse_routes
+from agent.state import new_ticket_state
+from agent.utils import acall_llm, call_llm, stream_llm
+
+
+class SlowModel:
+    """Stands in for a loaded llama.cpp model; records how many calls overlap."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = self.peak = self.calls = 0
+        self.lock = threading.Lock()
+
+    def create_chat_completion(self, messages, max_tokens, temperature, stream=False, response_format=None):
+        if stream:
+            return self._chunks(messages[-1]["content"])
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {"choices": [{"message": {"content": f" answer to {messages[-1]['content']} "}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 4}}
+
+    def _chunks(self, content):
+        self.streaming = True
+        try:
+            for word in ("answer", "to", content):
+                yield {"choices": [{"delta": {"content": word + " "}}]}
+        finally:
+            self.streaming = False
+
+
+@pytest.fixture
+def routes():
+    previous = routing._router, routing._router_configured
+
+    def install(table):
+        routing.set_router(Router(parse_routes(table)))
+
+    yield install
+    routing._router, routing._router_configured = previous
+    for name in backends.BACKENDS:
+        set_backend(name, None)
+
+
+def test_fake_backend_runs_the_graph_without_a_server(llm_stub, monkeypatch) -> None:
+    monkeypatch.setattr(backends, "LLM_BACKEND", "fake")
+
+    result = graph.invoke(new_ticket_state("Double charge", "I see two charges for invoice 5151."))
+
+    assert result["category"] == "Billing" and result["approved"]
+    assert result["drafts"][-1] == DEFAULT_DRAFT
+    assert llm_stub.models == {}
+
+
+def test_openai_backend_speaks_plain_http(llm_stub, routes) -> None:
+    routes({"default": {"backend": "openai", "base_url": llm_stub.url}})
+    route = routing.get_router().route_for("draft")
+
+    assert call_llm("Classify the ticket: my login fails", model="m", route=route) == "Technical"
+    assert stream_llm("You are a support agent. Reply.", model="m", route=route) == DEFAULT_DRAFT
+    assert llm_stub.models == {"m": 2}
+
+    with pytest.raises(ValueError, match="unknown backend"):
+        parse_routes({"classify": {"backend": "onnx"}})
+
+
+def test_local_backend_shares_one_model_and_bounds_concurrency(routes) -> None:
+    model = SlowModel()
+    set_backend("local", LocalBackend(llm=model, concurrency=1))
+    routes({"classify": {"model": "qwen-q4", "backend": "local"}})
+    route = routing.get_router().route_for("classify")
+
+    async def run():
+        return await asyncio.gather(*(acall_llm(f"t{i}", route=route) for i in range(4)))
+
+    assert asyncio.run(run()) == [f"answer to t{i}" for i in range(4)]
+    assert model.calls == 4 and model.peak == 1
+
+    busy = LocalBackend(llm=SlowModel(0.3), max_queue=1)
+    request = LLMRequest(Endpoint("qwen-q4"), "hi")
+    threads = [threading.Thread(target=busy.complete, args=(request,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    with pytest.raises(LLMRateLimitError, match="queue is full"):
+        busy.complete(request)
+    for thread in threads:
+        thread.join()
+
+    with pytest.raises(LLMRequestError, match="LLM_LOCAL_MODEL_PATH"):
+        LocalBackend(model_path="").complete(request)
+
+
+def test_closed_local_stream_releases_its_slot() -> None:
+    model = SlowModel()
+    backend = LocalBackend(llm=model, concurrency=1)
+    request = LLMRequest(Endpoint("qwen-q4"), "hi")
+
+    tokens = backend.stream(request)
+    assert next(tokens) == "answer " and backend.running == 1 and model.streaming
+    tokens.close()
+    assert backend.running == 0 and not model.streaming
+    assert backend.complete(request)[0] == "answer to hi"
+
+    async def first_token():
+        async for token in backend.astream(request):
+            return token
+
+    assert asyncio.run(first_token()) == "answer "
+    deadline = time.monotonic() + 2
+    while backend.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.running == 0 and not model.streaming
+
+    with pytest.raises(TypeError, match="abstract"):
+        backends.Backend()
+
+
+def test_local_model_loads_off_the_event_loop(routes, monkeypatch) -> None:
+    loaded = []
+
+    class LoadingBackend(LocalBackend):
+        def model(self):
+            if not loaded:
+                time.sleep(0.2)  # loading a GGUF file
+                loaded.append(threading.get_ident())
+                self._llm = SlowModel(0)
+            return self._llm
+
+    set_backend("local", LoadingBackend(model_path="model.gguf"))
+    routes({"classify": {"model": "qwen-q4", "backend": "local"}})
+    route = routing.get_router().route_for("classify")
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        answer = await acall_llm("t", route=route)
+        ticker.cancel()
+        return answer, ticks
+
+    answer, ticks = asyncio.run(run())
+    assert answer == "answer to t" and loaded[0] != threading.get_ident() and ticks >= 5
+
+    # With a route on the local backend, start-up loads the model ahead of the first ticket.
+    monkeypatch.setattr(backends, "LLM_LOCAL_MODEL_PATH", "model.gguf")
+    fresh = LoadingBackend(model_path="model.gguf")
+    loaded.clear()
+    set_backend("local", fresh)
+    backends.warm_up_backends()
+    assert loaded and fresh._llm is not None
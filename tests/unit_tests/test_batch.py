@@ -0,0 +1,79 @@
+import json
+
+from agent.batch import completed_ids, run_batch
+
+
+def _write_tickets(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": f"t{i}", "subject": "Charged twice", "description": f"Two charges on my card for order {i}."}) + "\n")
+        f.write(json.dumps({"id": "bad", "subject": "", "description": "missing subject"}) + "\n")
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_run_batch_writes_one_result_per_ticket(llm_stub, tmp_path):
+    tickets, results = tmp_path / "tickets.jsonl", tmp_path / "results.jsonl"
+    _write_tickets(tickets, 12)
+
+    stats = run_batch(str(tickets), str(results), concurrency=4)
+
+    records = {r["id"]: r for r in _read(results)}
+    assert len(records) == 13
+    assert records["t0"]["approved"] and records["t0"]["category"] == "Billing"
+    assert records["bad"]["error"] == "Please provide both subject and description."
+    assert stats["processed"] == 13 and stats["failed"] == 1
+    assert stats["tickets_per_sec"] > 0
+
+
+def test_run_batch_resumes_after_torn_write(llm_stub, tmp_path):
+    tickets, results = tmp_path / "tickets.jsonl", tmp_path / "results.jsonl"
+    _write_tickets(tickets, 5)
+    results.write_text(
+        json.dumps({"id": "t0", "approved": True}) + "\n"
+        + json.dumps({"id": "t1", "error": "boom"}) + "\n"
+        + json.dumps({"id": "bad", "error": "Please provide both subject and description.", "invalid": True}) + "\n"
+        + '[1, 2]\n{"approved": true}\n'
+        + '{"id": "t2", "appr'
+    )
+
+    assert completed_ids(str(results)) == {"t0", "bad"}
+    stats = run_batch(str(tickets), str(results), concurrency=2)
+
+    assert stats["skipped"] == 2
+    assert stats["processed"] == 4  # t1..t4; the invalid ticket already has its final record
+    assert llm_stub.requests == 4 * 3
+    ids = [r["id"] for r in _read_valid(results) if isinstance(r, dict) and "id" in r]
+    assert sorted(set(ids)) == ["bad", "t0", "t1", "t2", "t3", "t4"]
+
+
+def _read_valid(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+def test_run_batch_records_malformed_lines_and_keeps_going(llm_stub, tmp_path):
+    tickets, results = tmp_path / "tickets.jsonl", tmp_path / "results.jsonl"
+    tickets.write_text('{"id": "torn", "subj\n'
+                       + json.dumps({"id": "typed", "subject": 42, "description": "not text"}) + "\n"
+                       + json.dumps({"id": "ok", "subject": "Charged twice", "description": "Two charges, order 9."}) + "\n")
+
+    stats = run_batch(str(tickets), str(results), concurrency=2)
+    assert stats["processed"] == 3
+    # Resuming does not add another error record for the bad lines.
+    assert run_batch(str(tickets), str(results), concurrency=2)["skipped"] == 3
+    assert len(_read(results)) == 3
+
+    records = {r["id"]: r for r in _read(results)}
+    assert records["1"]["error"].startswith("Invalid JSON on line 1")
+    assert records["typed"]["error"] == "Subject and description must be text."
+    assert records["ok"]["approved"]
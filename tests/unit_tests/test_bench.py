@@ -0,0 +1,44 @@
+from agent.bench.corpus import generate_corpus
+from agent.bench.mock_server import APPROVE, REJECT, MockLLMServer
+from agent.bench.runner import compare, run_benchmark
+from agent.bench.scenarios import Scenario
+
+
+def test_corpus_is_deterministic() -> None:
+    first = generate_corpus(20, seed=3)
+    assert first == generate_corpus(20, seed=3)
+    assert first != generate_corpus(20, seed=4)
+    assert len({t["subject"] for t in first}) == 20
+
+
+def test_review_script_is_per_ticket() -> None:
+    server = MockLLMServer(review_script=(REJECT, APPROVE))
+    prompt_a = "You are a senior support agent.\nTicket Subject: A"
+    prompt_b = "You are a senior support agent.\nTicket Subject: B"
+    assert server.reply(prompt_a) == REJECT
+    assert server.reply(prompt_b) == REJECT
+    assert server.reply(prompt_a) == APPROVE
+    assert server.reply(prompt_a) == APPROVE
+    server.server_close()
+
+
+def test_run_benchmark_reports_levels() -> None:
+    scenario = Scenario("test", review_script=(REJECT, APPROVE), latency=0.0, jitter=0.0)
+    report = run_benchmark(scenario, [1, 4], tickets=4, modes=("sync", "async"), warmup=0)
+    assert [(r["mode"], r["concurrency"]) for r in report["results"]] == [
+        ("sync", 1), ("sync", 4), ("async", 1), ("async", 4)
+    ]
+    for entry in report["results"]:
+        assert entry["tickets"] == 4
+        assert entry["approved"] == 4 and entry["failed"] == 0
+        assert entry["llm_calls"]["review"] == 8
+        assert entry["latency_ms"]["p50"] <= entry["latency_ms"]["p99"]
+
+
+def test_compare_flags_regressions() -> None:
+    def entry(p95, tps):
+        return {"results": [{"mode": "async", "concurrency": 8,
+                             "latency_ms": {"p95": p95}, "tickets_per_sec": tps}]}
+
+    assert compare(entry(100, 50), entry(105, 48)) == []
+    assert len(compare(entry(100, 50), entry(150, 30))) == 2
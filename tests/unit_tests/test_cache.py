@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from agent import cache as cache_module
+from agent import metrics
+from agent.cache import InMemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+from agent.graph import graph
+from agent.server import TicketService
+from agent.state import new_ticket_state
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryCacheBackend(max_entries=2, ttl=60)
+    return SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl=60)
+
+
+def test_exact_hit_ignores_case_and_punctuation(backend):
+    cache = ResponseCache(backend)
+    cache.store("Billing", "Charged twice!", "Two charges on my card.", "draft")
+
+    assert cache.lookup("Billing", "charged  twice", "two charges on my card").draft == "draft"
+    assert cache.lookup("Technical", "charged twice", "two charges on my card") is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction(backend):
+    cache = ResponseCache(backend)
+    cache.store("Billing", "a", "a", "A")
+    time.sleep(0.01)
+    cache.store("Billing", "b", "b", "B")
+    time.sleep(0.01)
+    assert cache.lookup("Billing", "a", "a") is not None  # refresh "a"
+    time.sleep(0.01)
+    cache.store("Billing", "c", "c", "C")
+
+    assert cache.lookup("Billing", "b", "b") is None
+    assert cache.lookup("Billing", "a", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(backend):
+    backend.ttl = 0.05
+    cache = ResponseCache(backend)
+    cache.store("Billing", "a", "a", "A")
+    time.sleep(0.1)
+    assert cache.lookup("Billing", "a", "a") is None
+
+
+def test_similarity_hit(backend):
+    cache = ResponseCache(backend, similarity_threshold=0.8)
+    cache.store("Billing", "I was charged twice", "I see two charges on my credit card this month", "draft")
+
+    hit = cache.lookup("Billing", "I was charged twice", "I see two charges on my credit card this month.!")
+    assert hit is not None
+    near = cache.lookup("Billing", "I got charged twice", "I see two charges on my credit card this month")
+    assert near is not None and near.draft == "draft"
+    assert cache.lookup("Billing", "Cancel my subscription", "Please stop renewing my plan") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["similar_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["llm_calls_saved"] == 4
+
+
+def test_graph_skips_draft_and_review_on_hit(llm_stub):
+    cache = ResponseCache(InMemoryCacheBackend())
+    cache_module.set_response_cache(cache)
+    hits = metrics.RESPONSE_CACHE_LOOKUPS.value(result="exact_hit")
+    try:
+        first = graph.invoke(new_ticket_state("Charged twice", "Two charges on my card."))
+        second = graph.invoke(new_ticket_state("charged twice", "two charges on my card"))
+        health = TicketService().stats()
+    finally:
+        cache_module.set_response_cache(None)
+
+    assert first["approved"] and not first["cached"]
+    assert second["approved"] and second["cached"]
+    assert second["output"] == first["output"]
+    # classify + draft + review for the first ticket, classify only for the second.
+    assert llm_stub.requests == 4
+    assert cache.stats()["hits"] == 1
+    assert metrics.RESPONSE_CACHE_LOOKUPS.value(result="exact_hit") == hits + 1
+    assert "agent_response_cache_lookups_total" in metrics.render_prometheus()
+    assert health["response_cache"]["hits"] == 1
@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import checkpoint
+from agent.checkpoint import SQLiteCheckpointer, ticket_config
+from agent.graph import agraph, ainvoke_ticket, builder, compile_graph, invoke_ticket
+from agent.state import new_ticket_state
+
+
+def _state() -> dict:
+    return new_ticket_state("I was charged twice", "Two charges on my card this month.")
+
+
+TICKET = _state()["ticket"]
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = SQLiteCheckpointer(str(tmp_path / "checkpoints.sqlite3"), compact_interval=0)
+    yield saver
+    saver.close()
+
+
+def test_finished_ticket_returns_saved_result(llm_stub, saver) -> None:
+    compiled = compile_graph(saver)
+    first = invoke_ticket(_state(), "t-1", compiled)
+    requests = llm_stub.requests
+    again = invoke_ticket(_state(), "t-1", compiled)
+    assert again["output"] == first["output"] and again["approved"]
+    assert llm_stub.requests == requests
+
+    # The same ID for a different ticket (another batch file's line 1) runs afresh.
+    other = invoke_ticket(new_ticket_state("App crashes", "The app crashes on start."), "t-1", compiled)
+    assert other["category"] == "Technical" and llm_stub.requests > requests
+
+
+def test_compaction_runs_in_the_background(llm_stub, tmp_path) -> None:
+    saver = SQLiteCheckpointer(str(tmp_path / "checkpoints.sqlite3"), ttl_sec=0, compact_interval=0.05)
+    try:
+        invoke_ticket(_state(), "t-6", compile_graph(saver))
+        deadline = time.monotonic() + 5
+        while saver.stats()["checkpoints"] > 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert saver.stats()["checkpoints"] == 1
+    finally:
+        saver.close()
+    assert not saver._compactor.is_alive()
+
+
+def test_interrupted_ticket_resumes_from_last_node(llm_stub, saver) -> None:
+    # Stopping before review stands in for a worker dying after the draft was written.
+    interrupted = builder.compile(checkpointer=saver, interrupt_before=["review"])
+    interrupted.invoke(_state(), ticket_config("t-2", TICKET))
+    assert compile_graph(saver).get_state(ticket_config("t-2", TICKET)).next == ("review",)
+    before = dict(llm_stub.calls)
+
+    result = invoke_ticket(_state(), "t-2", compile_graph(saver))
+    assert result["approved"] and len(result["drafts"]) == 1
+    assert llm_stub.calls["draft"] == before["draft"]
+    assert llm_stub.calls["classify"] == before["classify"]
+
+
+@pytest.mark.anyio
+async def test_async_resume(llm_stub, saver) -> None:
+    from agent.utils import aclose_async_client
+
+    interrupted = builder.compile(checkpointer=saver, interrupt_before=["review"])
+    await interrupted.ainvoke(_state(), ticket_config("t-3", TICKET))
+    try:
+        result = await ainvoke_ticket(_state(), "t-3", compile_graph(saver))
+    finally:
+        await aclose_async_client()
+    assert result["approved"]
+
+
+def test_compaction_keeps_latest_checkpoint(llm_stub, saver) -> None:
+    compiled = compile_graph(saver)
+    result = invoke_ticket(_state(), "t-4", compiled)
+    assert saver.stats()["checkpoints"] > 1
+
+    deleted = saver.compact(ttl_sec=0, keep=1)
+    assert deleted["checkpoints"] > 0 and deleted["blobs"] > 0
+    assert saver.stats()["checkpoints"] == 1
+    assert compiled.get_state(ticket_config("t-4", TICKET)).values["output"] == result["output"]
+
+
+def test_compaction_keeps_blobs_of_a_concurrent_put(llm_stub, saver, monkeypatch) -> None:
+    invoke_ticket(_state(), "t-7", compile_graph(saver))
+    config = ticket_config("t-7", TICKET)
+    latest = saver.get_tuple(config)
+    version = saver.get_next_version(latest.checkpoint["channel_versions"]["output"], None)
+    newer = {**latest.checkpoint, "id": str(uuid6()), "channel_values": {"output": "newer"},
+             "channel_versions": {**latest.checkpoint["channel_versions"], "output": version}}
+    writer = threading.Thread(target=saver.put, args=(latest.config, newer, {}, {"output": version}))
+    loads_typed = saver.serde.loads_typed
+
+    def put_during_prune(data):
+        # The first checkpoint read by the pruner: an in-flight ticket saves its next step.
+        if not writer.is_alive() and writer.ident is None:
+            writer.start()
+            time.sleep(0.1)
+        return loads_typed(data)
+
+    monkeypatch.setattr(saver.serde, "loads_typed", put_during_prune)
+    saver.compact(ttl_sec=0, keep=1)
+    writer.join()
+    monkeypatch.undo()
+
+    assert saver.get_tuple(config).checkpoint["channel_values"]["output"] == "newer"
+
+
+def test_ttl_deletes_expired_tickets(llm_stub, saver) -> None:
+    invoke_ticket(_state(), "t-5", compile_graph(saver))
+    time.sleep(0.02)
+    assert saver.compact(ttl_sec=0.01)["threads"] == 1
+    assert saver.stats() == {"threads": 0, "bytes": 0, "checkpoints": 0, "blobs": 0, "writes": 0}
+
+
+def test_postgres_gets_an_async_saver_per_event_loop(monkeypatch) -> None:
+    events = []
+
+    class FakeAsyncSaver(InMemorySaver):
+        @classmethod
+        @contextlib.asynccontextmanager
+        async def from_conn_string(cls, url):
+            saver = cls()
+            events.append(("open", url))
+            yield saver
+            events.append(("close", url))
+
+    aio = types.ModuleType("langgraph.checkpoint.postgres.aio")
+    aio.AsyncPostgresSaver = FakeAsyncSaver
+    monkeypatch.setitem(sys.modules, "langgraph.checkpoint.postgres.aio", aio)
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_BACKEND", "postgres")
+    monkeypatch.setattr(checkpoint, "get_checkpointer", lambda: InMemorySaver())
+    monkeypatch.setenv("CHECKPOINT_URL", "postgresql://db")
+
+    async def run():
+        first, again = await checkpoint.aget_checkpointer(), await checkpoint.aget_checkpointer()
+        compiled = await agraph()
+        await checkpoint.aclose_checkpointer()
+        return first, again, compiled
+
+    first, again, compiled = asyncio.run(run())
+    assert isinstance(first, FakeAsyncSaver) and again is first and compiled.checkpointer is first
+    assert asyncio.run(run())[0] is not first
+    assert events == [("open", "postgresql://db"), ("close", "postgresql://db")] * 2
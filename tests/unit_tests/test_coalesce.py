@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent.coalesce import TicketCoalescer
+from agent.graph import graph
+from agent.state import new_ticket_state
+
+SUBJECT, DESCRIPTION = "Website is down", "I cannot load the website at all since this morning."
+
+
+@pytest.mark.anyio
+async def test_identical_burst_runs_graph_once(llm_stub) -> None:
+    from agent.utils import aclose_async_client
+
+    coalescer = TicketCoalescer()
+
+    async def handle():
+        return await coalescer.arun(SUBJECT, DESCRIPTION,
+                                    lambda: graph.ainvoke(new_ticket_state(SUBJECT, DESCRIPTION)))
+
+    try:
+        await handle()
+        single = llm_stub.requests
+        results = await asyncio.gather(*(handle() for _ in range(10)))
+    finally:
+        await aclose_async_client()
+    assert llm_stub.requests == 2 * single  # only the burst's leader reached the model
+    assert all(r["output"] == results[0]["output"] for r in results)
+    assert results[0] is not results[1]
+    stats = coalescer.stats()
+    assert stats["leaders"] == 2 and stats["coalesced"] == 9 and stats["in_flight"] == 0
+
+
+@pytest.mark.anyio
+async def test_similar_mode_matches_reworded_ticket() -> None:
+    coalescer = TicketCoalescer(similarity_threshold=0.9)
+    release, runs = asyncio.Event(), []
+
+    async def work(name):
+        runs.append(name)
+        await release.wait()
+        return name
+
+    leader = asyncio.create_task(coalescer.arun(SUBJECT, DESCRIPTION, lambda: work("leader")))
+    await asyncio.sleep(0)
+    reworded = asyncio.create_task(coalescer.arun("Website down", DESCRIPTION.replace(".", "!"),
+                                                  lambda: work("reworded")))
+    other = asyncio.create_task(coalescer.arun("Refund request", "Please refund my last order.",
+                                               lambda: work("other")))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(leader, reworded, other) == ["leader", "leader", "other"]
+    assert runs == ["leader", "other"]
+    assert coalescer.stats()["similar"] == 1
+
+
+@pytest.mark.anyio
+async def test_followers_rerun_when_leader_is_cancelled() -> None:
+    coalescer = TicketCoalescer()
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def answer():
+        return "answered"
+
+    leader = asyncio.create_task(coalescer.arun(SUBJECT, DESCRIPTION, hang))
+    await started.wait()
+    follower = asyncio.create_task(coalescer.arun(SUBJECT, DESCRIPTION, answer))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "answered"
+    assert coalescer.stats()["leaders"] == 2
+
+
+def test_leader_error_reaches_followers() -> None:
+    coalescer = TicketCoalescer()
+    entered, release, errors = threading.Event(), threading.Event(), []
+
+    def fail():
+        entered.set()
+        release.wait()
+        raise RuntimeError("boom")
+
+    def submit(fn):
+        try:
+            coalescer.run(SUBJECT, DESCRIPTION, fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=submit, args=(fail,))]
+    threads[0].start()
+    entered.wait()
+    threads.append(threading.Thread(target=submit, args=(lambda: "unused",)))
+    threads[1].start()
+    while coalescer.stats()["exact"] == 0:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["boom", "boom"]
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from agent import early_escalation
+from agent.bench.mock_server import REJECT
+from agent.early_escalation import (
+    EARLY_ESCALATION_OUTPUT,
+    EarlyEscalator,
+    evaluate,
+    load_runs,
+    record_review,
+    set_review_history,
+    train,
+)
+from agent.escalation import (
+    EscalationSink,
+    JSONLEscalationBackend,
+    get_escalation_sink,
+    read_escalation_file,
+)
+from agent.graph import graph
+from agent.state import new_ticket_state
+
+RECOVERABLE = ("Refund timeline", "When will my refund for order {i} arrive?", "Billing",
+               "Add the refund timeline of 5-7 business days.")
+DOOMED = ("Delete my data", "Erase every record you hold about me, ref {i}.", "Security",
+          "Data deletion requests must be handled by the privacy team.")
+
+
+@pytest.fixture
+def escalator():
+    previous = early_escalation._escalator, early_escalation._configured
+    yield early_escalation.set_early_escalator
+    early_escalation._escalator, early_escalation._configured = previous
+
+
+@pytest.fixture
+def history(tmp_path):
+    """Record review outcomes to a temporary JSONL file through the background writer."""
+    path = tmp_path / "history.jsonl"
+    previous = early_escalation._history, early_escalation._history_configured
+    sink = EscalationSink(JSONLEscalationBackend(str(path)))
+    set_review_history(sink)
+    yield path, sink
+    sink.close()
+    early_escalation._history, early_escalation._history_configured = previous
+
+
+def test_identical_redraft_escalates_early(llm_stub, escalator, history) -> None:
+    path, sink = history
+    llm_stub.review_script = [REJECT]
+    escalator(EarlyEscalator(similarity=0.95))
+
+    result = graph.invoke(new_ticket_state("Charged twice", "Two charges on my card for order 4242."))
+
+    assert result["output"] == EARLY_ESCALATION_OUTPUT and len(result["drafts"]) == 2
+    assert "similar to the previous one" in result["early_escalation"]
+    sink.flush()
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(r["attempt"], r["verdict"], r["early"]) for r in rows] == [(0, "Escalate", False), (1, "Escalate", True)]
+    assert rows[0]["similarity"] is None and rows[1]["similarity"] > 0.99
+    get_escalation_sink().flush()
+    assert get_escalation_sink().query()[-1]["reason"].startswith("Escalated early after 2 attempts: new draft")
+
+
+def test_model_learns_which_rejections_recover(history, tmp_path) -> None:
+    path, sink = history
+    for i in range(20):
+        subject, description, category, feedback = RECOVERABLE
+        record_review(category, subject, description.format(i=i), 0, "Escalate", feedback)
+        record_review(category, subject, description.format(i=i), 1, "Approved")
+        subject, description, category, feedback = DOOMED
+        for attempt in range(3):
+            record_review(category, subject, description.format(i=i), attempt, "Escalate", feedback)
+    log = tmp_path / "escalation_log.csv"
+    log.write_text('2025-07-20 18:20:00,Delete my data,"Erase it all",Security,"Dear Customer",'
+                   '"Draft rejected after 3 attempts. Feedback: Send this to the privacy team."\n')
+    sink.flush()
+    runs = load_runs(str(path))
+    assert len(runs) == 40
+
+    model = train(runs, list(read_escalation_file(str(log))))
+    escalator = EarlyEscalator(model, threshold=0.5)
+    assert escalator.reason(DOOMED[2], DOOMED[0], DOOMED[1].format(i=99), 0, DOOMED[3]) is not None
+    assert escalator.reason(RECOVERABLE[2], RECOVERABLE[0], RECOVERABLE[1].format(i=99), 0, RECOVERABLE[3]) is None
+
+    report = evaluate(runs, escalator)
+    assert report["escalated_early"] == 20 and report["approvals_lost"] == 0
+    assert report["llm_calls_saved"] == 20 * 4 and report["llm_calls"] == 20 * 4 + 20 * 6
+    assert report["approval_rate"] == report["approval_rate_with_early_escalation"] == 0.5
+
+    with pytest.raises(ValueError, match="both outcomes"):
+        train([run for run in runs if run[-1]["verdict"] == "Escalate"])
+
+
+def test_review_outcomes_are_written_off_the_request_path(history) -> None:
+    path, sink = history
+    subject, description, category, feedback = RECOVERABLE
+
+    record_review(category, subject, description.format(i=0), 0, "Escalate", feedback)
+
+    assert not path.exists()  # queued; the writer thread appends it
+    sink.flush()
+    assert [json.loads(line)["verdict"] for line in path.read_text().splitlines()] == ["Escalate"]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from agent import escalation, precheck
+from agent.escalation import (
+    BACKENDS,
+    CSVEscalationBackend,
+    EscalationSink,
+    read_escalation_csv,
+)
+from agent.nodes.review import review_draft
+
+
+def _row(i, category="Billing", timestamp="2025-07-21 10:00:00"):
+    return {"timestamp": timestamp, "subject": f"s{i}", "description": "d", "category": category,
+            "draft": "x", "reason": "r"}
+
+
+class _RecordingBackend:
+    def __init__(self):
+        self.batches = []
+
+    def write_batch(self, rows):
+        self.batches.append(list(rows))
+
+    def query(self, **kwargs):
+        return [r for b in self.batches for r in b]
+
+
+def test_sink_batches_by_size_and_interval():
+    backend = _RecordingBackend()
+    sink = EscalationSink(backend, batch_size=3, flush_interval=0.05)
+    for i in range(4):
+        sink.log(_row(i))
+    time.sleep(0.2)
+    sink.close()
+    assert [len(b) for b in backend.batches] == [3, 1]
+
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_backends_write_and_query(name, tmp_path):
+    sink = EscalationSink(BACKENDS[name](str(tmp_path / f"log.{name}")), batch_size=50, flush_interval=10)
+    threads = [
+        threading.Thread(target=lambda t=t: [sink.log(_row(f"{t}-{i}", ["Billing", "Technical"][i % 2],
+                                                            f"2025-07-2{t} 10:00:0{i}"))
+                                             for i in range(10)])
+        for t in range(1, 5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sink.query(limit=None)) == 40
+    billing = sink.query(category="Billing", since="2025-07-23", limit=None)
+    assert len(billing) == 10 and all(r["category"] == "Billing" for r in billing)
+    latest = sink.query(limit=2)
+    assert [r["timestamp"] for r in latest] == ["2025-07-24 10:00:09", "2025-07-24 10:00:08"]
+    sink.close()
+
+
+def test_csv_appends_to_headerless_history(tmp_path):
+    path = tmp_path / "escalation_log.csv"
+    path.write_text('2025-07-20 18:20:00,Old,"d",Billing,"x","r"\n')
+    CSVEscalationBackend(str(path)).write_batch([_row(1)])
+    assert [r["subject"] for r in read_escalation_csv(str(path))] == ["Old", "s1"]
+
+
+def test_review_queues_escalation_without_blocking(llm_stub, monkeypatch, tmp_path):
+    backend = _RecordingBackend()
+    escalation.set_escalation_sink(EscalationSink(backend, flush_interval=10))
+    monkeypatch.setattr(llm_stub, "reply", lambda prompt, structured=False: "Escalate\nFeedback: Add a closing")
+    monkeypatch.setattr(precheck, "PRECHECK_MODE", "off")
+    try:
+        state = {"ticket": {"subject": "s", "description": "d"}, "category": "Billing", "context": "c",
+                 "attempt": 2, "drafts": ["draft"], "feedbacks": [], "messages": []}
+        result = review_draft(state)
+        assert result["output"] == "Ticket escalated to human agent after max retries."
+        assert backend.batches == []  # still queued
+        rows = escalation.get_escalation_sink().query()
+    finally:
+        escalation.get_escalation_sink().close()
+        escalation.set_escalation_sink(None)
+    assert rows[0]["reason"] == "Draft rejected after 3 attempts. Feedback: Add a closing"
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+from agent import knowledge_index
+from agent.knowledge_index import KnowledgeIndex, split_sections
+from agent.nodes.retrieval import retrieve_context
+
+
+def test_split_sections_drops_title():
+    sections = split_sections("Title:\n\n1. First:\n - a\n\n2. Second:\n - b\n")
+    assert sections == ["1. First:\n - a", "2. Second:\n - b"]
+
+
+def test_search_finds_sections_past_the_first_1500_chars():
+    index = KnowledgeIndex()
+    chunks = index.search("Billing", "my payment failed, card declined, insufficient funds")
+    assert any(c.text.startswith("3. Payment Failures") for c in chunks)
+    assert chunks == sorted(chunks, key=lambda c: c.position)
+    assert sum(c.tokens for c in chunks) <= 500
+
+
+def test_search_respects_budget_and_top_k():
+    index = KnowledgeIndex()
+    chunks = index.search("billing", "refund charge subscription dispute", top_k=2, token_budget=10_000)
+    assert len(chunks) == 2
+    chunks = index.search("billing", "refund charge subscription dispute", top_k=5, token_budget=50)
+    assert len(chunks) == 1 and chunks[0].tokens <= 50
+
+
+def test_unknown_category_returns_none():
+    assert KnowledgeIndex().search("Shipping", "where is my parcel") is None
+
+
+def _headings(index, query, **kwargs):
+    return [c.text.split(":")[0] for c in index.search("billing", query, **kwargs)]
+
+
+def _eventually(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_hot_reload(tmp_path):
+    (tmp_path / "billing.txt").write_text("1. Refunds:\n - refunds take 5 days\n")
+    index = KnowledgeIndex(str(tmp_path), reload_interval=0)
+    assert index.search("billing", "invoice")[0].text.startswith("1. Refunds")
+
+    (tmp_path / "billing").mkdir()
+    (tmp_path / "billing" / "invoices.txt").write_text("1. Invoices:\n - download invoices from the portal\n")
+    _eventually(lambda: _headings(index, "invoice download", top_k=1) == ["1. Invoices"])
+
+    os.remove(tmp_path / "billing.txt")
+    _eventually(lambda: _headings(index, "refunds") == ["1. Invoices"])
+
+
+def test_search_does_not_wait_for_a_rebuild(tmp_path, monkeypatch):
+    (tmp_path / "billing.txt").write_text("1. Refunds:\n - refunds take 5 days\n")
+    index = KnowledgeIndex(str(tmp_path), reload_interval=0)
+    release = threading.Event()
+    build = knowledge_index._CategoryIndex
+
+    def slow_build(chunks):
+        release.wait(5)
+        return build(chunks)
+
+    monkeypatch.setattr(knowledge_index, "_CategoryIndex", slow_build)
+    (tmp_path / "billing.txt").write_text("1. Invoices:\n - download invoices from the portal\n")
+    started = time.monotonic()
+    for _ in range(20):
+        assert _headings(index, "invoice") == ["1. Refunds"]
+    assert time.monotonic() - started < 1
+    assert sum(t.name == "knowledge-reload" for t in threading.enumerate()) == 1
+
+    release.set()
+    _eventually(lambda: _headings(index, "invoice") == ["1. Invoices"])
+
+
+def test_retrieve_context_uses_index():
+    state = {
+        "category": "Technical",
+        "ticket": {"subject": "Can't log in", "description": "Forgot password, account locked"},
+        "messages": [],
+    }
+    result = retrieve_context(state)
+    assert "1. Login Issues" in result["context"]
+    assert "Technical Support Documentation" not in result["context"]
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent import llm_policy, utils
+from agent.escalation import get_escalation_sink
+from agent.graph import graph
+from agent.llm_policy import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Endpoint,
+    LLMRateLimitError,
+    LLMRequestError,
+    LLMServerError,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    to_llm_error,
+)
+from agent.metrics import LLM_FALLBACKS, LLM_HEDGES
+from agent.nodes.failure import LLM_FAILURE_OUTPUT
+from agent.state import new_ticket_state
+
+PROMPT = "Classify the ticket: refund please"
+DEFAULT_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+
+
+@pytest.fixture(autouse=True)
+def fast_policy(monkeypatch):
+    monkeypatch.setattr(llm_policy, "LLM_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE", "off")
+    monkeypatch.setattr(llm_policy, "FALLBACKS", [])
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = _Response(status_code)
+
+
+def test_to_llm_error_classifies_failures() -> None:
+    assert isinstance(to_llm_error(_HTTPError(503)), LLMServerError)
+    assert isinstance(to_llm_error(_HTTPError(429)), LLMRateLimitError)
+    assert not to_llm_error(_HTTPError(400)).retryable
+    assert isinstance(to_llm_error(TimeoutError("slow")), LLMTimeoutError)
+    assert to_llm_error(ConnectionRefusedError("refused")).retryable
+
+
+def test_circuit_breaker_opens_and_probes(monkeypatch) -> None:
+    breaker = CircuitBreaker("m", failures=2, window=10, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def _half_open_breaker(model: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(model, failures=1, window=10, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    llm_policy._breakers[Endpoint(model).key] = breaker
+    return breaker
+
+
+def test_probe_answered_with_request_error_closes_the_circuit() -> None:
+    llm_policy.reset_policy()
+    breaker = _half_open_breaker("m")
+
+    def bad_request(endpoint):
+        raise _HTTPError(400)
+
+    with pytest.raises(LLMRequestError):
+        llm_policy.run_with_policy("m", bad_request)
+    assert breaker.state == "closed"
+    assert llm_policy.run_with_policy("m", lambda endpoint: "ok") == "ok"
+
+
+def test_cancelled_probe_frees_the_probe_slot() -> None:
+    llm_policy.reset_policy()
+    breaker = _half_open_breaker("m")
+
+    async def hang(endpoint):
+        await asyncio.sleep(10)
+
+    async def answer(endpoint):
+        return "ok"
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(llm_policy.arun_with_policy("m", hang), 0.05)
+        assert breaker.state == "half_open" and breaker.allow()  # the next request may probe
+        breaker.end_probe()
+        return await llm_policy.arun_with_policy("m", answer)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_probe_records_its_verdict_before_freeing_the_slot(monkeypatch) -> None:
+    llm_policy.reset_policy()
+    breaker = _half_open_breaker("m")
+    states = []
+    end_probe = breaker.end_probe
+    monkeypatch.setattr(breaker, "end_probe", lambda: states.append(breaker.state) or end_probe())
+
+    assert llm_policy.run_with_policy("m", lambda endpoint: "ok", hedge=False) == "ok"
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    async def answer(endpoint):
+        return "ok"
+
+    assert asyncio.run(llm_policy.arun_with_policy("m", answer, hedge=False)) == "ok"
+    # Still half-open when the slot was freed would let a second probe through.
+    assert states == ["closed", "closed"]
+
+
+def test_async_setup_runs_off_the_event_loop() -> None:
+    llm_policy.reset_policy()
+    prepared = []
+
+    async def answer(endpoint):
+        return "ok"
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        result = await llm_policy.arun_with_policy(
+            "m", answer, prepare=lambda endpoint: prepared.append(threading.get_ident()) or time.sleep(0.2))
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+    assert result == "ok" and prepared[0] != threading.get_ident()
+    assert ticks >= 5  # the loop kept running while the setup blocked
+
+
+def test_retries_transient_errors(llm_stub) -> None:
+    llm_stub.fault_script = [503, 429]
+    assert utils.call_llm(PROMPT) == "Billing"
+    assert llm_stub.requests == 3
+
+
+def test_request_errors_are_not_retried(llm_stub) -> None:
+    llm_stub.fault_script = [400]
+    with pytest.raises(LLMRequestError):
+        utils.call_llm(PROMPT)
+    assert llm_stub.requests == 1
+
+
+def test_falls_back_to_next_model(llm_stub, monkeypatch) -> None:
+    llm_stub.failing_models = {"primary"}
+    monkeypatch.setattr(llm_policy, "FALLBACKS", [Endpoint("backup")])
+    before = LLM_FALLBACKS.value(model="primary", fallback="backup")
+    assert utils.call_llm(PROMPT, model="primary") == "Billing"
+    assert llm_stub.models == {"primary": llm_policy.LLM_MAX_ATTEMPTS, "backup": 1}
+    assert LLM_FALLBACKS.value(model="primary", fallback="backup") == before + 1
+
+
+def test_exhausted_chain_raises_unavailable(llm_stub, monkeypatch) -> None:
+    llm_stub.failing_models = {"primary", "backup"}
+    monkeypatch.setattr(llm_policy, "FALLBACKS", [Endpoint("backup")])
+    with pytest.raises(LLMUnavailableError) as info:
+        utils.call_llm(PROMPT, model="primary")
+    assert [e.model for e in info.value.errors] == ["primary", "backup"]
+
+
+def test_open_circuit_skips_requests(llm_stub, monkeypatch) -> None:
+    monkeypatch.setattr(llm_policy, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(llm_policy, "LLM_MAX_ATTEMPTS", 1)
+    llm_stub.failing_models = {"primary"}
+    for _ in range(2):
+        with pytest.raises(LLMServerError):
+            utils.call_llm(PROMPT, model="primary")
+    with pytest.raises(CircuitOpenError):
+        utils.call_llm(PROMPT, model="primary")
+    assert llm_stub.requests == 2
+
+
+def test_hedged_request_beats_hung_request(llm_stub, monkeypatch) -> None:
+    # Faults go to requests in arrival order: the delay must leave the original time to arrive first.
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE", "300")
+    llm_stub.fault_script = ["hang"]
+    llm_stub.hang_seconds = 2.0
+    before = LLM_HEDGES.value(model=DEFAULT_MODEL, winner="hedge")
+    start = time.perf_counter()
+    assert utils.call_llm(PROMPT) == "Billing"
+    assert time.perf_counter() - start < 1.5
+    assert LLM_HEDGES.value(model=DEFAULT_MODEL, winner="hedge") == before + 1
+
+
+def test_cold_start_setup_is_outside_the_hedge_window(monkeypatch) -> None:
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE", "50")
+    llm_policy.reset_policy()
+    sent = []
+
+    def send(endpoint):
+        sent.append(endpoint)
+        time.sleep(0.02)
+        return "ok"
+
+    # Building a client on a cold start (importing huggingface_hub) takes longer than the hedge delay.
+    assert llm_policy.run_with_policy("m", send, prepare=lambda endpoint: time.sleep(0.2)) == "ok"
+    assert len(sent) == 1
+    assert llm_policy._tracker(Endpoint("m"))._samples[-1] < 0.15
+
+
+@pytest.mark.anyio
+async def test_async_hedge_cancels_loser(llm_stub, monkeypatch) -> None:
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE", "300")
+    llm_stub.fault_script = ["hang"]
+    llm_stub.hang_seconds = 2.0
+    try:
+        start = time.perf_counter()
+        assert await utils.acall_llm(PROMPT) == "Billing"
+        assert time.perf_counter() - start < 1.5
+    finally:
+        await utils.aclose_async_client()
+
+
+def test_graph_escalates_on_llm_failure(llm_stub) -> None:
+    llm_stub.failing_models = {DEFAULT_MODEL}
+    result = graph.invoke(new_ticket_state("Cannot log in", "The app shows an error when I sign in."))
+    assert result["llm_error"].startswith("LLMServerError")
+    assert result["output"] == LLM_FAILURE_OUTPUT
+    assert not result["approved"]
+    rows = get_escalation_sink().query()
+    assert rows and rows[0]["reason"].startswith("LLM failure in draft")
@@ -0,0 +1,71 @@
+import json
+import time
+import urllib.request
+
+from agent import metrics
+from agent.graph import graph
+from agent.metrics import (
+    instrument_node,
+    render_prometheus,
+    start_metrics_server,
+    ticket_trace,
+    traced_stream,
+)
+from agent.state import new_ticket_state
+
+
+def test_ticket_trace_records_nodes_and_llm_calls(llm_stub, tmp_path):
+    metrics.reset_metrics()
+    log = tmp_path / "traces.jsonl"
+    with ticket_trace("t1", path=str(log)) as trace:
+        graph.invoke(new_ticket_state("Hi", "Something happened"))
+
+    summary = json.loads(log.read_text())
+    assert summary == trace.summary()
+    assert summary["ticket_id"] == "t1"
+    assert set(summary["node_seconds"]) == {"classify", "retrieve", "cache_lookup", "draft", "review"}
+    assert summary["llm_calls"] == 3 and summary["review_rounds"] == 1
+    assert summary["prompt_tokens"] > 0 and summary["completion_tokens"] > 0
+
+    assert metrics.NODE_DURATION.count(node="draft") == 1
+    assert metrics.LLM_CALLS.value(node="review", model="mistralai/Mistral-7B-Instruct-v0.2", status="ok") == 1
+    assert metrics.LLM_TTFT.count(node="draft", model="mistralai/Mistral-7B-Instruct-v0.2") == 1
+    assert metrics.REVIEW_ROUTES.value(decision="end") == 1
+
+
+def test_traced_stream_survives_thread_hops(llm_stub, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    log = tmp_path / "traces.jsonl"
+    events = traced_stream(lambda: graph.stream(new_ticket_state("Hi", "x"), stream_mode="updates"), path=str(log))
+    with ThreadPoolExecutor(4) as pool:
+        while pool.submit(next, events, None).result() is not None:
+            pass
+    assert json.loads(log.read_text())["llm_calls"] == 3
+
+
+def test_prometheus_endpoint(llm_stub):
+    metrics.reset_metrics()
+    graph.invoke(new_ticket_state("Hi", "Something happened"))
+    server = start_metrics_server(port=0, host="127.0.0.1")
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    finally:
+        server.shutdown()
+    assert body == render_prometheus()
+    assert "# TYPE agent_node_duration_seconds histogram" in body
+    assert 'agent_node_duration_seconds_bucket{node="classify",le="+Inf"} 1' in body
+    assert 'agent_llm_calls_total{model="mistralai/Mistral-7B-Instruct-v0.2",node="draft",status="ok"} 1.0' in body
+
+
+def test_node_instrumentation_overhead_is_small():
+    def node(state):
+        return {}
+
+    wrapped = instrument_node("noop", node)
+    n = 20_000
+    start = time.perf_counter()
+    for _ in range(n):
+        wrapped({})
+    per_call = (time.perf_counter() - start) / n
+    assert per_call < 50e-6
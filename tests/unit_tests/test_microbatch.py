@@ -0,0 +1,155 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from agent import hf_client, metrics, utils
+from agent.backends import get_backend
+from agent.bench.mock_server import use_chat_template
+from agent.graph import graph
+from agent.llm_policy import LLMServerError
+from agent.microbatch import BatchKey, MicroBatcher
+from agent.prompt_budget import count_tokens
+from agent.state import new_ticket_state
+
+KEY = BatchKey("m", 10, 0.0)
+
+
+def _submit_concurrently(batcher, prompts):
+    futures = [None] * len(prompts)
+
+    def submit(i):
+        futures[i] = batcher.submit(KEY, prompts[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(prompts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+def test_requests_within_window_share_a_batch() -> None:
+    sizes = []
+
+    def send(key, prompts):
+        sizes.append(len(prompts))
+        return [p.upper() for p in prompts]
+
+    batcher = MicroBatcher(send, window=0.05, max_size=4)
+    try:
+        futures = _submit_concurrently(batcher, [f"p{i}" for i in range(6)])
+        assert [f.result(timeout=2) for f in futures] == [f"P{i}" for i in range(6)]
+        assert sorted(sizes) == [2, 4]
+        stats = batcher.stats()
+        assert stats["requests"] == 6 and stats["batches"] == 2 and stats["max_batch_size"] == 4
+    finally:
+        batcher.close()
+
+
+def test_failed_batch_fails_every_request() -> None:
+    def send(key, prompts):
+        raise LLMServerError("down", key.model, 503)
+
+    batcher = MicroBatcher(send, window=0.01)
+    try:
+        futures = _submit_concurrently(batcher, ["a", "b"])
+        for future in futures:
+            with pytest.raises(LLMServerError):
+                future.result(timeout=2)
+    finally:
+        batcher.close()
+
+
+def test_cancelled_request_leaves_the_rest_of_its_batch_intact() -> None:
+    sent = []
+
+    def send(key, prompts):
+        sent.extend(prompts)
+        return [p.upper() for p in prompts]
+
+    batcher = MicroBatcher(send, window=0.1, max_size=8)
+    try:
+        futures = [batcher.submit(KEY, f"p{i}") for i in range(4)]
+        assert futures[1].cancel()
+        assert [futures[i].result(timeout=2) for i in (0, 2, 3)] == ["P0", "P2", "P3"]
+        assert sent == ["p0", "p2", "p3"]
+    finally:
+        batcher.close()
+
+
+@pytest.mark.anyio
+async def test_concurrent_tickets_send_batched_requests(llm_stub) -> None:
+    batcher = MicroBatcher(utils._send_batch, window=0.02, max_size=16)
+    utils.set_microbatcher(batcher)
+    try:
+        with use_chat_template():
+            results = await asyncio.gather(*(
+                graph.ainvoke(new_ticket_state("Charged twice", f"Two charges on my card for order {i}."))
+                for i in range(8)
+            ))
+    finally:
+        utils.set_microbatcher(None)
+        batcher.close()
+        await utils.aclose_async_client()
+    assert all(r["approved"] and r["category"] == "Billing" for r in results)
+    assert llm_stub.batched_prompts > 0
+    assert batcher.stats()["mean_batch_size"] > 1
+    assert all(prompt.startswith("[INST] ") and prompt.endswith(" [/INST]") for prompt in llm_stub.last_batch)
+
+
+def test_batched_calls_report_usage_and_skip_unbatchable_requests(llm_stub, monkeypatch) -> None:
+    sent = []
+    batcher = MicroBatcher(lambda key, prompts: sent.extend(prompts) or utils._send_batch(key, prompts), window=0.01)
+    utils.set_microbatcher(batcher)
+    try:
+        with use_chat_template(), metrics.ticket_trace("t") as trace:
+            assert utils.call_llm("Classify the ticket: my login fails", model="m") == "Technical"
+            utils.call_llm("Review this.", model="m", response_format={"type": "json", "value": {}})
+        monkeypatch.setattr(hf_client, "LLM_CHAT_TEMPLATE", "")
+        monkeypatch.setattr(hf_client, "hf_hub_download", lambda *args: (_ for _ in ()).throw(OSError("offline")))
+        hf_client.clear_chat_templates()
+        assert utils.call_llm("Classify the ticket: my login fails", model="no-template") == "Technical"
+    finally:
+        utils.set_microbatcher(None)
+        batcher.close()
+        hf_client.clear_chat_templates()
+    assert sent == ["Classify the ticket: my login fails"]
+    assert llm_stub.last_batch == ["[INST] Classify the ticket: my login fails [/INST]"]
+    assert llm_stub.models == {"m": 2, "no-template": 1}
+    # The batch's usage as reported by the server, not an estimate from the raw prompt.
+    assert trace.llm_calls[0]["prompt_tokens"] == count_tokens(llm_stub.last_batch[0])
+
+
+@pytest.mark.anyio
+async def test_chat_template_loads_off_the_event_loop_and_retries_failures(tmp_path, monkeypatch) -> None:
+    config = tmp_path / "tokenizer_config.json"
+    config.write_text(json.dumps({"chat_template": "<s>[INST] {{ messages[0]['content'] }} [/INST]",
+                                  "bos_token": "<s>"}))
+    loop_thread = threading.get_ident()
+    downloads = []
+
+    def download(model, filename):
+        downloads.append(threading.get_ident())
+        if len(downloads) == 1:
+            raise OSError("offline")
+        return str(config)
+
+    monkeypatch.setattr(hf_client, "LLM_CHAT_TEMPLATE", "")
+    monkeypatch.setattr(hf_client, "hf_hub_download", download)
+    monkeypatch.setattr(hf_client, "CHAT_TEMPLATE_RETRY_SEC", 0.0)
+    batcher = MicroBatcher(lambda key, prompts: [], window=0.01)
+    utils.set_microbatcher(batcher)
+    backend = get_backend("hf")
+    hf_client.clear_chat_templates()
+    try:
+        assert await utils._abatcher_for(backend, "m", None) is None
+        assert await utils._abatcher_for(backend, "m", None) is batcher
+        assert await utils._abatcher_for(backend, "m", None) is batcher
+        assert hf_client.chat_template("m", load=False)("hi") == "[INST] hi [/INST]"
+    finally:
+        utils.set_microbatcher(None)
+        batcher.close()
+        hf_client.clear_chat_templates()
+    assert len(downloads) == 2 and loop_thread not in downloads
@@ -0,0 +1,72 @@
+import json
+
+from agent import preclassify
+from agent.nodes.classify import classify_ticket
+from agent.preclassify import (
+    HashedLinearModel,
+    PreClassifier,
+    benchmark,
+    load_labelled,
+    ticket_text,
+)
+
+LABELLED = [
+    ("Refund please", "I want my money back for last month", "Billing"),
+    ("Money back", "Please return the money for the annual renewal", "Billing"),
+    ("Screen is blank", "The dashboard shows a blank white screen", "Technical"),
+    ("Blank page", "Dashboard page is blank after the latest release", "Technical"),
+    ("Strange login location", "I got an alert about a login from another country", "Security"),
+    ("Login alert", "Alert says a new device signed in from abroad", "Security"),
+    ("Office address", "What is your office address for mail?", "General"),
+    ("Mailing address", "Where should I send mail to your office?", "General"),
+]
+
+
+def test_rules_are_confident_on_obvious_tickets():
+    prediction = PreClassifier().predict("My account was hacked", "Suspicious, unauthorized logins")
+    assert prediction.category == "Security" and prediction.confidence >= 0.85
+    assert PreClassifier().classify("Hello", "Quick note") is None
+
+
+def test_linear_model_learns_from_labelled_history(tmp_path):
+    model = HashedLinearModel(dim=1 << 10).fit([ticket_text(s, d) for s, d, _ in LABELLED], [c for _, _, c in LABELLED])
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = HashedLinearModel.load(path)
+
+    prediction = PreClassifier(loaded, threshold=0.5).classify("Blank dashboard", "The page is blank")
+    assert prediction.category == "Technical"
+
+
+def test_load_labelled_reads_headerless_escalation_log(tmp_path):
+    log = tmp_path / "escalation_log.csv"
+    log.write_text('2025-07-20 18:20:00,Charged twice,"Two charges",Billing,"Dear Customer","Rejected"\n')
+    history = tmp_path / "history.jsonl"
+    history.write_text(json.dumps({"subject": "Hacked", "description": "Someone got in", "category": "Security"}) + "\n")
+
+    assert load_labelled([str(log), str(history)]) == [
+        ("Charged twice", "Two charges", "Billing"),
+        ("Hacked", "Someone got in", "Security"),
+    ]
+
+
+def test_confident_prediction_skips_llm(llm_stub):
+    preclassify.set_preclassifier(PreClassifier(threshold=0.85))
+    try:
+        state = {"ticket": {"subject": "App crashes", "description": "Error 503 when I upload a file"}, "messages": []}
+        assert classify_ticket(state)["category"] == "Technical"
+        assert llm_stub.requests == 0
+
+        state = {"ticket": {"subject": "Hello", "description": "Quick note"}, "messages": []}
+        assert classify_ticket(state)["category"] == "Billing"  # the stub's LLM answer
+        assert llm_stub.requests == 1
+    finally:
+        preclassify.set_preclassifier(None)
+        preclassify._configured = False
+
+
+def test_benchmark_reports_both_paths(llm_stub):
+    report = benchmark(LABELLED, PreClassifier())
+    assert report["examples"] == len(LABELLED)
+    assert report["llm_accuracy"] == 0.25  # the stub always answers Billing
+    assert {"local_accuracy", "local_latency_us_p50", "coverage", "hybrid_accuracy"} <= report.keys()
@@ -0,0 +1,37 @@
+from agent.metrics import PROMPT_TRIMMED_TOKENS, reset_metrics
+from agent.prompt_budget import (
+    assemble_prompt,
+    count_tokens,
+    dedupe_feedback,
+    format_feedback,
+    truncate_tokens,
+)
+from agent.prompts import draft_prompt, retry_feedback_section
+
+
+def test_dedupe_feedback_keeps_recent_distinct_items() -> None:
+    feedbacks = ["Add a closing.", "Include refund timeline", None, "add a closing", "Be concise", "Simplify"]
+    assert dedupe_feedback(feedbacks, limit=3) == ["add a closing", "Be concise", "Simplify"]
+    assert dedupe_feedback(feedbacks, limit=10)[0] == "Include refund timeline"
+    assert format_feedback(["Add a closing", "Add a closing."]) == "- Add a closing."
+
+
+def test_truncate_keeps_whole_paragraphs() -> None:
+    text = "\n\n".join(f"Section {i} " + "word " * 40 for i in range(5))
+    cut = truncate_tokens(text, 120)
+    assert count_tokens(cut) <= 120
+    assert cut.startswith("Section 0") and cut.count("Section") == 2
+
+
+def test_assemble_prompt_trims_context_before_feedback() -> None:
+    reset_metrics()
+    fixed = {"subject": "Refund", "description": "Where is my refund?", "category": "Billing"}
+    feedback = retry_feedback_section.format(feedback="- Include refund timeline")
+    context = "\n\n".join("Refunds take 5-7 business days. " * 10 for _ in range(10))
+    prompt = assemble_prompt("retry_draft", draft_prompt, fixed,
+                             trimmable=[("feedback", feedback), ("context", context)], budget=400)
+    assert count_tokens(prompt) <= 400
+    assert "- Include refund timeline" in prompt
+    # Static instructions come first, the ticket after the shared category/context block.
+    assert prompt.index("You are a support agent") < prompt.index("Category: Billing") < prompt.index("Ticket Subject")
+    assert PROMPT_TRIMMED_TOKENS.value(node="retry_draft", section="context") > 0
@@ -0,0 +1,81 @@
+from agent import precheck
+from agent.bench.mock_server import NOISY_APPROVE, REJECT
+from agent.graph import graph
+from agent.nodes import review
+from agent.nodes.review import _parse_review
+from agent.precheck import check_draft, precheck_draft
+from agent.state import new_ticket_state
+
+GOOD_DRAFT = (
+    "Hello Customer,\n\nThank you for reporting the double charge. We have reviewed your billing history "
+    "and the duplicate charge will be refunded within 5-7 business days. You will receive an email "
+    "confirmation once the refund is issued.\n\nBest regards,\nSupport Team"
+)
+
+
+def test_precheck_rejects_structural_problems() -> None:
+    result = check_draft("Your refund is on the way [Customer].", "Double charge", "I was charged twice")
+    assert result.verdict == "Escalate"
+    assert "greeting" in result.feedback and "closing" in result.feedback and "[Customer]" in result.feedback
+    assert check_draft("Error calling LLM: timeout", "s", "d").verdict == "Escalate"
+
+
+def test_precheck_approves_relevant_draft_and_defers_otherwise() -> None:
+    assert check_draft(GOOD_DRAFT, "Double charge", "I was charged twice, please refund").verdict == "Approved"
+    assert check_draft(GOOD_DRAFT, "App crashes", "Startup error on Android").verdict is None
+
+# Well formed and on topic, but wrong: the customer asked for a refund.
+WRONG_DRAFT = (
+    "Hello Customer,\n\nThank you for reporting the double charge. Charges cannot be refunded, so please "
+    "refund yourself by disputing the charge with your bank; we are unable to help with billing twice.\n\n"
+    "Best regards,\nSupport Team"
+)
+
+
+def test_plausible_draft_still_reaches_the_llm_reviewer(llm_stub) -> None:
+    subject, description = "Double charge", "I was charged twice, please refund"
+    assert check_draft(WRONG_DRAFT, subject, description).verdict == "Approved"
+    assert precheck_draft(WRONG_DRAFT, subject, description).verdict is None
+
+    llm_stub.draft, llm_stub.review_script = WRONG_DRAFT, [REJECT]
+    result = graph.invoke(new_ticket_state(subject, description))
+
+    assert not result["approved"] and llm_stub.calls["review"] == 3
+
+
+def test_parse_structured_review() -> None:
+    verdict, feedback, _, scores = _parse_review(
+        {}, '{"verdict": "Escalate", "scores": {"relevance": 4, "completeness": 2, "professionalism": 5},'
+            ' "feedback": "Include refund timeline"}'
+    )
+    assert (verdict, feedback) == ("Escalate", "Include refund timeline")
+    assert scores == {"relevance": 4, "completeness": 2, "professionalism": 5}
+    verdict, feedback, _, _ = _parse_review({}, '{"scores": {"relevance": 4, "completeness": 3, "professionalism": 5}}')
+    assert (verdict, feedback) == ("Approved", None)
+    assert _parse_review({}, "Escalate\nFeedback: Add a closing")[:2] == ("Escalate", "Add a closing")
+
+
+def test_parse_text_review_in_the_prompts_format() -> None:
+    response = "Response: Escalate\nFeedback (if Escalate): Add a closing and the refund timeline."
+    assert review._parseable_review(response)
+    assert _parse_review({}, response)[:2] == ("Escalate", "Add a closing and the refund timeline.")
+    assert _parse_review({}, "Response: [Escalate]\nFeedback (if Escalate): [Add a closing]")[:2] == (
+        "Escalate", "Add a closing")
+    assert _parse_review({}, "Response: Approved\nFeedback (if Escalate): N/A")[:2] == ("Approved", None)
+    assert not review._parseable_review(NOISY_APPROVE)
+
+
+def test_structured_review_avoids_retries_on_noisy_reviewer(llm_stub, monkeypatch) -> None:
+    monkeypatch.setattr(precheck, "PRECHECK_MODE", "off")
+    llm_stub.review_script = [NOISY_APPROVE]
+    ticket = new_ticket_state("Question about hours", "When is support open?")
+
+    monkeypatch.setattr(review, "REVIEW_MODE", "text")
+    assert graph.invoke(ticket)["approved"] is False
+
+    llm_stub.reset()
+    monkeypatch.setattr(review, "REVIEW_MODE", "structured")
+    result = graph.invoke(ticket)
+    assert result["approved"] is True and len(result["drafts"]) == 1
+    assert result["review_scores"]["relevance"] == 5
+    assert llm_stub.calls["review"] == 1
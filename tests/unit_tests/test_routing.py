@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from agent import metrics, routing
+from agent.bench.mock_server import MockLLMServer
+from agent.graph import graph
+from agent.nodes import classify
+from agent.routing import (
+    Router,
+    escalated_request,
+    load_router,
+    parse_routes,
+    route_stats,
+    routed_request,
+)
+from agent.state import new_ticket_state
+
+SMALL = "small-model"
+LARGE = "large-model"
+
+
+@pytest.fixture
+def router(llm_stub, monkeypatch):
+    """Install a routing table for one test; classification always goes to the LLM."""
+    monkeypatch.setattr(classify, "get_preclassifier", lambda: None)
+    metrics.reset_metrics()
+    previous = routing._router, routing._router_configured
+
+    def install(table):
+        routing.set_router(Router(parse_routes(table)))
+
+    yield install
+    routing._router, routing._router_configured = previous
+
+
+def test_route_lookup_prefers_category_then_node_then_default(tmp_path) -> None:
+    table = {"default": {"model": LARGE}, "review": {"model": SMALL, "max_tokens": 20},
+             "review:Security": {"model": LARGE, "timeout": 5}}
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(table))
+    for spec in (json.dumps(table), str(path)):
+        router = load_router(spec)
+        assert router.route_for("review", "Security").name == "review:Security"
+        assert router.route_for("review", "Billing").name == "review"
+        assert router.route_for("draft", "Billing").name == "default"
+    assert load_router("") is None
+
+    request = router.route_for("review").apply({"message": "m", "max_tokens": 150, "temperature": 0})
+    assert (request["model"], request["max_tokens"], request["temperature"]) == (SMALL, 20, 0)
+
+    with pytest.raises(ValueError, match="unknown settings"):
+        parse_routes({"classify": {"model": SMALL, "max_token": 5}})
+    with pytest.raises(ValueError, match="unknown route"):
+        parse_routes({"classify": {"model": SMALL, "escalate_to": "large"}})
+
+
+def test_escalation_keeps_the_endpoint_and_limits_the_target_leaves_unset(router) -> None:
+    router({"large": {"model": LARGE, "timeout": 60},
+            "review": {"model": SMALL, "base_url": "http://small:8080", "backend": "local", "timeout": 5,
+                       "escalate_to": "large"}})
+
+    request = escalated_request(routed_request({"message": "m", "max_tokens": 100}, "review"), "unparseable_review")
+
+    route = request["route"]
+    assert (request["model"], request["max_tokens"]) == (LARGE, 100)
+    assert (route.name, route.base_url, route.backend, route.timeout) == ("large", "http://small:8080", "local", 60)
+
+
+def test_unusable_answers_escalate_to_the_larger_model(router, llm_stub) -> None:
+    llm_stub.weak_models = {SMALL: 1.0}
+    router({"large": {"model": LARGE},
+            "classify": {"model": SMALL, "escalate_to": "large"},
+            "review": {"model": SMALL, "escalate_to": "large"}})
+
+    result = graph.invoke(new_ticket_state("Charged twice", "Two charges on my card."))
+
+    assert result["category"] == "Billing" and result["approved"]
+    assert llm_stub.models[SMALL] == 2 and llm_stub.models[LARGE] == 2
+    stats = route_stats()
+    assert stats["classify"]["escalations"] == 1 and stats["review"]["escalations"] == 1
+    assert stats["large"]["calls"] == 2 and stats["large"]["models"] == [LARGE]
+    assert metrics.LLM_ROUTE_ESCALATIONS.value(route="review", target="large", reason="unparseable_review") == 1
+
+
+def test_valid_answers_stay_on_the_route_and_its_endpoint(router, llm_stub) -> None:
+    drafting = MockLLMServer().start()
+    try:
+        router({"large": {"model": LARGE},
+                "classify": {"model": SMALL, "escalate_to": "large", "cost_per_1k_prompt_tokens": 1.0},
+                "review": {"model": SMALL, "escalate_to": "large"},
+                "draft": {"model": LARGE, "base_url": drafting.url, "timeout": 5}})
+
+        result = graph.invoke(new_ticket_state("Charged twice", "Two charges on my card for order 77."))
+    finally:
+        drafting.stop()
+
+    assert result["approved"] and result["category"] == "Billing"
+    assert llm_stub.models == {SMALL: 2} and drafting.models == {LARGE: 1}
+    stats = route_stats()
+    assert stats["classify"]["escalations"] == 0 and stats["classify"]["cost_usd"] > 0
+    assert set(stats) == {"classify", "review", "draft"}
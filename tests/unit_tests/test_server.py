@@ -0,0 +1,77 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent.server import TicketService, create_app
+
+TICKET = {"subject": "Refund not received", "description": "My refund has not arrived yet."}
+
+
+@pytest.fixture
+def make_client(llm_stub):
+    clients = []
+
+    def make(**kwargs):
+        client = TestClient(create_app(TicketService(**kwargs)))
+        clients.append(client.__enter__())
+        return client
+
+    yield make
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+def test_sync_ticket_returns_result(make_client) -> None:
+    client = make_client(workers=2, queue_size=4)
+    response = client.post("/tickets", json={**TICKET, "id": "T-1"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == "T-1" and body["status"] == "done"
+    assert body["result"]["approved"] is True
+    assert client.get("/tickets/T-1").json()["status"] == "done"
+    assert client.get("/tickets/unknown").status_code == 404
+
+
+def test_invalid_ticket_is_rejected(make_client) -> None:
+    client = make_client(workers=1, queue_size=1)
+    response = client.post("/tickets", json={"subject": "", "description": "x"})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Please provide both subject and description."
+
+
+def test_async_ticket_and_saturation(make_client, llm_stub) -> None:
+    llm_stub.latency = 0.3
+    client = make_client(workers=1, queue_size=1)
+    first = client.post("/tickets", json={**TICKET, "mode": "async"})
+    assert first.status_code == 202
+    job_id = first.json()["id"]
+    time.sleep(0.1)  # let the worker pick it up so the next one waits in the queue
+    assert client.post("/tickets", json={**TICKET, "mode": "async"}).status_code == 202
+    saturated = client.post("/tickets", json={**TICKET, "mode": "async"})
+    assert saturated.status_code == 429 and saturated.headers["Retry-After"] == "1"
+    assert client.get("/healthz").json()["rejected"] == 1
+
+    deadline = time.time() + 10
+    while client.get(f"/tickets/{job_id}").json()["status"] != "done":
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+def test_deadline_cancels_ticket(make_client, llm_stub) -> None:
+    llm_stub.latency = 1.0
+    client = make_client(workers=1, queue_size=1)
+    start = time.perf_counter()
+    response = client.post("/tickets", json={**TICKET, "deadline_sec": 0.3})
+    assert response.status_code == 504
+    assert response.json()["status"] == "timeout"
+    assert time.perf_counter() - start < 1.0
+
+
+def test_bulk_submission(make_client) -> None:
+    client = make_client(workers=2, queue_size=2)
+    response = client.post("/tickets/bulk", json={"tickets": [TICKET, {"subject": "x", "description": ""}, TICKET, TICKET]})
+    assert response.status_code == 202
+    statuses = [t["status"] for t in response.json()["tickets"]]
+    assert statuses[1] == "invalid"
+    assert statuses.count("queued") >= 2 and response.json()["accepted"] == statuses.count("queued")
@@ -0,0 +1,39 @@
+import pytest
+
+from agent import precheck
+from agent.bench.mock_server import APPROVE, REJECT
+from agent.graph import graph
+from agent.nodes import speculative
+from agent.nodes.speculative import parse_widths
+from agent.state import new_ticket_state
+
+
+def test_parse_widths() -> None:
+    assert parse_widths("3") == {"*": 3}
+    assert parse_widths("Security=3, Technical=2,*=1") == {"Security": 3, "Technical": 2, "*": 1}
+
+
+@pytest.fixture
+def speculative_stub(llm_stub, monkeypatch):
+    monkeypatch.setattr(precheck, "PRECHECK_MODE", "off")
+    monkeypatch.setattr(speculative, "SPECULATIVE_WIDTHS", {"*": 3})
+    return llm_stub
+
+
+def test_fan_out_returns_approved_candidate(speculative_stub) -> None:
+    speculative_stub.review_script = [REJECT, REJECT, APPROVE]
+    result = graph.invoke(new_ticket_state("Refund not received", "My refund has not arrived."))
+    assert result["approved"] is True
+    assert len(result["candidates"]) == 3 and len(result["drafts"]) == 1
+    assert speculative_stub.calls["draft"] == 3 and speculative_stub.calls["review"] == 3
+
+
+@pytest.mark.anyio
+async def test_fan_out_falls_back_to_retry_loop(speculative_stub) -> None:
+    speculative_stub.review_script = [REJECT]
+    result = await graph.ainvoke(new_ticket_state("Refund not received", "My refund has not arrived."))
+    assert result["approved"] is False
+    assert result["feedbacks"] == ["Include specific timelines and a professional closing."] * 3
+    # One speculative round, then two sequential retries.
+    assert speculative_stub.calls["review"] == 5
+    assert result["output"] == "Ticket escalated to human agent after max retries."
@@ -0,0 +1,26 @@
+from agent.bench.startup import IMPORT_TARGETS_MS, measure_import, parse_importtime
+
+
+def test_parse_importtime() -> None:
+    rows = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   agent.state\n"
+        "import time:       300 |        420 | agent\n"
+    )
+    assert rows == [
+        {"module": "agent.state", "self_us": 120, "cumulative_us": 120, "depth": 1},
+        {"module": "agent", "self_us": 300, "cumulative_us": 420, "depth": 0},
+    ]
+
+
+def test_package_import_is_lazy() -> None:
+    for module in ("agent", "agent.metrics"):
+        result = measure_import(module, runs=1)
+        assert result["heavy_packages"] == []
+        assert result["import_ms"] < IMPORT_TARGETS_MS[module]
+
+
+def test_graph_import_defers_clients_and_ui() -> None:
+    result = measure_import("agent.graph", runs=1)
+    assert not {"huggingface_hub", "gradio", "langchain"} & set(result["heavy_packages"])
+    assert result["import_ms"] < IMPORT_TARGETS_MS["agent.graph"]
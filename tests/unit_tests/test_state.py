@@ -0,0 +1,24 @@
+from langchain_core.messages import HumanMessage
+
+from agent import state as state_module
+from agent.graph import graph
+from agent.state import bounded_messages, current_draft, new_ticket_state
+
+
+def test_bounded_messages_caps_log(monkeypatch) -> None:
+    monkeypatch.setattr(state_module, "MAX_MESSAGES", 5)
+    log = [HumanMessage(content="Received ticket")]
+    for i in range(10):
+        log = bounded_messages(log, [HumanMessage(content=f"step {i}")])
+    assert len(log) == 5
+    assert log[0].content == "Received ticket"
+    assert log[1].content == "[7 earlier messages omitted]"
+    assert [m.content for m in log[2:]] == ["step 7", "step 8", "step 9"]
+
+
+def test_drafts_stored_once(llm_stub) -> None:
+    result = graph.invoke(new_ticket_state("Refund not received", "My refund has not arrived."))
+    assert "draft" not in result
+    assert len(result["drafts"]) == 1
+    assert current_draft(result) == result["output"]
+    assert not any(result["output"] in m.content for m in result["messages"])
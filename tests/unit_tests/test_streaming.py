@@ -0,0 +1,56 @@
+from agent import coalesce
+from agent.app import format_result, stream_ticket
+from agent.coalesce import TicketCoalescer
+from agent.graph import graph
+from agent.state import new_ticket_state
+from tests.conftest import STUB_DRAFT
+
+
+def test_graph_streams_draft_tokens(llm_stub):
+    tokens = []
+    for mode, chunk in graph.stream(new_ticket_state("Hi", "Something happened"), stream_mode=["custom", "values"]):
+        if mode == "custom":
+            tokens.append(chunk)
+        else:
+            final = chunk
+
+    assert len(tokens) > 5 and all(t["node"] == "draft" for t in tokens)
+    assert "ttft_ms" in tokens[0] and "ttft_ms" not in tokens[1]
+    assert "".join(t["token"] for t in tokens).strip() == STUB_DRAFT == final["drafts"][-1]
+
+
+def test_stream_ticket_renders_tokens_then_review_then_result(llm_stub):
+    frames = list(stream_ticket("Hi", "Something happened"))
+
+    assert frames[0] == "**Processing your ticket...**"
+    assert any("**Drafting response...**" in f for f in frames)
+    review = [f for f in frames if "**Under review...**" in f]
+    assert len(review) == 1 and STUB_DRAFT in review[0]
+    assert frames[-1] == f"**Category**: Billing\n\n**Output**:\n{STUB_DRAFT}"
+
+
+def test_stream_ticket_validates_input():
+    assert list(stream_ticket("", "x")) == ["Error: Please provide both subject and description."]
+
+
+def test_format_result_shows_last_feedback():
+    text = format_result({"category": "Billing", "approved": False, "output": "escalated", "feedbacks": ["a", "b"]})
+    assert text.endswith("**Feedback**: b")
+
+
+def test_matching_stream_shares_the_running_tickets_result(llm_stub):
+    llm_stub.latency = 0.1
+    previous = coalesce._coalescer, coalesce._configured
+    coalesce.set_coalescer(TicketCoalescer())
+    try:
+        leader = stream_ticket("Hi", "Something happened")
+        assert next(leader) == "**Processing your ticket...**"
+        next(leader)  # the leader's run is in flight
+        follower = list(stream_ticket("Hi", "Something happened"))
+        frames = list(leader)
+    finally:
+        coalesce._coalescer, coalesce._configured = previous
+
+    assert follower == ["**Processing your ticket...**", frames[-1]]
+    assert frames[-1] == f"**Category**: Billing\n\n**Output**:\n{STUB_DRAFT}"
+    assert llm_stub.calls["classify"] == 1
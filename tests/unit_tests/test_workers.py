@@ -0,0 +1,81 @@
+import json
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from agent.batch import run_batch
+from agent.workers import WorkerPool, run_tickets
+
+
+@pytest.fixture
+def worker_env(llm_stub, monkeypatch, tmp_path):
+    """Worker processes read their configuration from the environment they inherit."""
+    monkeypatch.setenv("HUGGINGFACE_BASE_URL", llm_stub.url)
+    monkeypatch.setenv("ESCALATION_BACKEND", "jsonl")
+    monkeypatch.setenv("ESCALATION_LOG_PATH", str(tmp_path / "escalations.jsonl"))
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "none")
+    return llm_stub
+
+
+def _tickets(n):
+    return [(f"t{i}", {"subject": "Charged twice", "description": f"Two charges on my card for order {i}."})
+            for i in range(n)]
+
+
+def test_batch_on_worker_pool_keeps_input_order(worker_env, tmp_path) -> None:
+    tickets, results = tmp_path / "tickets.jsonl", tmp_path / "results.jsonl"
+    with open(tickets, "w") as f:
+        for ticket_id, ticket in _tickets(8):
+            f.write(json.dumps({"id": ticket_id, **ticket}) + "\n")
+        f.write(json.dumps({"id": "bad", "subject": "", "description": "missing subject"}) + "\n")
+
+    stats = run_batch(str(tickets), str(results), processes=2, concurrency=2)
+
+    records = [json.loads(line) for line in results.read_text().splitlines()]
+    assert [r["id"] for r in records] == [f"t{i}" for i in range(8)] + ["bad"]
+    assert all(r["approved"] for r in records[:8])
+    assert stats["processed"] == 9 and stats["failed"] == 1
+    assert sum(stats["workers"]["completed_per_worker"]) == 9
+
+
+def test_crashed_worker_is_restarted_and_its_tickets_rerun(worker_env) -> None:
+    worker_env.latency = 0.3
+    with WorkerPool(2, concurrency=2) as pool:
+        results = pool.map(_tickets(8))
+        records = [next(results)]
+        os.kill(pool.pids()[1], signal.SIGKILL)
+        records.extend(results)
+        assert pool.stats()["restarts"] == 1
+    assert [r["id"] for r in records] == [f"t{i}" for i in range(8)]
+    assert not any(r.get("error") for r in records)
+
+
+def test_ticket_that_raises_in_a_worker_gets_an_error_record(worker_env) -> None:
+    # A ticket that is not a dict makes `aprocess_ticket` raise inside the worker.
+    records = run_tickets([("broken", None)] + _tickets(2), processes=1, concurrency=2)
+
+    assert [r["id"] for r in records] == ["broken", "t0", "t1"]
+    assert records[0]["error"].startswith("Error processing ticket")
+    assert records[1]["approved"] and records[2]["approved"]
+
+
+def test_crash_with_a_full_result_buffer_reruns_the_awaited_ticket(worker_env) -> None:
+    # The first LLM request hangs, so one of the first tickets holds up the ordered
+    # output while the others fill the result buffer (4 * 1 * 2 = 8 records).
+    worker_env.fault_script, worker_env.hang_seconds = ["hang"], 60
+    records = []
+    with WorkerPool(1, concurrency=2) as pool:
+        reader = threading.Thread(target=lambda: records.extend(pool.map(_tickets(12))), daemon=True)
+        reader.start()
+        seen, deadline = 0, time.monotonic() + 30
+        while (not seen or worker_env.requests != seen) and time.monotonic() < deadline:
+            seen = worker_env.requests
+            time.sleep(0.5)
+        os.kill(pool.pids()[0], signal.SIGKILL)
+        reader.join(30)
+        assert not reader.is_alive()
+    assert [r["id"] for r in records] == [f"t{i}" for i in range(12)]
+    assert not any(r.get("error") for r in records)